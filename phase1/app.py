@@ -1,29 +1,274 @@
-from flask import Flask, request, jsonify
+import json
+import time
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from pytojs import transpile_python_to_js
+from flask_sock import Sock
+from pytojs import transpile_python_to_js, TranspileLimits, BudgetExceeded, Budget, __version__
+from parse import parse_code_to_ir
+from lexical_analyzer import analyze_code
+from recovery import transpile_with_diagnostics
+from sessions import SessionStore, SessionError
+from live import LiveChannel
+from singleflight import SingleFlight, request_key
+from cache import ResultCache, ENCODERS
 import traceback
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
+sock = Sock(app)
+
+# Smallest /convert body worth compressing
+app.config.setdefault("COMPRESS_MIN_BYTES", 1024)
+
+# Per-request budgets for /convert
+app.config.setdefault("TRANSPILE_LIMITS", TranspileLimits(
+    max_source_bytes=1_000_000,
+    max_nodes=500_000,
+    max_output_bytes=10_000_000,
+    timeout=5.0,
+))
+
+def transpile_with_limits(python_code, opt_level=0, pass_stats=None, minify=False):
+    return transpile_python_to_js(python_code, limits=app.config["TRANSPILE_LIMITS"],
+                                  opt_level=opt_level, pass_stats=pass_stats, minify=minify)
+
+# Editor sessions for delta-based conversion
+sessions = SessionStore(transpile_with_limits)
+
+# Identical concurrent /convert requests share one transpilation
+convert_flights = SingleFlight()
+
+# Successful /convert bodies, with their compressed forms kept alongside
+convert_results = ResultCache()
+
+# Fields /convert can return; only the requested ones are computed
+CONVERT_FIELDS = ("javascript", "ir", "tokens", "stats", "diagnostics")
+
+# Largest page of tokens returned by one /convert request
+MAX_TOKENS_PAGE = 5000
+
+# Optimization levels /convert accepts (see passes.OPT_LEVELS)
+OPT_LEVELS = (0, 1, 2)
+
+def parse_fields(data):
+    """Read the requested fields, given as a list or a comma-separated string"""
+    fields = data.get('fields', ['javascript'])
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    fields = {str(field).strip() for field in fields if str(field).strip()}
+    unknown = fields - set(CONVERT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+def build_conversion(python_code, fields, tokens_offset=0, tokens_limit=MAX_TOKENS_PAGE, opt_level=0,
+                     minify=False):
+    """
+    Compute the requested /convert fields.
+    
+    The default JavaScript-only request never runs the lexer or builds the
+    IR, and tokens are lexed only up to the end of the requested page.
+    ``opt_level`` and ``minify`` apply to the plain JavaScript field;
+    /convert rejects them together with diagnostics.
+    Returns a ``(result, error)`` tuple.
+    """
+    started = time.perf_counter()
+    result = {}
+    pass_stats = []
+    
+    if 'diagnostics' in fields:
+        # Recovering front end: every error at once, the rest still transpiled
+        js_code, diagnostics = transpile_with_diagnostics(python_code, limits=app.config["TRANSPILE_LIMITS"])
+        result['diagnostics'] = diagnostics
+        if 'javascript' in fields:
+            result['javascript'] = js_code
+    elif 'javascript' in fields:
+        js_code, error = transpile_with_limits(python_code, opt_level, pass_stats, minify)
+        if error:
+            return None, error
+        result['javascript'] = js_code
+    
+    if 'ir' in fields:
+        try:
+            result['ir'] = parse_code_to_ir(python_code, include_tokens=False)
+        except SyntaxError as e:
+            return None, f"Python syntax error: {str(e)}"
+    
+    if 'tokens' in fields:
+        # Lex one token past the page to know whether another page exists
+        page = analyze_code(python_code, tokens_offset, tokens_limit + 1)
+        result['tokens'] = page[:tokens_limit]
+        more = len(page) > tokens_limit
+        result['tokens_next_offset'] = tokens_offset + tokens_limit if more else None
+    
+    if 'stats' in fields:
+        stats = {
+            'source_bytes': len(python_code.encode('utf-8')),
+            'source_lines': python_code.count('\n') + 1,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+        }
+        if 'javascript' in result:
+            stats['javascript_bytes'] = len(result['javascript'])
+        if pass_stats:
+            stats['passes'] = pass_stats
+        result['stats'] = stats
+    
+    return result, None
+
+def cached_response(entry, etag):
+    """Serve a cached body, compressed when it is large and the client accepts it"""
+    body = entry.body
+    headers = {'ETag': f'"{etag}"', 'Vary': 'Accept-Encoding'}
+    if len(body) >= app.config["COMPRESS_MIN_BYTES"]:
+        encoding = request.accept_encodings.best_match(list(ENCODERS))
+        if encoding:
+            body = convert_results.encoded(entry, encoding)
+            headers['Content-Encoding'] = encoding
+    return Response(body, mimetype='application/json', headers=headers)
+
+def budget_error_response(error):
+    """Map a BudgetExceeded to 408 for time limits and 413 for size limits"""
+    status = 408 if error.kind in ("deadline", "cancelled") else 413
+    return jsonify(error.to_dict()), status
 
 @app.route('/convert', methods=['POST'])
 def convert():
     data = request.get_json()
     python_code = data.get('code', '')
     
+    try:
+        fields = parse_fields(data)
+        tokens_offset = max(0, int(data.get('tokens_offset', 0)))
+        tokens_limit = min(MAX_TOKENS_PAGE, max(0, int(data.get('tokens_limit', MAX_TOKENS_PAGE))))
+        opt_level = int(data.get('opt_level', 0))
+        if opt_level not in OPT_LEVELS:
+            raise ValueError(f"opt_level must be one of {', '.join(map(str, OPT_LEVELS))}")
+        minify = data.get('minify', False)
+        if not isinstance(minify, bool):
+            raise ValueError("minify must be true or false")
+        if 'diagnostics' in fields and (opt_level or minify):
+            # The recovering front end runs neither, as with cli.py --recover
+            raise ValueError("opt_level and minify cannot be combined with the diagnostics field")
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f"Invalid request: {str(e)}"}), 400
+    
+    try:
+        Budget(app.config["TRANSPILE_LIMITS"]).check_source(python_code)
+    except BudgetExceeded as e:
+        return budget_error_response(e)
+    
+    # The ETag depends only on the request and the transpiler version, so an
+    # unchanged source is answered before any transpile work
+    etag = request_key(python_code, fields=sorted(fields), tokens_offset=tokens_offset,
+                       tokens_limit=tokens_limit, opt_level=opt_level, minify=minify,
+                       version=__version__)
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers={'ETag': f'"{etag}"', 'Vary': 'Accept-Encoding'})
+    
+    entry = convert_results.get(etag)
+    if entry is not None:
+        return cached_response(entry, etag)
+    
     try:
         # Direct AST-based transpilation
-        js_code, error = transpile_python_to_js(python_code)
+        def convert_entry():
+            result, error = build_conversion(python_code, fields, tokens_offset, tokens_limit, opt_level,
+                                             minify)
+            if error:
+                return None, error
+            body = json.dumps(result, separators=(',', ':')).encode('utf-8')
+            return convert_results.put(etag, body), None
+        
+        entry, error = convert_flights.do(etag, convert_entry)
         if error:
             return jsonify({'error': error}), 400
             
-        result = {
-            'javascript': js_code
-        }
-        return jsonify(result)
+        return cached_response(entry, etag)
+    except BudgetExceeded as e:
+        return budget_error_response(e)
     except Exception as e:
         error_msg = f"Conversion error: {str(e)}"
         return jsonify({'error': error_msg}), 400
 
+def session_response(session, status=200, **extra):
+    result = {'session': session.id, 'version': session.version, **extra}
+    if session.error:
+        result['error'] = session.error
+    return jsonify(result), status
+
+@app.route('/sessions', methods=['POST'])
+def open_session():
+    data = request.get_json()
+    try:
+        session = sessions.open(data.get('code', ''))
+    except SessionError as e:
+        return jsonify({'error': str(e)}), e.status
+    except BudgetExceeded as e:
+        return budget_error_response(e)
+    return session_response(session, 201, javascript=session.javascript)
+
+@app.route('/sessions/<session_id>', methods=['GET'])
+def get_session(session_id):
+    try:
+        session = sessions.get(session_id)
+    except SessionError as e:
+        return jsonify({'error': str(e)}), e.status
+    return session_response(session, javascript=session.javascript)
+
+@app.route('/sessions/<session_id>/edits', methods=['POST'])
+def edit_session(session_id):
+    """Apply text edits and return only the changed ranges of the JavaScript"""
+    data = request.get_json()
+    try:
+        session, changes = sessions.edit(session_id, data.get('edits', []), data.get('version'))
+    except SessionError as e:
+        return jsonify({'error': str(e)}), e.status
+    except BudgetExceeded as e:
+        return budget_error_response(e)
+    return session_response(session, changes=changes)
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def close_session(session_id):
+    try:
+        sessions.close(session_id)
+    except SessionError as e:
+        return jsonify({'error': str(e)}), e.status
+    return '', 204
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Service metrics in the Prometheus text format"""
+    lines = [
+        "# HELP convert_inflight_keys Distinct /convert sources being transpiled right now.",
+        "# TYPE convert_inflight_keys gauge",
+        f"convert_inflight_keys {convert_flights.in_flight}",
+        "# HELP convert_coalesced_total /convert requests that shared another request's result.",
+        "# TYPE convert_coalesced_total counter",
+        f"convert_coalesced_total {convert_flights.coalesced}",
+        "# HELP convert_cache_hits_total /convert requests served from the result cache.",
+        "# TYPE convert_cache_hits_total counter",
+        f"convert_cache_hits_total {convert_results.hits}",
+        "# HELP convert_sessions Open delta-conversion sessions.",
+        "# TYPE convert_sessions gauge",
+        f"convert_sessions {len(sessions)}",
+    ]
+    return "\n".join(lines) + "\n", 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+@sock.route('/live')
+def live(ws):
+    """One WebSocket per editor: edit messages in, versioned JS updates out"""
+    channel = LiveChannel(lambda message: ws.send(json.dumps(message)),
+                          transpile_python_to_js, app.config["TRANSPILE_LIMITS"])
+    channel.start()
+    try:
+        while True:
+            data = ws.receive()
+            try:
+                channel.receive(json.loads(data))
+            except (ValueError, SessionError) as e:
+                channel.send({'type': 'error', 'error': str(e)})
+    finally:
+        channel.close()
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,77 @@
+import gzip
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content encodings we can produce, most preferred first
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS["br"] = lambda body: brotli.compress(body, quality=5)
+ENCODERS["gzip"] = lambda body: gzip.compress(body, compresslevel=6)
+
+class CachedResult:
+    """A response body plus the compressed forms made from it so far"""
+
+    def __init__(self, body):
+        self.body = body
+        self._encoded = {}
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(data) for data in self._encoded.values())
+
+    def encoded(self, encoding):
+        """Return the body compressed with ``encoding``, compressing only once"""
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = ENCODERS[encoding](self.body)
+        return data
+
+class ResultCache:
+    """Least-recently-used cache of CachedResult entries with a byte budget"""
+
+    def __init__(self, max_entries=1024, max_bytes=64_000_000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, body):
+        entry = CachedResult(body)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._trim()
+        return entry
+
+    def encoded(self, entry, encoding):
+        """Compressed body for ``entry``, kept in the cache for later hits"""
+        data = entry.encoded(encoding)
+        with self._lock:
+            self._trim()
+        return data
+
+    def _trim(self):
+        total = sum(entry.size for entry in self._entries.values())
+        while self._entries and (len(self._entries) > self.max_entries or total > self.max_bytes):
+            _, entry = self._entries.popitem(last=False)
+            total -= entry.size
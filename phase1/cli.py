@@ -0,0 +1,103 @@
+"""
+Command-line transpiler: python cli.py [-O0|-O1|-O2] [--minify] [--iterative] [--recover] [-j JOBS] [-o OUTPUT] [FILE]
+
+Reads Python from FILE (or stdin) and writes JavaScript to OUTPUT (or
+stdout). Only the transpiler core is imported, never the web service, so
+short-lived invocations start quickly. With ``-j`` large modules are split
+across that many worker processes. With ``--recover`` every syntax error is
+reported and the rest of the file is still written out. ``-O1`` and ``-O2``
+run the optimization passes of that level before emission, and ``--minify``
+shortens local names and strips whitespace from the output.
+"""
+import sys
+
+USAGE = "usage: cli.py [-h] [-O0|-O1|-O2] [--minify] [--iterative] [--recover] [-j JOBS] [-o OUTPUT] [FILE]"
+
+def parse_args(argv):
+    """Read options by hand; argparse alone costs more than a small transpile"""
+    options = {"opt_level": 0, "minify": False, "iterative": False, "recover": False, "jobs": 1,
+               "output": None, "input": None}
+    args = list(argv)
+    while args:
+        arg = args.pop(0)
+        if arg in ("-h", "--help"):
+            options["help"] = True
+        elif arg in ("-O0", "-O1", "-O2"):
+            options["opt_level"] = int(arg[2])
+        elif arg == "--minify":
+            options["minify"] = True
+        elif arg == "--iterative":
+            options["iterative"] = True
+        elif arg == "--recover":
+            options["recover"] = True
+        elif arg in ("-j", "--jobs"):
+            if not args or not args[0].isdigit() or int(args[0]) < 1:
+                raise ValueError(f"{arg} needs a positive number of workers")
+            options["jobs"] = int(args.pop(0))
+        elif arg in ("-o", "--output"):
+            if not args:
+                raise ValueError(f"{arg} needs a file name")
+            options["output"] = args.pop(0)
+        elif arg.startswith("--output="):
+            options["output"] = arg.split("=", 1)[1]
+        elif arg.startswith("-") and arg != "-":
+            raise ValueError(f"unknown option {arg}")
+        elif options["input"] is None:
+            options["input"] = arg
+        else:
+            raise ValueError(f"unexpected argument {arg}")
+    # Passes see the whole module, so they cannot run per region or chunk
+    if options["opt_level"] and (options["recover"] or options["jobs"] > 1):
+        raise ValueError("-O1 and -O2 cannot be combined with --recover or -j")
+    if options["minify"] and (options["recover"] or options["jobs"] > 1):
+        raise ValueError("--minify cannot be combined with --recover or -j")
+    return options
+
+def main(argv=None):
+    try:
+        options = parse_args(sys.argv[1:] if argv is None else argv)
+    except ValueError as e:
+        print(f"{USAGE}\ncli.py: error: {e}", file=sys.stderr)
+        return 2
+    if options.get("help"):
+        print(__doc__.strip())
+        return 0
+
+    if options["input"] in (None, "-"):
+        python_code = sys.stdin.read()
+    else:
+        with open(options["input"], encoding="utf-8") as f:
+            python_code = f.read()
+
+    status = 0
+    if options["recover"]:
+        from recovery import transpile_with_diagnostics
+        js_code, diagnostics = transpile_with_diagnostics(python_code, iterative=options["iterative"])
+        name = options["input"] or "<stdin>"
+        for diagnostic in diagnostics:
+            print(f"{name}:{diagnostic['line']}:{diagnostic['column']}: {diagnostic['message']}",
+                  file=sys.stderr)
+        error = None
+        status = 1 if diagnostics else 0
+    elif options["jobs"] > 1:
+        from parallel import transpile_parallel
+        js_code, error = transpile_parallel(python_code, workers=options["jobs"],
+                                            iterative=options["iterative"])
+    else:
+        from pytojs import transpile_python_to_js
+        js_code, error = transpile_python_to_js(python_code, iterative=options["iterative"],
+                                                opt_level=options["opt_level"],
+                                                minify=options["minify"])
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+
+    if options["output"] in (None, "-"):
+        sys.stdout.write(js_code + "\n")
+    else:
+        with open(options["output"], "w", encoding="utf-8") as f:
+            f.write(js_code + "\n")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
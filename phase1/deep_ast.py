@@ -0,0 +1,402 @@
+import ast
+import io
+import tokenize
+
+# Name of the call used to split long operator chains into parseable groups
+_GROUP = "__pyjs_chain__"
+
+# Name of the call a long run of unary operators and ``**`` is flattened into
+_FACTOR = "__pyjs_factor__"
+
+# Operands per group; keeps every group well inside CPython's AST depth limit
+_GROUP_SIZE = 100
+
+# Prefix operators of a factor, as written and as nodes
+_UNARY = {"-": ast.USub, "+": ast.UAdd, "~": ast.Invert}
+
+# Items a factor's primaries (names, literals, brackets, attributes) are made of
+_PRIMARY = {"atom", ".", "await"}
+
+# Binary operator precedence classes that form left-associative chains
+# (lowest precedence first)
+_CHAIN_CLASSES = [
+    {"|"},
+    {"^"},
+    {"&"},
+    {"<<", ">>"},
+    {"+", "-"},
+    {"*", "/", "//", "%", "@"},
+]
+_TOKEN_CLASS = {op: level for level, ops in enumerate(_CHAIN_CLASSES) for op in ops}
+_NODE_CLASS = {
+    ast.BitOr: 0, ast.BitXor: 1, ast.BitAnd: 2,
+    ast.LShift: 3, ast.RShift: 3,
+    ast.Add: 4, ast.Sub: 4,
+    ast.Mult: 5, ast.Div: 5, ast.FloorDiv: 5, ast.Mod: 5, ast.MatMult: 5,
+}
+
+# Tokens that end an arithmetic expression
+_DELIMITERS = {
+    ",", "=", ":", ";", ":=", "->", "<", ">", "==", "!=", "<=", ">=", "<>",
+    "+=", "-=", "*=", "/=", "//=", "%=", "@=", "&=", "|=", "^=", ">>=", "<<=", "**=",
+}
+_DELIMITER_KEYWORDS = {
+    "and", "or", "not", "if", "else", "elif", "in", "is", "for", "async",
+    "lambda", "return", "yield", "from", "import", "del", "assert", "raise",
+    "while", "with", "as", "except", "global", "nonlocal", "pass", "class", "def",
+    "try", "finally", "break", "continue",
+}
+_OPEN = {"(": ")", "[": "]", "{": "}"}
+
+
+def parse(source):
+    """
+    Parse Python source into an AST, even when it holds operator or
+    ``elif`` chains deeper than ``ast.parse`` can build.
+
+    Long flat chains such as ``a + b + ... + z`` are first tried as-is. If
+    CPython gives up on the nesting, the chains are split into
+    bounded groups, parsed, and spliced back into the exact left-associative
+    ``BinOp`` tree ``ast.parse`` would have produced. Long runs of unary
+    operators and ``**`` (``- - - x``, ``2 ** 2 ** 2``) are parsed as one
+    flat call and nested back up the same way. Column offsets of spliced
+    nodes refer to the regrouped text. Long ``elif`` chains are
+    parsed as a run of separate ``if`` statements and nested back the same
+    way.
+
+    Args:
+        source: Python source code as a string
+
+    Returns:
+        The parsed ``ast.Module``
+    """
+    try:
+        return ast.parse(source)
+    except (RecursionError, MemoryError):
+        # CPython's parser reports a nesting it cannot handle as either
+        pass
+    source, elifs = _split_elifs(source)
+    tree = ast.parse(_group_long_chains(source))
+    _splice_groups(tree)
+    _join_elifs(tree, elifs)
+    return tree
+
+
+def dump(node):
+    """Same output as ``ast.dump(node)`` without recursing on deep trees"""
+    if not isinstance(node, ast.AST):
+        raise TypeError('expected AST, got %r' % node.__class__.__name__)
+
+    results = []
+    stack = [(node, None)]
+    while stack:
+        item, parts = stack.pop()
+        if parts is not None:
+            # All children are formatted; assemble this node
+            values = results[len(results) - len(parts):]
+            del results[len(results) - len(parts):]
+            if isinstance(item, list):
+                results.append("[%s]" % ", ".join(values))
+            else:
+                args = ["%s=%s" % (name, value) for name, value in zip(parts, values)]
+                results.append("%s(%s)" % (item.__class__.__name__, ", ".join(args)))
+        elif isinstance(item, ast.AST):
+            cls = type(item)
+            names, children = [], []
+            for name in item._fields:
+                try:
+                    value = getattr(item, name)
+                except AttributeError:
+                    continue
+                if value is None and getattr(cls, name, ...) is None:
+                    continue
+                names.append(name)
+                children.append(value)
+            stack.append((item, names))
+            stack.extend((child, None) for child in reversed(children))
+        elif isinstance(item, list):
+            stack.append((item, item))
+            stack.extend((child, None) for child in reversed(item))
+        else:
+            results.append(repr(item))
+    return results[0]
+
+
+def _split_elifs(source):
+    """
+    Turn every ``elif`` into ``if`` padded to the same width, so no line or
+    column moves. Returns the new source and the ``(line, column)`` of each.
+    """
+    lines = source.splitlines(keepends=True)
+    elifs = set()
+    for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+        if tok.type == tokenize.NAME and tok.string == "elif":
+            row, col = tok.start
+            lines[row - 1] = lines[row - 1][:col] + "if  " + lines[row - 1][col + 4:]
+            elifs.add(tok.start)
+    return "".join(lines), elifs
+
+
+def _join_elifs(tree, elifs):
+    """Nest each ``if`` that was an ``elif`` into the ``orelse`` of the one before it"""
+    if not elifs:
+        return
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        for name, value in ast.iter_fields(node):
+            if not (isinstance(value, list) and value and isinstance(value[0], ast.stmt)):
+                continue
+            kept = []
+            chain = []
+            for statement in value:
+                if chain and isinstance(statement, ast.If) and (statement.lineno, statement.col_offset) in elifs:
+                    chain[-1].orelse = [statement]
+                    chain.append(statement)
+                    continue
+                _close_chain(chain)
+                chain = [statement] if isinstance(statement, ast.If) and not statement.orelse else []
+                kept.append(statement)
+            _close_chain(chain)
+            value[:] = kept
+        stack.extend(ast.iter_child_nodes(node))
+
+
+def _close_chain(chain):
+    """Every ``if`` of a chain ends where its last clause does, as ``ast.parse`` has it"""
+    if len(chain) > 1:
+        last = chain[-1]
+        for statement in chain[:-1]:
+            statement.end_lineno, statement.end_col_offset = last.end_lineno, last.end_col_offset
+
+
+def _group_long_chains(source):
+    """Wrap long operator chains in ``__pyjs_chain__(...)`` groups"""
+    line_starts = [0]
+    for line in source.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+
+    def offset(position):
+        row, col = position
+        return line_starts[row - 1] + col
+
+    insertions = []
+    segments = [[]]
+    opened = []
+    for tok in tokenize.generate_tokens(io.StringIO(source).readline):
+        if tok.type in (tokenize.NL, tokenize.COMMENT):
+            continue
+        if tok.type == tokenize.OP and tok.string in _OPEN:
+            opened.append(tok)
+            segments.append([])
+            continue
+        if tok.type == tokenize.OP and tok.string in _OPEN.values() and opened:
+            _group_segment(segments.pop(), insertions)
+            start = opened.pop()
+            segments[-1].append(("atom", offset(start.start), offset(tok.end)))
+            continue
+
+        is_delimiter = (
+            tok.type in (tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER)
+            or (tok.type == tokenize.OP and tok.string in _DELIMITERS)
+            or (tok.type == tokenize.NAME and tok.string in _DELIMITER_KEYWORDS)
+        )
+        if is_delimiter:
+            _group_segment(segments[-1], insertions)
+            segments[-1] = []
+        elif (tok.type == tokenize.OP and tok.string != "...") or (
+            tok.type == tokenize.NAME and tok.string == "await"
+        ):
+            segments[-1].append((tok.string, offset(tok.start), offset(tok.end)))
+        else:
+            segments[-1].append(("atom", offset(tok.start), offset(tok.end)))
+
+    # Opening groups sort outermost first, closing groups innermost first
+    insertions.sort()
+    pieces = []
+    last = 0
+    for position, _, _, text, end in insertions:
+        pieces.append(source[last:position])
+        pieces.append(text)
+        last = end
+    pieces.append(source[last:])
+    return "".join(pieces)
+
+
+def _group_segment(items, insertions):
+    """
+    Record group insertions for every long chain in one expression. Each
+    insertion replaces ``source[position:end]``, which is empty except for
+    the operators a flattened factor drops.
+    """
+    pending = [(0, len(items), 0)]
+    while pending:
+        lo, hi, depth = pending.pop()
+
+        # Binary operators follow an operand; everything else is unary
+        binary = []
+        for i in range(lo + 1, hi):
+            kind = items[i][0]
+            if kind in _TOKEN_CLASS and items[i - 1][0] == "atom":
+                binary.append(i)
+        if not binary:
+            _flatten_factor(items, lo, hi, depth, insertions)
+            continue
+        level = min(_TOKEN_CLASS[items[i][0]] for i in binary)
+        splits = [i for i in binary if _TOKEN_CLASS[items[i][0]] == level]
+
+        bounds = [lo] + [i + 1 for i in splits]
+        ends = splits + [hi]
+        operands = [(items[b][1], items[e - 1][2]) for b, e in zip(bounds, ends) if b < e]
+        for b, e in zip(bounds, ends):
+            pending.append((b, e, depth + 1))
+
+        group_level = 0
+        while len(operands) > _GROUP_SIZE:
+            groups = [operands[i:i + _GROUP_SIZE] for i in range(0, len(operands), _GROUP_SIZE)]
+            if len(groups[-1]) == 1:
+                groups[-2].extend(groups.pop())
+            for group in groups:
+                insertions.append((group[0][0], 1, (depth, -group_level), _GROUP + "(", group[0][0]))
+                insertions.append((group[-1][1], 0, (-depth, group_level), ")", group[-1][1]))
+            operands = [(group[0][0], group[-1][1]) for group in groups]
+            group_level += 1
+
+
+def _flatten_factor(items, lo, hi, depth, insertions):
+    """
+    Record the edits that turn a factor nesting deeper than a group, such as
+    ``- - x ** - y ** z``, into ``__pyjs_factor__('--', x, '-', y, '', z)``:
+    each primary preceded by the unary operators applied to it, where every
+    primary is raised to the power of the rest.
+    """
+    parts = []
+    i = lo
+    while True:
+        first = i
+        while i < hi and items[i][0] in _UNARY:
+            i += 1
+        start = i
+        while i < hi and items[i][0] in _PRIMARY:
+            i += 1
+        if start == i:
+            # Not a factor this function understands, such as *args
+            return
+        parts.append((first, start, i))
+        if i == hi:
+            break
+        if items[i][0] != "**":
+            return
+        i += 1
+    if sum(start - first for first, start, _ in parts) + len(parts) - 1 <= _GROUP_SIZE:
+        return
+
+    for index, (first, start, _) in enumerate(parts):
+        ops = repr("".join(items[k][0] for k in range(first, start)))
+        # Replace from the ** (or the factor's start) up to the primary
+        begin = items[first - 1][1] if index else items[first][1]
+        text = f"{_FACTOR}({ops}, " if index == 0 else f", {ops}, "
+        insertions.append((begin, 1, (depth, 0), text, items[start][1]))
+    end = items[parts[-1][2] - 1][2]
+    insertions.append((end, 0, (-depth, -1), ")", end))
+
+
+def _is_group(node):
+    return (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == _GROUP
+        and len(node.args) == 1
+        and not node.keywords
+    )
+
+
+def _rebuild_chain(node):
+    """
+    Flatten a chain that may contain groups and rebuild it left-associative.
+
+    Returns the new node and the ``BinOp`` nodes created for its spine.
+    """
+    if _is_group(node):
+        node = node.args[0]
+    if not isinstance(node, ast.BinOp) or type(node.op) not in _NODE_CLASS:
+        return node, []
+    level = _NODE_CLASS[type(node.op)]
+
+    sequence = []
+    work = [(node, True)]
+    while work:
+        item, expand = work.pop()
+        if isinstance(item, ast.operator):
+            sequence.append(item)
+            continue
+        if expand and _is_group(item):
+            item = item.args[0]
+        if expand and isinstance(item, ast.BinOp) and _NODE_CLASS.get(type(item.op)) == level:
+            work.append((item.right, _is_group(item.right)))
+            work.append((item.op, False))
+            work.append((item.left, True))
+        else:
+            sequence.append(item)
+
+    result = sequence[0]
+    spine = []
+    for i in range(1, len(sequence), 2):
+        op, right = sequence[i], sequence[i + 1]
+        binop = ast.BinOp(left=result, op=op, right=right)
+        binop.lineno, binop.col_offset = result.lineno, result.col_offset
+        binop.end_lineno, binop.end_col_offset = right.end_lineno, right.end_col_offset
+        result = binop
+        spine.append(binop)
+    return result, spine
+
+
+def _splice_groups(tree):
+    """Replace every ``__pyjs_chain__`` group with the chain it stands for"""
+    # Spine nodes are already rebuilt; re-flattening them would be quadratic
+    rebuilt = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        for name, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    if isinstance(item, ast.AST):
+                        value[i] = _splice_child(item, rebuilt, stack)
+            elif isinstance(value, ast.AST):
+                setattr(node, name, _splice_child(value, rebuilt, stack))
+
+
+def _is_factor(node):
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == _FACTOR
+
+
+def _rebuild_factor(node):
+    """Nest a flattened factor's unary operators and ``**`` back up, innermost first"""
+    result = None
+    for i in range(len(node.args) - 2, -1, -2):
+        ops, operand = node.args[i].value, node.args[i + 1]
+        if result is None:
+            result = operand
+        else:
+            result = ast.BinOp(left=operand, op=ast.Pow(), right=result)
+            result.lineno, result.col_offset = operand.lineno, operand.col_offset
+            result.end_lineno, result.end_col_offset = node.end_lineno, node.end_col_offset
+        for op in reversed(ops):
+            result = ast.copy_location(ast.UnaryOp(op=_UNARY[op](), operand=result), node)
+    return result
+
+
+def _splice_child(node, rebuilt, stack):
+    if _is_factor(node):
+        node = _rebuild_factor(node)
+    if id(node) not in rebuilt and isinstance(node, ast.expr):
+        node, spine = _rebuild_chain(node)
+        rebuilt.update(id(binop) for binop in spine)
+    # Leaves and operator/context nodes cannot hold a group
+    if not isinstance(node, _LEAVES):
+        stack.append(node)
+    return node
+
+
+_LEAVES = (ast.Name, ast.Constant, ast.operator, ast.expr_context, ast.unaryop, ast.cmpop, ast.boolop)
@@ -553,28 +553,10 @@ class IRToJsConverter:
             value_type = value.get('type', '')
             
             if value_type == 'binary_operation':
-                left = self._convert_value(value.get('left', ''))
-                op = value.get('op', '')
-                right = self._convert_value(value.get('right', ''))
-                
-                # Map Python operator to JavaScript operator
-                op_map = {
-                    "Add": "+",
-                    "Sub": "-",
-                    "Mult": "*",
-                    "Div": "/",
-                    "Mod": "%",
-                    "FloorDiv": "Math.floor(/)",  # Special case
-                    "Pow": "**"
-                }
-                
-                js_op = op_map.get(op, "+")
-                
-                # Special case for floor division
-                if js_op == "Math.floor(/)":
-                    return f"Math.floor({left} / {right})"
-                
-                return f"{left} {js_op} {right}"
+                return self._convert_binary_operation(value)
+            
+            elif value_type == 'binary_postfix':
+                return self._convert_binary_postfix(value)
             
             elif value_type == 'name':
                 return value.get('id', '')
@@ -682,6 +664,78 @@ class IRToJsConverter:
             # For other types, return as is
             return value
 
+    def _convert_binary_operation(self, value):
+        """Convert nested binary_operation dicts post-order from an explicit stack"""
+        results = []
+        stack = [(value, False)]
+        while stack:
+            current, ready = stack.pop()
+            if not (isinstance(current, dict) and current.get('type', '') == 'binary_operation'):
+                results.append(self._convert_value(current))
+                continue
+            if not ready:
+                stack.append((current, True))
+                stack.append((current.get('right', ''), False))
+                stack.append((current.get('left', ''), False))
+                continue
+            
+            right = results.pop()
+            left = results.pop()
+            results.append(self._binary_js(left, current.get('op', ''), right))
+        
+        return results.pop()
+
+    def _convert_binary_postfix(self, value):
+        """Convert a binary_postfix item list, grouping each nested operation"""
+        # Operations are kept as (left, op, right) triples and written out
+        # once at the end, so a long chain is not copied at every step
+        results = []
+        for item in value.get('items', []):
+            if isinstance(item, dict) and item.get('type', '') == 'operator':
+                right = results.pop()
+                left = results.pop()
+                results.append((left, item.get('op', ''), right))
+            else:
+                results.append(self._convert_value(item))
+        
+        pieces = []
+        stack = [(results.pop(), False)]
+        while stack:
+            current, grouped = stack.pop()
+            if isinstance(current, str):
+                pieces.append(current)
+                continue
+            left, op, right = current
+            prefix, infix, suffix = self._binary_js("\0", op, "\0").split("\0")
+            if grouped:
+                prefix, suffix = "(" + prefix, suffix + ")"
+            stack.append((suffix, False))
+            stack.append((right, True))
+            stack.append((infix, False))
+            stack.append((left, True))
+            stack.append((prefix, False))
+        return "".join(pieces)
+
+    def _binary_js(self, left, op, right):
+        """JavaScript for one binary operation on converted operands"""
+        # Map Python operator to JavaScript operator
+        op_map = {
+            "Add": "+",
+            "Sub": "-",
+            "Mult": "*",
+            "Div": "/",
+            "Mod": "%",
+            "FloorDiv": "Math.floor(/)",  # Special case
+            "Pow": "**"
+        }
+        
+        js_op = op_map.get(op, "+")
+        
+        # Special case for floor division
+        if js_op == "Math.floor(/)":
+            return f"Math.floor({left} / {right})"
+        return f"{left} {js_op} {right}"
+
     def _extract_fstring_parts(self, fstring_expr):
         """Extract parts from an f-string expression"""
         parts = []
@@ -1,4 +1,7 @@
+import codecs
+import mmap
 import re
+from itertools import islice
 
 class Token:
     def __init__(self, type, value, line, position):
@@ -16,7 +19,9 @@ class LexicalAnalyzer:
         
         # Token patterns
         self.patterns = [
-            ('KEYWORD', r'\b(def|if|else|elif|for|while|return|import|from|as|class|try|except|finally|with|in|is|not|and|or|True|False|None)\b'),
+            # Tokens are matched at an offset into the line, where \b would
+            # look back at the previous token; a token start is a boundary
+            ('KEYWORD', r'(def|if|else|elif|for|while|return|import|from|as|class|try|except|finally|with|in|is|not|and|or|True|False|None)\b'),
             ('IDENTIFIER', r'[a-zA-Z_][a-zA-Z0-9_]*'),
             ('NUMBER', r'\d+(\.\d+)?'),
             ('STRING', r'\".*?\"|\'.*?\''),
@@ -32,34 +37,85 @@ class LexicalAnalyzer:
     
     def tokenize(self, code):
         """source code to tokens"""
-        self.tokens = []
-        lines = code.split('\n')
+        self.tokens = list(self.iter_tokens(code))
+        return self.tokens
+    
+    def iter_tokens(self, code):
+        """Yield tokens lazily, one line at a time"""
+        line_num = 0
+        start = 0
+        while True:
+            line_num += 1
+            end = code.find('\n', start)
+            line = code[start:] if end == -1 else code[start:end]
+            yield from self._tokenize_line(line, line_num)
+            if end == -1:
+                break
+            start = end + 1
+    
+    def iter_file_tokens(self, path, encoding='utf-8'):
+        """
+        Yield the tokens of a file without reading it into memory.
         
-        for line_num, line in enumerate(lines, 1):
-            position = 0
-            while position < len(line):
-                match = None
-                for token_type, pattern in self.regex_patterns:
-                    regex_match = pattern.match(line[position:])
-                    if regex_match:
-                        value = regex_match.group(0)
-                        if token_type not in ['WHITESPACE', 'COMMENT']:  # Skip whitespace and comments
-                            self.tokens.append(Token(token_type, value, line_num, position))
-                        position += len(value)
-                        match = True
+        The file is memory-mapped and decoded one line at a time, so only
+        the current line is held as text; the tokens match ``tokenize`` of
+        the decoded file. The encoding must keep ``\\n`` a
+        single byte, as UTF-8 and the ASCII-based encodings do.
+        """
+        with open(path, 'rb') as f:
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                data = b''
+            try:
+                decoder = codecs.getincrementaldecoder(encoding)()
+                line_num = 0
+                start = 0
+                while True:
+                    line_num += 1
+                    end = data.find(b'\n', start)
+                    chunk = data[start:] if end == -1 else data[start:end]
+                    line = decoder.decode(chunk, final=end == -1)
+                    yield from self._tokenize_line(line, line_num)
+                    if end == -1:
                         break
-                
-                if not match:
-                    # Handle unrecognized character
-                    self.tokens.append(Token('ERROR', line[position], line_num, position))
-                    position += 1
-        
-        return self.tokens
+                    start = end + 1
+            finally:
+                if isinstance(data, mmap.mmap):
+                    data.close()
+    
+    def _tokenize_line(self, line, line_num):
+        position = 0
+        while position < len(line):
+            match = None
+            for token_type, pattern in self.regex_patterns:
+                # Matching in place instead of on line[position:] keeps a
+                # long line linear
+                regex_match = pattern.match(line, position)
+                if regex_match:
+                    value = regex_match.group(0)
+                    if token_type not in ['WHITESPACE', 'COMMENT']:  # Skip whitespace and comments
+                        yield Token(token_type, value, line_num, position)
+                    position += len(value)
+                    match = True
+                    break
+            
+            if not match:
+                # Handle unrecognized character
+                yield Token('ERROR', line[position], line_num, position)
+                position += 1
 
-def analyze_code(code):
-    """lexical analysis"""
+def analyze_code(code, offset=0, limit=None):
+    """
+    lexical analysis
+    
+    ``offset`` and ``limit`` select a page of the token list; only the
+    tokens up to the end of that page are lexed.
+    """
     lexer = LexicalAnalyzer()
-    tokens = lexer.tokenize(code)
+    stop = None if limit is None else offset + limit
+    tokens = islice(lexer.iter_tokens(code), offset, stop)
     
     # tokens to a serializable format
     token_list = [
@@ -72,4 +128,27 @@ def analyze_code(code):
         for token in tokens
     ]
     
-    return token_list
\ No newline at end of file
+    return token_list
+
+def analyze_file(path, batch_size=1000, encoding='utf-8'):
+    """
+    streaming lexical analysis of a file
+    
+    Yields lists of at most ``batch_size`` serialized tokens. Neither the
+    file's lines nor its full token list are ever held in memory.
+    """
+    lexer = LexicalAnalyzer()
+    tokens = lexer.iter_file_tokens(path, encoding)
+    while True:
+        batch = [
+            {
+                'type': token.type,
+                'value': token.value,
+                'line': token.line,
+                'position': token.position
+            }
+            for token in islice(tokens, batch_size)
+        ]
+        if not batch:
+            break
+        yield batch
\ No newline at end of file
@@ -0,0 +1,97 @@
+import threading
+from pytojs import TranspileLimits, BudgetExceeded
+from sessions import SessionError, apply_edits, diff_ranges
+
+class LiveChannel:
+    """
+    Live transpilation for one editor connection.
+
+    Clients send ``{"version": n, "code": "..."}`` to replace the buffer or
+    ``{"version": n, "edits": [...]}`` to patch it (edits as in sessions).
+    A worker thread transpiles the newest buffer and pushes
+    ``{"type": "update", "version": n, "changes": [...]}``, where the
+    changes apply to the JavaScript of the previous update. Messages that
+    arrive while a transpile runs are coalesced, and a running transpile is
+    cancelled as soon as a newer version arrives.
+    """
+
+    def __init__(self, send, transpile, limits=None):
+        self._send = send
+        self.transpile = transpile
+        self.limits = limits or TranspileLimits()
+        self.code = ""
+        self.version = -1
+        self.javascript = ""
+        self._cond = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._pending = False
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._worker.start()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def send(self, message):
+        # The worker and the receiving thread share one socket
+        with self._send_lock:
+            self._send(message)
+
+    def receive(self, message):
+        """Apply one client message to the buffer and wake the worker"""
+        try:
+            version = int(message["version"])
+        except (KeyError, TypeError, ValueError):
+            raise SessionError("Messages need an integer 'version'")
+
+        with self._cond:
+            if version <= self.version:
+                raise SessionError(f"Version {version} is not newer than {self.version}", status=409)
+            if "code" in message:
+                self.code = str(message["code"])
+            else:
+                self.code = apply_edits(self.code, message.get("edits", []))
+            self.version = version
+            self._pending = True
+            self._cond.notify()
+
+    def _superseded(self, version):
+        return self._closed or self.version != version
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                code, version = self.code, self.version
+                self._pending = False
+
+            limits = TranspileLimits(
+                max_source_bytes=self.limits.max_source_bytes,
+                max_nodes=self.limits.max_nodes,
+                max_output_bytes=self.limits.max_output_bytes,
+                timeout=self.limits.timeout,
+                cancel=lambda: self._superseded(version),
+            )
+            try:
+                javascript, error = self.transpile(code, limits=limits)
+            except BudgetExceeded as e:
+                if e.kind == "cancelled":
+                    continue
+                javascript, error = None, str(e)
+
+            # Drop results for versions the client has already moved past
+            if self._superseded(version):
+                continue
+            if error:
+                self.send({"type": "error", "version": version, "error": error})
+                continue
+            changes = diff_ranges(self.javascript, javascript)
+            self.javascript = javascript
+            self.send({"type": "update", "version": version, "changes": changes})
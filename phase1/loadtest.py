@@ -0,0 +1,247 @@
+"""
+Load generator for the /convert endpoint.
+
+    python loadtest.py --rate 50 --duration 10
+    python loadtest.py --find-saturation --output results.json
+    python loadtest.py --url http://127.0.0.1:5000 --corpus examples/*.py
+
+Requests are sent open-loop: each one is scheduled at a fixed time for the
+target rate and its latency is measured from that time, so a slow server
+cannot hide its queueing delay by slowing the generator down. Without
+``--url`` the app runs in-process behind Flask's test client; ``--spawn``
+starts it as a separate server process instead.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pytojs import __version__
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Default request mix: (weight, /convert payload)
+DEFAULT_MIX = [
+    (6, {"code": "a = 10\nb = a * 2 + 1\nprint(b)"}),
+    (3, {"code": (
+        "def factorial(n):\n"
+        "    if n <= 1:\n"
+        "        return 1\n"
+        "    return n * factorial(n - 1)\n"
+        "\n"
+        "for i in range(10):\n"
+        "    print(f\"{i}! = {factorial(i)}\")\n"
+    )}),
+    (1, {"code": "\n".join(f"value_{i} = value_{i - 1} + {i}" for i in range(1, 400)),
+         "fields": ["javascript", "stats"]}),
+]
+
+def load_corpus(patterns, fields=None):
+    """Build an equally weighted mix from Python files matching ``patterns``"""
+    mix = []
+    for pattern in patterns:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, encoding="utf-8") as f:
+                payload = {"code": f.read()}
+            if fields:
+                payload["fields"] = fields
+            mix.append((1, payload))
+    if not mix:
+        raise ValueError(f"No corpus files match {', '.join(patterns)}")
+    return mix
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(-(-fraction * len(ordered) // 1)))
+    return ordered[rank - 1]
+
+class InProcessClient:
+    """Posts to the app through Flask's test client, one client per thread"""
+
+    def __init__(self):
+        from app import app
+        self.app = app
+        self._local = threading.local()
+
+    def post(self, payload):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        return client.post("/convert", json=payload).status_code
+
+class HTTPClient:
+    """Posts to a running server, reusing one connection per thread"""
+
+    def __init__(self, url):
+        import requests
+        self.requests = requests
+        self.url = url.rstrip("/") + "/convert"
+        self._local = threading.local()
+
+    def post(self, payload):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self.requests.Session()
+        try:
+            return session.post(self.url, json=payload, timeout=30).status_code
+        except self.requests.RequestException:
+            return None
+
+def spawn_server(port):
+    """Start the app in a subprocess and wait until it accepts requests"""
+    import requests
+    process = subprocess.Popen(
+        [sys.executable, "-c", f"from app import app; app.run(port={port}, threaded=True)"],
+        cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 15
+    while time.monotonic() < deadline:
+        try:
+            requests.post(url + "/convert", json={"code": "pass"}, timeout=1)
+            return process, url
+        except requests.RequestException:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Server did not start within 15 seconds")
+
+def run_load(client, mix, rate, duration, concurrency=64, unique=False, seed=0):
+    """
+    Send requests at ``rate`` per second for ``duration`` seconds.
+
+    Payloads are drawn from ``mix`` by weight. With ``unique`` each source
+    gets a distinct trailing comment so the result cache cannot answer it.
+    Returns a summary dict with throughput, latency percentiles in
+    milliseconds and the error rate.
+    """
+    rng = random.Random(seed)
+    weights = [weight for weight, _ in mix]
+    payloads = [payload for _, payload in mix]
+    total = max(1, int(rate * duration))
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def send(payload, scheduled):
+        status = client.post(payload)
+        finished = time.perf_counter()
+        with lock:
+            latencies.append(finished - scheduled)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(total):
+            payload = rng.choices(payloads, weights)[0]
+            if unique:
+                payload = dict(payload, code=payload["code"] + f"\n# request {seed}-{i}\n")
+            scheduled = started + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, payload, scheduled)
+    elapsed = time.perf_counter() - started
+
+    errors = sum(count for status, count in statuses.items() if status != "200")
+    millis = [latency * 1000 for latency in latencies]
+    return {
+        "target_rate": rate,
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput": round(total / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(millis, 0.50), 3),
+            "p95": round(percentile(millis, 0.95), 3),
+            "p99": round(percentile(millis, 0.99), 3),
+            "max": round(max(millis), 3),
+        },
+        "error_rate": round(errors / total, 4),
+        "statuses": statuses,
+    }
+
+def find_saturation(client, mix, start_rate=10, step=1.5, duration=5, max_p99_ms=500,
+                    max_error_rate=0.01, max_rate=100_000, **options):
+    """
+    Raise the rate until the service stops keeping up.
+
+    A step fails when throughput falls below 90% of the target, p99 latency
+    goes over ``max_p99_ms`` or the error rate over ``max_error_rate``. The
+    saturation point is the last rate that passed.
+    """
+    steps = []
+    saturation = None
+    rate = start_rate
+    while rate <= max_rate:
+        # A new seed per step keeps --unique sources from repeating
+        result = run_load(client, mix, rate, duration, seed=len(steps), **options)
+        result["passed"] = (
+            result["throughput"] >= 0.9 * rate
+            and result["latency_ms"]["p99"] <= max_p99_ms
+            and result["error_rate"] <= max_error_rate
+        )
+        steps.append(result)
+        if not result["passed"]:
+            break
+        saturation = rate
+        rate = round(rate * step, 2)
+    return {"saturation_rate": saturation, "steps": steps}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the /convert endpoint")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Server to test, e.g. http://127.0.0.1:5000")
+    target.add_argument("--spawn", action="store_true", help="Start the app in a subprocess")
+    parser.add_argument("--port", type=int, default=5055, help="Port for --spawn")
+    parser.add_argument("--corpus", nargs="+", help="Python files (globs) to send instead of the default mix")
+    parser.add_argument("--fields", help="Comma-separated /convert fields for corpus requests")
+    parser.add_argument("--rate", type=float, default=20, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per run or saturation step")
+    parser.add_argument("--concurrency", type=int, default=64, help="Maximum requests in flight")
+    parser.add_argument("--unique", action="store_true", help="Make every source distinct to bypass caching")
+    parser.add_argument("--find-saturation", action="store_true", help="Step the rate up until the service saturates")
+    parser.add_argument("--max-p99-ms", type=float, default=500, help="Latency limit for saturation steps")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    fields = args.fields.split(",") if args.fields else None
+    mix = load_corpus(args.corpus, fields) if args.corpus else DEFAULT_MIX
+
+    process = None
+    if args.spawn:
+        process, url = spawn_server(args.port)
+        client = HTTPClient(url)
+    elif args.url:
+        client = HTTPClient(args.url)
+    else:
+        client = InProcessClient()
+
+    options = {"concurrency": args.concurrency, "unique": args.unique}
+    try:
+        if args.find_saturation:
+            result = find_saturation(client, mix, start_rate=args.rate, duration=args.duration,
+                                     max_p99_ms=args.max_p99_ms, **options)
+        else:
+            result = run_load(client, mix, args.rate, args.duration, **options)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    result["target"] = args.url or ("spawn" if args.spawn else "in-process")
+    result["version"] = __version__
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+
+if __name__ == "__main__":
+    main()
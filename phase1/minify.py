@@ -0,0 +1,163 @@
+import ast
+import itertools
+import string
+
+# Words a mangled name must never be
+JS_RESERVED = {
+    "break", "case", "catch", "class", "const", "continue", "debugger", "default", "delete",
+    "do", "else", "enum", "export", "extends", "false", "finally", "for", "function", "if",
+    "implements", "import", "in", "instanceof", "interface", "let", "new", "null", "of",
+    "package", "private", "protected", "public", "return", "static", "super", "switch",
+    "this", "throw", "true", "try", "typeof", "var", "void", "while", "with", "yield",
+    "async", "await", "get", "set", "arguments", "eval", "undefined", "NaN", "Infinity",
+}
+
+# Globals the emitter writes into generated code, plus the parameters of
+# the arrow function it emits for range()
+EMITTER_NAMES = {"console", "Math", "parseInt", "parseFloat", "String", "Number", "BigInt", "Array", "Map", "_", "i"}
+
+# Python calls that look up locals by name, which renaming would break
+_INTROSPECTION = {"locals", "vars", "eval", "exec"}
+
+_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef,
+           ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+_WORD = set(string.ascii_letters + string.digits + "_$")
+
+def short_names():
+    """a, b, ..., Z, aa, ab, ... in order of length"""
+    first = string.ascii_letters
+    rest = string.ascii_letters + string.digits
+    for length in itertools.count(1):
+        for head in first:
+            for tail in itertools.product(rest, repeat=length - 1):
+                yield head + "".join(tail)
+
+def mangle_locals(tree):
+    """
+    Rename each function's parameters and local variables to the shortest
+    names that are free in that function.
+
+    Only function scopes are renamed, so module-level names, function names
+    and attributes keep their spelling. Functions with nested scopes,
+    ``global``/``nonlocal`` or calls such as ``locals()`` are left alone.
+    The most used locals get the shortest names, ties going to the first
+    declared. Returns the number of
+    names renamed.
+    """
+    renamed = 0
+    for function in ast.walk(tree):
+        if isinstance(function, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            renamed += _mangle_function(function)
+    return renamed
+
+def _mangle_function(function):
+    nodes = [node for statement in function.body for node in ast.walk(statement)]
+    for node in nodes:
+        if isinstance(node, _SCOPES) or isinstance(node, (ast.Global, ast.Nonlocal)):
+            return 0
+        if isinstance(node, ast.Name) and node.id in _INTROSPECTION:
+            return 0
+
+    arguments = function.args
+    params = [arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs]
+    params += [arg for arg in (arguments.vararg, arguments.kwarg) if arg is not None]
+    # Parameters first, then locals in order of first assignment
+    uses = dict.fromkeys([arg.arg for arg in params] +
+                         [node.id for node in nodes
+                          if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load)], 0)
+    avoid = set(JS_RESERVED) | EMITTER_NAMES
+    for arg in params:
+        uses[arg.arg] += 1
+    for node in nodes:
+        if isinstance(node, ast.Name):
+            if node.id in uses:
+                uses[node.id] += 1
+            else:
+                # Globals stay reachable under both spellings the emitter uses
+                avoid.add(node.id)
+                avoid.add(_camel_case(node.id))
+
+    names = (name for name in short_names() if name not in avoid)
+    mapping = {}
+    for name in sorted(uses, key=lambda name: -uses[name]):
+        mapping[name] = next(names)
+
+    for arg in params:
+        arg.arg = mapping[arg.arg]
+    for node in nodes:
+        if isinstance(node, ast.Name) and node.id in mapping:
+            node.id = mapping[node.id]
+    return sum(1 for old, new in mapping.items() if old != new)
+
+def _camel_case(name):
+    if "_" not in name:
+        return name
+    parts = name.split("_")
+    return parts[0] + "".join(p.capitalize() for p in parts[1:])
+
+def compact(js_code):
+    """
+    Squeeze whitespace and comments out of generated JavaScript.
+
+    Strings and template literals are copied unchanged. A space is kept
+    only where removing it would join two words (``let x``) or turn
+    ``- -`` into ``--``. Generated statements end in ``;`` or ``}``, so
+    dropping newlines never changes how the code parses.
+    """
+    out = []
+    i = 0
+    n = len(js_code)
+    space = False
+    while i < n:
+        char = js_code[i]
+        if char in " \t\r\n":
+            space = True
+            i += 1
+            continue
+        if char == "/" and js_code.startswith("//", i):
+            end = js_code.find("\n", i)
+            i = n if end == -1 else end
+            space = True
+            continue
+        if space and out:
+            previous = out[-1][-1]
+            if (previous in _WORD and char in _WORD) or (previous in "+-" and char == previous):
+                out.append(" ")
+        space = False
+        if char in "\"'`":
+            end = _literal_end(js_code, i)
+            out.append(js_code[i:end])
+            i = end
+            continue
+        out.append(char)
+        i += 1
+    return "".join(out)
+
+def _literal_end(js_code, start):
+    """Index just past the string or template literal starting at ``start``"""
+    quote = js_code[start]
+    i = start + 1
+    depth = 0
+    while i < len(js_code):
+        char = js_code[i]
+        if char == "\\":
+            i += 2
+            continue
+        if depth:
+            # Inside ${...}: skip nested literals and track braces
+            if char in "\"'`":
+                i = _literal_end(js_code, i)
+                continue
+            if char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+        elif char == quote:
+            return i + 1
+        elif quote == "`" and js_code.startswith("${", i):
+            depth = 1
+            i += 2
+            continue
+        i += 1
+    return len(js_code)
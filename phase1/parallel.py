@@ -0,0 +1,111 @@
+import ast
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pytojs import PyToJSTransformer, class_declarations, join_module, set_names
+
+# Modules smaller than this are transpiled in-process; pool start-up and
+# pickling would cost more than the transform
+MIN_CHUNK_BYTES = 20_000
+
+# Chunks per worker, so one slow chunk does not leave the others idle
+CHUNKS_PER_WORKER = 4
+
+def split_module(python_code, tree, chunks):
+    """
+    Split a module's source into runs of whole top-level statements.
+
+    ``tree`` is the parsed module. Runs are cut only between statements on
+    different lines (decorators stay with their definition) and are balanced
+    by source size. Returns at most ``chunks`` source strings, in order.
+    """
+    lines = python_code.splitlines(keepends=True)
+    starts = []
+    previous_end = 0
+    for node in tree.body:
+        first = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        # A statement sharing a line with the previous one cannot start a run
+        if first > previous_end:
+            starts.append(first - 1)
+        previous_end = node.end_lineno
+    if not starts:
+        return [python_code]
+    # Leading comments and blank lines go with the first run
+    starts[0] = 0
+
+    target = len(python_code) / chunks
+    pieces = []
+    run_start = 0
+    run_size = 0
+    for start, end in zip(starts, starts[1:] + [len(lines)]):
+        if run_size >= target and len(pieces) < chunks - 1:
+            pieces.append("".join(lines[run_start:start]))
+            run_start, run_size = start, 0
+        run_size += sum(len(line) for line in lines[start:end])
+    pieces.append("".join(lines[run_start:]))
+    return pieces
+
+def transpile_chunk(python_code, iterative=False, declarations=None, sets=None):
+    """
+    Transpile one run of top-level statements in a worker.
+
+    ``declarations`` are the module's class_declarations() and ``sets`` its
+    set_names(), since a chunk may use classes and sets bound in another.
+    Returns the code of each statement and the imports the run needs, ready
+    for join_module.
+    """
+    if iterative:
+        import deep_ast
+        tree = deep_ast.parse(python_code)
+    else:
+        tree = ast.parse(python_code)
+    return _transform(tree, iterative, declarations or class_declarations(tree),
+                      set_names(tree) if sets is None else sets)
+
+def _transform(tree, iterative, declarations, sets):
+    transformer = PyToJSTransformer(iterative=iterative)
+    transformer.begin_module(declarations, sets)
+    body = transformer.visit_statements(tree.body)
+    return body, transformer.imports
+
+def transpile_parallel(python_code, workers=None, iterative=False, executor=None):
+    """
+    Transpile a module with its top-level statements spread over processes.
+
+    The module is parsed once here to find statement boundaries; workers get
+    source text, not AST, and the pieces are joined back in source order, so
+    the result is identical to transpile_python_to_js. Pass ``executor`` to
+    reuse a process pool across calls. Returns a ``(js_code, error)`` tuple.
+    """
+    workers = workers or os.cpu_count() or 1
+    try:
+        if iterative:
+            import deep_ast
+            tree = deep_ast.parse(python_code)
+        else:
+            tree = ast.parse(python_code)
+    except SyntaxError as e:
+        return None, f"Python syntax error: {str(e)}"
+
+    chunks = min(workers * CHUNKS_PER_WORKER, len(python_code) // MIN_CHUNK_BYTES)
+    try:
+        declarations = class_declarations(tree)
+        sets = set_names(tree)
+        if workers == 1 or chunks < 2:
+            results = [_transform(tree, iterative, declarations, sets)]
+        else:
+            pieces = split_module(python_code, tree, chunks)
+            arguments = (pieces, [iterative] * len(pieces), [declarations] * len(pieces), [sets] * len(pieces))
+            if executor is not None:
+                results = list(executor.map(transpile_chunk, *arguments))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    results = list(pool.map(transpile_chunk, *arguments))
+    except Exception as e:
+        return None, f"Transpilation error: {str(e)}"
+
+    imports = set()
+    body = []
+    for chunk_body, chunk_imports in results:
+        imports |= chunk_imports
+        body.extend(chunk_body)
+    return join_module(imports, body), None
@@ -1,16 +1,52 @@
 import ast
-import json
-from lexical_analyzer import analyze_code
+
+def _is_power(node):
+    return isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow)
+
+def _unary_prefix(node):
+    """The arithmetic unary operators applied to an expression, and what they apply to"""
+    ops = []
+    while isinstance(node, ast.UnaryOp) and not isinstance(node.op, ast.Not):
+        ops.append(type(node.op).__name__)
+        node = node.operand
+    return ops, node
 
 class CodeParser(ast.NodeVisitor):
-    def __init__(self):
+    def __init__(self, iterative=False):
         self.ir = {"functions": [], "loops": [], "variables": [], "conditionals": [], "expressions": []}
+        # Walk the tree with an explicit stack instead of recursive generic_visit
+        self.iterative = iterative
+        self._pending = None
+        # elif clauses and inner links of operator chains, already recorded
+        # with the statement or expression they belong to
+        self._covered = set()
+        if iterative:
+            import deep_ast
+            self._dump = deep_ast.dump
+        else:
+            self._dump = ast.dump
+
+    def visit(self, node):
+        if not self.iterative or self._pending is not None:
+            return super().visit(node)
+        # Pre-order walk: each visitor's generic_visit pushes the children
+        self._pending = [node]
+        try:
+            while self._pending:
+                super().visit(self._pending.pop())
+        finally:
+            self._pending = None
+
+    def generic_visit(self, node):
+        if self._pending is None:
+            return super().generic_visit(node)
+        self._pending.extend(reversed(list(ast.iter_child_nodes(node))))
 
     def visit_FunctionDef(self, node):
         self.ir["functions"].append({
             "name": node.name,
             "args": [arg.arg for arg in node.args.args],
-            "body": [ast.dump(n) for n in node.body],
+            "body": [self._dump(n) for n in node.body],
             "lineno": node.lineno
         })
         self.generic_visit(node)
@@ -18,9 +54,9 @@ class CodeParser(ast.NodeVisitor):
     def visit_For(self, node):
         self.ir["loops"].append({
             "type": "for",
-            "target": ast.dump(node.target),
-            "iter": ast.dump(node.iter),
-            "body": [ast.dump(n) for n in node.body],
+            "target": self._dump(node.target),
+            "iter": self._dump(node.iter),
+            "body": [self._dump(n) for n in node.body],
             "lineno": node.lineno
         })
         self.generic_visit(node)
@@ -28,8 +64,8 @@ class CodeParser(ast.NodeVisitor):
     def visit_While(self, node):
         self.ir["loops"].append({
             "type": "while",
-            "condition": ast.dump(node.test),
-            "body": [ast.dump(stmt) for stmt in node.body],
+            "condition": self._dump(node.test),
+            "body": [self._dump(stmt) for stmt in node.body],
             "lineno": node.lineno
         })
         self.generic_visit(node)
@@ -37,18 +73,21 @@ class CodeParser(ast.NodeVisitor):
     def visit_AugAssign(self, node):
         self.ir["variables"].append({
             "type": "augassign",
-            "target": ast.dump(node.target),
+            "target": self._dump(node.target),
             "op": type(node.op).__name__,
-            "value": ast.dump(node.value),
+            "value": self._dump(node.value),
             "lineno": node.lineno
         })
         self.generic_visit(node)
 
     def visit_If(self, node):
+        if id(node) in self._covered:
+            self.generic_visit(node)
+            return
         current = {
             "type": "if",
-            "test": ast.dump(node.test),
-            "body": [ast.dump(stmt) for stmt in node.body],
+            "test": self._dump(node.test),
+            "body": [self._dump(stmt) for stmt in node.body],
             "lineno": node.lineno
         }
         chain = [current]
@@ -56,10 +95,11 @@ class CodeParser(ast.NodeVisitor):
         while orelse:
             if len(orelse) == 1 and isinstance(orelse[0], ast.If):
                 elif_node = orelse[0]
+                self._covered.add(id(elif_node))
                 current = {
                     "type": "elif",
-                    "test": ast.dump(elif_node.test),
-                    "body": [ast.dump(stmt) for stmt in elif_node.body],
+                    "test": self._dump(elif_node.test),
+                    "body": [self._dump(stmt) for stmt in elif_node.body],
                     "lineno": elif_node.lineno
                 }
                 chain.append(current)
@@ -67,7 +107,7 @@ class CodeParser(ast.NodeVisitor):
             else:
                 current = {
                     "type": "else",
-                    "body": [ast.dump(stmt) for stmt in orelse],
+                    "body": [self._dump(stmt) for stmt in orelse],
                     "lineno": orelse[0].lineno if orelse else None
                 }
                 chain.append(current)
@@ -77,19 +117,13 @@ class CodeParser(ast.NodeVisitor):
         self.generic_visit(node)
 
     def visit_Assign(self, node):
-        targets = [ast.dump(t) for t in node.targets]
+        targets = [self._dump(t) for t in node.targets]
         
         # Check if the value is a binary operation
         if isinstance(node.value, ast.BinOp):
-            # Create a more structured representation of the binary operation
-            value_info = {
-                "type": "binary_operation",
-                "left": self._process_operand(node.value.left),
-                "op": type(node.value.op).__name__,
-                "right": self._process_operand(node.value.right)
-            }
+            value_info = self._binary_operation(node.value)
         else:
-            value_info = ast.dump(node.value)
+            value_info = self._dump(node.value)
         
         self.ir["variables"].append({
             "targets": targets,
@@ -98,29 +132,104 @@ class CodeParser(ast.NodeVisitor):
         })
         self.generic_visit(node)
 
-    def _process_operand(self, node):
-        """Process an operand in a binary operation"""
-        if isinstance(node, ast.Name):
-            return {"type": "name", "id": node.id}
-        elif isinstance(node, ast.Constant):
-            return {"type": "constant", "value": node.value}
-        elif isinstance(node, ast.BinOp):
-            # Handle nested binary operations
+    def _binary_operation(self, node):
+        """
+        Structured form of a binary operation. A single operation keeps its
+        left and right operands; nested ones are listed in postfix order,
+        so the IR stays flat however long the expression.
+        """
+        if not (isinstance(node.left, ast.BinOp) or isinstance(node.right, ast.BinOp)):
             return {
                 "type": "binary_operation",
                 "left": self._process_operand(node.left),
                 "op": type(node.op).__name__,
                 "right": self._process_operand(node.right)
             }
-        else:
-            return ast.dump(node)
+        items = []
+        stack = [(node, False)]
+        while stack:
+            current, ready = stack.pop()
+            if not isinstance(current, ast.BinOp):
+                items.append(self._process_operand(current))
+            elif ready:
+                items.append({"type": "operator", "op": type(current.op).__name__})
+            else:
+                stack.append((current, True))
+                stack.append((current.right, False))
+                stack.append((current.left, False))
+        return {"type": "binary_postfix", "items": items}
+
+    def _process_operand(self, node):
+        """Process an operand in a binary operation"""
+        if isinstance(node, ast.Name):
+            return {"type": "name", "id": node.id}
+        if isinstance(node, ast.Constant):
+            return {"type": "constant", "value": node.value}
+        return self._dump(node)
 
     def visit_BinOp(self, node):
+        if id(node) in self._covered:
+            self.generic_visit(node)
+            return
+        if _is_power(node) and _is_power(_unary_prefix(node.right)[1]):
+            self._power_chain(node)
+            return
+        if not isinstance(node.left, ast.BinOp):
+            self.ir["expressions"].append({
+                "type": "binary_operation",
+                "left": self._dump(node.left),
+                "op": type(node.op).__name__,
+                "right": self._dump(node.right),
+                "lineno": node.lineno
+            })
+            self.generic_visit(node)
+            return
+        # a + b - c + ...: one entry with each operand dumped once, applied
+        # left to right, instead of an entry per link re-dumping the rest
+        operands = []
+        ops = []
+        link = node
+        while isinstance(link, ast.BinOp):
+            self._covered.add(id(link))
+            operands.append(link.right)
+            ops.append(type(link.op).__name__)
+            link = link.left
+        operands.append(link)
         self.ir["expressions"].append({
-            "type": "binary_operation",
-            "left": ast.dump(node.left),
-            "op": type(node.op).__name__,
-            "right": ast.dump(node.right),
+            "type": "binary_chain",
+            "operands": [self._dump(operand) for operand in reversed(operands)],
+            "ops": ops[::-1],
+            "associativity": "left",
+            "lineno": node.lineno
+        })
+        self.generic_visit(node)
+
+    def _power_chain(self, node):
+        """
+        The same for a ** b ** c ..., which nests to the right. The chain
+        continues through unary operators (a ** -b ** c); ``prefixes`` lists
+        those applied to the rest of the chain from each operand on.
+        """
+        operands = []
+        ops = []
+        prefixes = [[]]
+        link = node
+        while True:
+            self._covered.add(id(link))
+            operands.append(link.left)
+            ops.append(type(link.op).__name__)
+            unary, inner = _unary_prefix(link.right)
+            if not _is_power(inner):
+                operands.append(link.right)
+                break
+            prefixes.append(unary)
+            link = inner
+        self.ir["expressions"].append({
+            "type": "binary_chain",
+            "operands": [self._dump(operand) for operand in operands],
+            "ops": ops,
+            "associativity": "right",
+            "prefixes": prefixes + [[]],
             "lineno": node.lineno
         })
         self.generic_visit(node)
@@ -134,7 +243,7 @@ class CodeParser(ast.NodeVisitor):
                 elif isinstance(arg, ast.Name):
                     args.append({"type": "name", "id": arg.id})
                 else:
-                    args.append(ast.dump(arg))
+                    args.append(self._dump(arg))
             
             self.ir["expressions"].append({
                 "type": "call",
@@ -144,7 +253,7 @@ class CodeParser(ast.NodeVisitor):
             })
         self.generic_visit(node)
 
-def parse_code_to_ir(code: str) -> dict:
+def parse_code_to_ir(code: str, iterative: bool = False, include_tokens: bool = True) -> dict:
     """
     Parse Python code into an Intermediate Representation (IR).
     
@@ -153,20 +262,30 @@ def parse_code_to_ir(code: str) -> dict:
     
     Args:
         code: Python source code as a string
+        iterative: Walk the tree without recursion, for deeply nested input
+        include_tokens: Run the lexer and attach its tokens to the IR
         
     Returns:
         A dictionary containing the intermediate representation
     """
     # Step 1: Lexical analysis - Convert code to tokens
-    tokens = analyze_code(code)
+    tokens = None
+    if include_tokens:
+        from lexical_analyzer import analyze_code
+        tokens = analyze_code(code)
     
     # Step 2: Parse tree generation - Use Python's ast module
-    tree = ast.parse(code)
-    parser = CodeParser()
+    if iterative:
+        import deep_ast
+        tree = deep_ast.parse(code)
+    else:
+        tree = ast.parse(code)
+    parser = CodeParser(iterative=iterative)
     parser.visit(tree)
     
     # Step 3: Build the IR from the AST
     ir = parser.ir
-    ir["tokens"] = tokens
+    if include_tokens:
+        ir["tokens"] = tokens
     
     return ir
@@ -0,0 +1,1830 @@
+import ast
+import copy
+import fractions
+import math
+import time
+from pytojs import CountedFor, MapGet, Temporary, TypedArray
+
+# Registered pass classes by name, in registration order
+PASSES = {}
+
+# Passes each optimization level asks for; their dependencies are added
+OPT_LEVELS = {
+    0: [],
+    1: ["dead-expressions", "constant-folding", "range-loops"],
+    2: ["dead-expressions", "constant-folding", "constant-propagation", "inline-functions",
+        "range-loops", "loop-invariants", "type-inference", "typed-arrays", "integer-ranges", "dict-maps"],
+}
+
+def register_pass(cls):
+    """Class decorator that makes a Pass available by its name"""
+    if cls.name in PASSES:
+        raise ValueError(f"A pass named {cls.name!r} is already registered")
+    PASSES[cls.name] = cls
+    return cls
+
+class Pass:
+    """
+    An AST-to-AST rewrite run before JavaScript emission.
+
+    Subclasses set ``name``, list the passes that must run before them in
+    ``requires`` and implement ``run(tree)``, which rewrites the module in
+    place and returns how many changes it made. The manager sets ``budget``
+    (None when unlimited), which ``run`` polls as it walks the tree.
+    """
+    name = None
+    requires = ()
+    budget = None
+
+    def run(self, tree):
+        raise NotImplementedError
+
+def resolve(names):
+    """Pass names in run order, each after the passes it requires"""
+    ordered = []
+    for name in names:
+        # Depth-first over requirements with an explicit stack
+        stack = [(name, iter(_pass_class(name).requires))]
+        visiting = [name]
+        while stack:
+            current, requirements = stack[-1]
+            requirement = next(requirements, None)
+            if requirement is None:
+                stack.pop()
+                visiting.pop()
+                if current not in ordered:
+                    ordered.append(current)
+            elif requirement in visiting:
+                raise ValueError(f"Pass {requirement!r} depends on itself through {current!r}")
+            elif requirement not in ordered:
+                stack.append((requirement, iter(_pass_class(requirement).requires)))
+                visiting.append(requirement)
+    return ordered
+
+def _pass_class(name):
+    try:
+        return PASSES[name]
+    except KeyError:
+        raise ValueError(f"Unknown pass {name!r}")
+
+class PassManager:
+    """
+    Runs a pipeline of passes over a module.
+
+    After ``run`` the ``stats`` list holds one ``{"pass", "changes",
+    "time_ms"}`` record per pass. With a ``budget`` the transpile deadline
+    and cancel hook are checked between passes and, every
+    Budget.CHECK_INTERVAL nodes, while each pass walks the tree.
+    """
+
+    def __init__(self, names, budget=None):
+        self.passes = [PASSES[name]() for name in resolve(names)]
+        self.budget = budget
+        for optimization in self.passes:
+            optimization.budget = budget
+        self.stats = []
+
+    @classmethod
+    def for_level(cls, opt_level, budget=None):
+        if opt_level not in OPT_LEVELS:
+            raise ValueError(f"Optimization level must be one of {sorted(OPT_LEVELS)}, not {opt_level!r}")
+        return cls(OPT_LEVELS[opt_level], budget)
+
+    def run(self, tree):
+        for optimization in self.passes:
+            started = time.perf_counter()
+            changes = optimization.run(tree)
+            self.stats.append({
+                "pass": optimization.name,
+                "changes": changes,
+                "time_ms": round((time.perf_counter() - started) * 1000, 3),
+            })
+            if self.budget is not None:
+                self.budget.check_time()
+        return tree
+
+def polled(nodes, budget):
+    """Iterate ``nodes``, polling ``budget`` (if any) once per node"""
+    if budget is None:
+        return nodes
+    return _polling(nodes, budget)
+
+def _polling(nodes, budget):
+    for node in nodes:
+        budget.poll()
+        yield node
+
+def rewrite(root, replace, budget=None):
+    """
+    Apply ``replace`` bottom-up to every node below ``root``.
+
+    ``replace(node)`` returns a new node to put in its place or None to keep
+    it; children are rewritten before their parents, so a parent sees its
+    folded operands. Uses an explicit stack, so deep trees are fine.
+    Returns the number of nodes replaced.
+    """
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(ast.iter_child_nodes(node))
+
+    changes = 0
+    for node in polled(reversed(order), budget):
+        for name, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    if isinstance(item, ast.AST):
+                        new = replace(item)
+                        if new is not None:
+                            value[i] = new
+                            changes += 1
+            elif isinstance(value, ast.AST):
+                new = replace(value)
+                if new is not None:
+                    setattr(node, name, new)
+                    changes += 1
+    return changes
+
+def statement_lists(tree, budget=None):
+    """Every statement list in the tree: bodies, else branches and handlers"""
+    for node in polled(ast.walk(tree), budget):
+        for field in ("body", "orelse", "finalbody"):
+            statements = getattr(node, field, None)
+            if isinstance(statements, list) and statements and isinstance(statements[0], ast.stmt):
+                yield statements
+
+@register_pass
+class DeadExpressions(Pass):
+    """Drop statements that are only a constant, such as docstrings"""
+    name = "dead-expressions"
+
+    def run(self, tree):
+        changes = 0
+        for statements in statement_lists(tree, self.budget):
+            kept = [s for s in statements
+                    if not (isinstance(s, ast.Expr) and isinstance(s.value, ast.Constant))]
+            # A block needs at least one statement
+            if kept and len(kept) < len(statements):
+                changes += len(statements) - len(kept)
+                statements[:] = kept
+        return changes
+
+# Largest integer JavaScript numbers hold exactly
+MAX_SAFE_INTEGER = 2 ** 53
+
+def _is_number(value):
+    """A constant JS represents as the same number: finite, and exact if int"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return abs(value) <= MAX_SAFE_INTEGER
+    return isinstance(value, float) and math.isfinite(value)
+
+def _js_agrees(py_value, js_value):
+    """Whether Python's result is also what the emitted JavaScript computes"""
+    return _is_number(py_value) and py_value == js_value
+
+def _fold_binop(op, left, right):
+    if isinstance(left, str) and isinstance(right, str):
+        # Only concatenation means the same thing in both languages
+        return left + right if isinstance(op, ast.Add) else None
+    if not (_is_number(left) and _is_number(right)):
+        return None
+    if isinstance(op, (ast.Add, ast.Sub, ast.Mult)):
+        value = {ast.Add: left + right, ast.Sub: left - right, ast.Mult: left * right}[type(op)]
+        # Doubles are exact up to 2**53; beyond that JS rounds where Python does not
+        return value if _is_number(value) else None
+    if right == 0:
+        return None
+    if isinstance(op, ast.Div):
+        return left / right
+    if isinstance(op, ast.FloorDiv):
+        value = left // right
+        return value if _js_agrees(value, math.floor(left / right)) else None
+    if isinstance(op, ast.Mod):
+        # Emitted as __pymod, which takes the divisor's sign like Python
+        value = left % right
+        return value if _is_number(value) else None
+    if isinstance(op, ast.Pow):
+        if left and abs(right) * math.log2(abs(left) or 1) > 64:
+            return None
+        try:
+            value = left ** right
+            js_value = math.pow(left, right)
+        except (OverflowError, ValueError, ZeroDivisionError):
+            return None
+        return value if _js_agrees(value, js_value) else None
+    return None
+
+_COMPARE = {
+    ast.Lt: lambda a, b: a < b,
+    ast.LtE: lambda a, b: a <= b,
+    ast.Gt: lambda a, b: a > b,
+    ast.GtE: lambda a, b: a >= b,
+    ast.Eq: lambda a, b: a == b,
+    ast.NotEq: lambda a, b: a != b,
+}
+
+def _comparable(left, right):
+    if _is_number(left) and _is_number(right):
+        return True
+    if isinstance(left, str) and isinstance(right, str):
+        # JavaScript orders strings by UTF-16 unit, Python by code point
+        return all(ord(c) <= 0xFFFF for c in left + right)
+    return False
+
+def fold(node):
+    """The constant a pure expression of constants evaluates to, or None"""
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.left, ast.Constant) and isinstance(node.right, ast.Constant):
+            value = _fold_binop(node.op, node.left.value, node.right.value)
+            return None if value is None else _constant(value, node)
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.operand, ast.Constant):
+        value = node.operand.value
+        if isinstance(node.op, ast.Not) and (value is None or isinstance(value, (bool, int, float, str))):
+            return _constant(not value, node)
+        if isinstance(node.op, (ast.USub, ast.UAdd)) and _is_number(value):
+            return _constant(-value if isinstance(node.op, ast.USub) else value, node)
+    elif isinstance(node, ast.Compare):
+        operands = [node.left] + node.comparators
+        if all(isinstance(operand, ast.Constant) for operand in operands):
+            result = True
+            for op, left, right in zip(node.ops, operands, operands[1:]):
+                compare = _COMPARE.get(type(op))
+                if compare is None or not _comparable(left.value, right.value):
+                    return None
+                result = result and compare(left.value, right.value)
+            return _constant(result, node)
+    elif isinstance(node, ast.BoolOp):
+        if all(isinstance(value, ast.Constant) for value in node.values):
+            # Truthiness of these constants is the same in both languages
+            values = [value.value for value in node.values]
+            if all(value is None or isinstance(value, (bool, int, float, str)) for value in values):
+                for value in values[:-1]:
+                    if bool(value) == isinstance(node.op, ast.Or):
+                        return _constant(value, node)
+                return _constant(values[-1], node)
+    return None
+
+def _constant(value, node):
+    return ast.copy_location(ast.Constant(value=value), node)
+
+@register_pass
+class ConstantFolding(Pass):
+    """
+    Evaluate pure constant expressions at transpile time.
+
+    Arithmetic, string concatenation, comparisons and boolean operators
+    on literals are folded, but only when the JavaScript the expression
+    would otherwise become gives the same result: integer results must stay
+    within 2**53, ``%`` and ``//`` must not depend on the sign rules that
+    differ, and strings only fold under ``+``.
+    """
+    name = "constant-folding"
+
+    def run(self, tree):
+        return rewrite(tree, fold, self.budget)
+
+# Longest string constant copied into each use
+MAX_PROPAGATED_STRING = 64
+
+@register_pass
+class ConstantPropagation(Pass):
+    """
+    Replace uses of module-level constants with their values.
+
+    A name qualifies when it is bound exactly once, by a top-level
+    ``NAME = <constant>``, and never rebound anywhere (no other assignment,
+    loop target, parameter, import or ``global``). Uses in later top-level
+    statements and in any function are replaced; the assignment itself is
+    kept for code outside the module. Expressions made constant by this are
+    folded again.
+    """
+    name = "constant-propagation"
+    requires = ("constant-folding",)
+
+    def run(self, tree):
+        bindings = _binding_counts(tree, self.budget)
+        constants = {}
+        changes = 0
+        for index, statement in enumerate(tree.body):
+            if constants:
+                changes += self._substitute(statement, constants)
+            if (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                    and isinstance(statement.targets[0], ast.Name)
+                    and isinstance(statement.value, ast.Constant)
+                    and bindings.get(statement.targets[0].id) == 1
+                    and self._propagatable(statement.value.value)):
+                constants[statement.targets[0].id] = (index, statement.value.value)
+
+        # Functions defined before the constant still read it once called
+        for index, statement in enumerate(tree.body):
+            if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                early = {name: value for name, value in constants.items() if value[0] > index}
+                if early:
+                    changes += self._substitute(statement, early)
+        return changes
+
+    def _propagatable(self, value):
+        if isinstance(value, str):
+            return len(value) <= MAX_PROPAGATED_STRING
+        return value is None or isinstance(value, bool) or _is_number(value)
+
+    def _substitute(self, statement, constants):
+        def replace(node):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in constants:
+                return _constant(constants[node.id][1], node)
+            return fold(node)
+        return rewrite(statement, replace, self.budget)
+
+def _binding_counts(tree, budget=None):
+    """How many times each name is bound anywhere in the module"""
+    counts = {}
+    def bind(name):
+        counts[name] = counts.get(name, 0) + 1
+    for node in polled(ast.walk(tree), budget):
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            bind(node.id)
+        elif isinstance(node, ast.arg):
+            bind(node.arg)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bind(node.name)
+        elif isinstance(node, ast.alias):
+            bind((node.asname or node.name).split(".")[0])
+        elif isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)) and node.name:
+            bind(node.name)
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            bind(node.rest)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            for name in node.names:
+                # Rebinding through global is invisible to a count; rule it out
+                counts[name] = counts.get(name, 0) + 2
+    return counts
+
+def _mentions(nodes, budget=None):
+    """How many times each name is read, bound or declared in ``nodes`` and below"""
+    counts = {}
+    def mention(name):
+        counts[name] = counts.get(name, 0) + 1
+    for root in nodes:
+        for node in polled(ast.walk(root), budget):
+            if isinstance(node, ast.Name):
+                mention(node.id)
+            elif isinstance(node, ast.arg):
+                mention(node.arg)
+            elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                mention(node.name)
+            elif isinstance(node, ast.alias):
+                mention((node.asname or node.name).split(".")[0])
+            elif isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)) and node.name:
+                mention(node.name)
+            elif isinstance(node, ast.MatchMapping) and node.rest:
+                mention(node.rest)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                for name in node.names:
+                    mention(name)
+    return counts
+
+@register_pass
+class RangeLoops(Pass):
+    """
+    Lower ``for name in range(...)`` to a counted loop.
+
+    The emitter otherwise builds the whole range as an array and iterates
+    it. The counted loop declares its variable with its own ``let``, and
+    ends with it one step past the last value, so a loop is lowered only
+    when its scope mentions the variable nowhere outside the loop's target
+    and body: not before it, not after it, not in the range arguments and
+    not in another scope. Loops are also left alone when ``range`` is
+    rebound in the module, when the body assigns the loop variable
+    (JavaScript would then change the iteration), when the step is the
+    literal 0 or when there is an ``else``. ``range`` used as a value
+    still becomes an array.
+    """
+    name = "range-loops"
+    # Folding turns -1 into a literal step, which gets the simplest loop
+    requires = ("constant-folding",)
+
+    def run(self, tree):
+        if _binding_counts(tree, self.budget).get("range"):
+            return 0
+        scopes = [tree] + [node for node in polled(ast.walk(tree), self.budget)
+                           if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
+        private = set()
+        for scope in scopes:
+            mentions = None
+            for node in _scope_nodes(scope, self.budget):
+                if isinstance(node, ast.For) and isinstance(node.target, ast.Name):
+                    if mentions is None:
+                        mentions = _mentions([scope], self.budget)
+                    inside = _mentions([node.target] + node.body, self.budget)
+                    if inside[node.target.id] == mentions[node.target.id]:
+                        private.add(id(node))
+
+        changes = 0
+        for statements in statement_lists(tree, self.budget):
+            for i, statement in enumerate(statements):
+                lowered = self._lower(statement) if id(statement) in private else None
+                if lowered is not None:
+                    statements[i] = lowered
+                    changes += 1
+        return changes
+
+    def _lower(self, node):
+        if not (isinstance(node, ast.For) and isinstance(node.target, ast.Name) and not node.orelse):
+            return None
+        call = node.iter
+        if not (isinstance(call, ast.Call) and isinstance(call.func, ast.Name) and call.func.id == "range"
+                and 1 <= len(call.args) <= 3 and not call.keywords
+                and not any(isinstance(arg, ast.Starred) for arg in call.args)):
+            return None
+        args = list(call.args)
+        start = args.pop(0) if len(args) > 1 else ast.Constant(value=0)
+        stop = args.pop(0)
+        step = args[0] if args else ast.Constant(value=1)
+        if isinstance(step, ast.Constant) and (step.value == 0 or not _is_number(step.value)):
+            return None
+
+        name = node.target.id
+        for statement in node.body:
+            for child in ast.walk(statement):
+                if isinstance(child, ast.Name) and child.id == name and not isinstance(child.ctx, ast.Load):
+                    return None
+        lowered = CountedFor(target=node.target, start=start, stop=stop, step=step, body=node.body)
+        return ast.copy_location(lowered, node)
+
+# Builtins that neither mutate their arguments nor run user code we can see
+PURE_BUILTINS = {"len", "abs", "min", "max", "int", "float", "str", "bool", "round", "print", "range"}
+
+@register_pass
+class LoopInvariants(Pass):
+    """
+    Hoist loop-invariant ``len(name)`` calls and attribute chains into
+    ``const`` temporaries before the loop.
+
+    A loop qualifies only when nothing in it can change what those
+    expressions read: it makes no calls except to builtins that mutate
+    nothing, assigns no attribute or item of anything, and does not rebind
+    the chain's root name. To avoid raising where Python would not, an
+    expression is hoisted only from places that run whenever the loop is
+    reached: the parts of a ``while`` test that are always evaluated, and
+    the top-level statements of a counted loop known to run at least once.
+    """
+    name = "loop-invariants"
+    requires = ("range-loops",)
+
+    def run(self, tree):
+        bindings = _binding_counts(tree, self.budget)
+        shadowed = {name for name in PURE_BUILTINS if bindings.get(name)}
+        self.temporaries = 0
+        changes = 0
+        for statements in list(statement_lists(tree, self.budget)):
+            rewritten = []
+            for statement in statements:
+                hoisted = self._hoist(statement, shadowed)
+                changes += len(hoisted)
+                rewritten.extend(hoisted)
+                rewritten.append(statement)
+            statements[:] = rewritten
+        return changes
+
+    def _hoist(self, loop, shadowed):
+        if isinstance(loop, ast.While):
+            sites = [(loop, "test")]
+        elif isinstance(loop, CountedFor) and _runs_once(loop):
+            sites = [(statement, "value") for statement in loop.body
+                     if isinstance(statement, (ast.Assign, ast.AugAssign, ast.Expr, ast.Return))
+                     and statement.value is not None]
+        else:
+            return []
+        if not _leaves_state_alone(loop, shadowed):
+            return []
+
+        rebound = {node.id for node in ast.walk(loop)
+                   if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load)}
+        temporaries = {}
+        hoisted = []
+        for site, field in sites:
+            for parent, field, index, node in _unconditional(site, field):
+                if not _invariant_candidate(node, rebound, shadowed):
+                    continue
+                key = ast.dump(node)
+                if key not in temporaries:
+                    temporaries[key] = f"$inv{self.temporaries}"
+                    self.temporaries += 1
+                    hoisted.append(ast.copy_location(Temporary(name=temporaries[key], value=node), loop))
+                replacement = ast.copy_location(ast.Name(id=temporaries[key], ctx=ast.Load()), node)
+                if index is None:
+                    setattr(parent, field, replacement)
+                else:
+                    getattr(parent, field)[index] = replacement
+        return hoisted
+
+def _runs_once(loop):
+    """Whether a counted loop with literal bounds has at least one iteration"""
+    bounds = (loop.start, loop.stop, loop.step)
+    if not all(isinstance(bound, ast.Constant) and _is_number(bound.value) for bound in bounds):
+        return False
+    start, stop, step = (bound.value for bound in bounds)
+    return start < stop if step > 0 else start > stop
+
+def _leaves_state_alone(loop, shadowed):
+    for node in ast.walk(loop):
+        if isinstance(node, ast.Call):
+            if not (isinstance(node.func, ast.Name) and node.func.id in PURE_BUILTINS
+                    and node.func.id not in shadowed):
+                return False
+        elif isinstance(node, (ast.Attribute, ast.Subscript)) and not isinstance(node.ctx, ast.Load):
+            return False
+        elif isinstance(node, (ast.Yield, ast.YieldFrom, ast.Await, ast.Delete, ast.Global, ast.Nonlocal)):
+            return False
+    return True
+
+def _invariant_candidate(node, rebound, shadowed):
+    if isinstance(node, ast.Call):
+        return (isinstance(node.func, ast.Name) and node.func.id == "len" and "len" not in shadowed
+                and len(node.args) == 1 and not node.keywords
+                and isinstance(node.args[0], ast.Name) and node.args[0].id not in rebound)
+    if isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Load):
+        root = node
+        while isinstance(root, ast.Attribute):
+            root = root.value
+        return isinstance(root, ast.Name) and root.id not in rebound
+    return False
+
+def _unconditional(site, field):
+    """
+    Yield ``(parent, field, index, node)`` for each expression in
+    ``site.<field>`` that is evaluated every time that field is, outermost
+    first. Operands behind ``and``/``or``, conditional expressions, chained
+    comparisons and nested scopes are skipped.
+    """
+    stack = [(site, field, getattr(site, field))]
+    while stack:
+        parent, field, value = stack.pop()
+        if isinstance(parent, ast.BoolOp) and field == "values":
+            value = value[:1]
+        elif isinstance(parent, ast.Compare) and field == "comparators":
+            value = value[:1]
+        elif isinstance(parent, ast.IfExp) and field in ("body", "orelse"):
+            continue
+        elif isinstance(parent, (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            continue
+        items = list(enumerate(value)) if isinstance(value, list) else [(None, value)]
+        for index, node in reversed(items):
+            if not isinstance(node, ast.expr):
+                continue
+            yield parent, field, index, node
+            if not isinstance(node, ast.Attribute):
+                stack.extend((node, name, child) for name, child in reversed(list(ast.iter_fields(node))))
+
+# Largest helper body, in AST nodes, copied into each call site
+MAX_INLINE_NODES = 16
+
+# Expressions an inlined body may contain; anything that can skip
+# evaluating an operand (and/or, if-else) or opens a scope is left out
+_INLINE_SAFE = (
+    ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Constant, ast.Attribute,
+    ast.Subscript, ast.Tuple, ast.List, ast.Load, ast.operator, ast.unaryop, ast.cmpop,
+)
+
+@register_pass
+class InlineFunctions(Pass):
+    """
+    Inline calls to tiny module-level helpers such as
+    ``def square(x): return x * x``.
+
+    A helper qualifies when its body is a single ``return`` of a small
+    expression that only reads its parameters and unshadowed pure builtins,
+    it has plain positional parameters and no decorators, and its name is
+    never rebound. Each argument is still evaluated exactly once and in
+    order: names and literals may be copied freely, any other argument must
+    feed a parameter used exactly once, in parameter order. The definition
+    stays for callers outside the module. ``changes`` counts inlined call
+    sites.
+    """
+    name = "inline-functions"
+    requires = ("dead-expressions",)
+
+    def run(self, tree):
+        bindings = _binding_counts(tree, self.budget)
+        helpers = {}
+        for statement in tree.body:
+            helper = self._helper(statement, bindings)
+            if helper is not None:
+                helpers[statement.name] = helper
+        if not helpers:
+            return 0
+
+        def replace(node):
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                    and node.func.id in helpers):
+                inlined = self._inline(node, *helpers[node.func.id])
+                if inlined is not None:
+                    # Literal arguments often make the whole body constant
+                    return fold(inlined) or inlined
+            return None
+        return rewrite(tree, replace, self.budget)
+
+    def _helper(self, node, bindings):
+        """``(params, body)`` for an inlinable function definition, else None"""
+        if not (isinstance(node, ast.FunctionDef) and not node.decorator_list
+                and bindings.get(node.name) == 1 and len(node.body) == 1
+                and isinstance(node.body[0], ast.Return) and node.body[0].value is not None):
+            return None
+        args = node.args
+        if args.vararg or args.kwarg or args.kwonlyargs or args.defaults or args.posonlyargs:
+            return None
+        params = [arg.arg for arg in args.args]
+        body = node.body[0].value
+        nodes = list(ast.walk(body))
+        if len(nodes) > MAX_INLINE_NODES or not all(isinstance(n, _INLINE_SAFE) for n in nodes):
+            return None
+        for n in nodes:
+            if isinstance(n, ast.Name) and n.id not in params:
+                # Builtins only, and only where nothing in the module shadows them
+                if n.id not in PURE_BUILTINS or bindings.get(n.id):
+                    return None
+            if isinstance(n, ast.Call) and not (isinstance(n.func, ast.Name) and n.func.id in PURE_BUILTINS):
+                return None
+        return params, body
+
+    def _inline(self, call, params, body):
+        if call.keywords or len(call.args) != len(params) or any(
+                isinstance(arg, ast.Starred) for arg in call.args):
+            return None
+        arguments = dict(zip(params, call.args))
+        uses = [n.id for n in _evaluation_order(body) if isinstance(n, ast.Name) and n.id in arguments]
+
+        # Arguments with effects must each be evaluated once, in call order
+        effectful = [param for param in params if not isinstance(arguments[param], (ast.Name, ast.Constant))]
+        if any(uses.count(param) != 1 for param in effectful):
+            return None
+        if [param for param in uses if param in effectful] != effectful:
+            return None
+
+        def substitute(node):
+            if isinstance(node, ast.Name) and node.id in arguments:
+                return copy.deepcopy(arguments[node.id])
+            return None
+        inlined = copy.deepcopy(body)
+        if isinstance(inlined, ast.Name) and inlined.id in arguments:
+            return copy.deepcopy(arguments[inlined.id])
+        rewrite(inlined, substitute)
+        return ast.copy_location(inlined, call)
+
+def _evaluation_order(node):
+    """Nodes of an expression in the order they are evaluated (pre-order, by field)"""
+    order = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        order.append(current)
+        stack.extend(reversed(list(ast.iter_child_nodes(current))))
+    return order
+
+# Scalar types the type-inference pass records on expressions as
+# ``node.scalar_type``; an expression without one may hold anything
+INT, FLOAT, STR, BOOL = "int", "float", "str", "bool"
+
+# Numeric types from narrowest to widest; bool is an int in Python
+NUMERIC = (BOOL, INT, FLOAT)
+
+# Not yet assigned a type while inference runs; below every type
+_UNSET = "unset"
+
+_ANNOTATIONS = {"int": INT, "float": FLOAT, "str": STR, "bool": BOOL}
+
+# Builtins whose result type does not depend on their arguments
+_RESULT_TYPES = {"int": INT, "float": FLOAT, "str": STR, "bool": BOOL, "len": INT, "ord": INT, "chr": STR}
+
+_BITWISE = (ast.BitOr, ast.BitXor, ast.BitAnd, ast.LShift, ast.RShift)
+
+def _join(a, b):
+    """The narrowest type covering both; None (unknown) when there is none"""
+    if a == _UNSET:
+        return b
+    if b == _UNSET or a == b:
+        return a
+    if a in NUMERIC and b in NUMERIC:
+        return max(a, b, key=NUMERIC.index)
+    return None
+
+def _annotation_type(node):
+    if isinstance(node, ast.Name):
+        return _ANNOTATIONS.get(node.id)
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return _ANNOTATIONS.get(node.value)
+    return None
+
+def _binop_type(op, left, right, right_node):
+    if _UNSET in (left, right):
+        return _UNSET
+    if isinstance(op, ast.Add) and left == right == STR:
+        return STR
+    if left not in NUMERIC or right not in NUMERIC or isinstance(op, ast.MatMult):
+        return None
+    # Arithmetic on bools gives ints
+    wide = _join(_join(left, right), INT)
+    if isinstance(op, ast.Div):
+        return FLOAT
+    if isinstance(op, _BITWISE):
+        return INT if wide == INT else None
+    if isinstance(op, ast.Pow) and wide == INT:
+        # A negative exponent makes an int power a float
+        non_negative = isinstance(right_node, ast.Constant) and right_node.value >= 0
+        return INT if non_negative else FLOAT
+    return wide
+
+def _call_type(node, types, builtins):
+    name = node.func.id
+    if name not in builtins or node.keywords or any(isinstance(arg, ast.Starred) for arg in node.args):
+        return None
+    if name in _RESULT_TYPES:
+        return _RESULT_TYPES[name]
+    args = [types[arg] for arg in node.args]
+    if _UNSET in args:
+        return _UNSET
+    if name == "abs" and len(args) == 1 and args[0] in NUMERIC:
+        return _join(args[0], INT)
+    if name == "round" and len(args) == 1 and args[0] in NUMERIC:
+        return INT
+    if name == "round" and len(args) == 2 and args[0] in NUMERIC:
+        return _join(args[0], INT)
+    if name in ("min", "max") and len(args) >= 2:
+        result = _UNSET
+        for arg in args:
+            result = _join(result, arg)
+        return result
+    return None
+
+def _expression_type(node, types, env, builtins, returns):
+    """
+    Type of ``node`` given the types of its children, of the scope's names
+    and of what the module's known functions return.
+    """
+    if isinstance(node, ast.Constant):
+        return {bool: BOOL, int: INT, float: FLOAT, str: STR}.get(type(node.value))
+    if isinstance(node, ast.Name):
+        return env.get(node.id)
+    if isinstance(node, ast.BinOp):
+        return _binop_type(node.op, types[node.left], types[node.right], node.right)
+    if isinstance(node, ast.UnaryOp):
+        operand = types[node.operand]
+        if isinstance(node.op, ast.Not):
+            return BOOL
+        if operand == _UNSET:
+            return _UNSET
+        if isinstance(node.op, ast.Invert):
+            return INT if operand in (BOOL, INT) else None
+        return _join(operand, INT) if operand in NUMERIC else None
+    if isinstance(node, ast.Compare):
+        return BOOL
+    if isinstance(node, (ast.BoolOp, ast.IfExp)):
+        values = node.values if isinstance(node, ast.BoolOp) else (node.body, node.orelse)
+        result = _UNSET
+        for value in values:
+            result = _join(result, types[value])
+        return result
+    if isinstance(node, ast.JoinedStr):
+        return STR
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        if node.func.id in returns:
+            return returns[node.func.id]
+        return _call_type(node, types, builtins)
+    if isinstance(node, ast.Subscript) and types[node.value] == STR:
+        return STR
+    return None
+
+def _scope_nodes(scope, budget=None):
+    """Nodes of a module or function body, without the bodies of nested scopes"""
+    stack = list(reversed(scope.body))
+    while stack:
+        node = stack.pop()
+        if budget is not None:
+            budget.poll()
+        yield node
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            stack.extend(reversed(list(ast.iter_child_nodes(node))))
+
+def _binding_sites(scope, nodes, builtins):
+    """
+    ``(name, kind, payload)`` for every binding of a name in a scope, where
+    ``payload`` is the bound expression ("expr"), a type or None ("fixed"),
+    the operator and operand of an augmented assignment ("aug"), or the
+    ``(start, stop)`` bounds of a ``range()`` loop target ("range"; a None
+    start is 0).
+    """
+    sites = []
+    covered = set()
+
+    def bind(target, kind, payload):
+        if isinstance(target, ast.Name):
+            sites.append((target.id, kind, payload))
+            covered.add(target)
+
+    def bind_loop(target, iterable):
+        counted = (isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Name)
+                   and iterable.func.id == "range" and "range" in builtins and not iterable.keywords
+                   and 1 <= len(iterable.args) <= 3
+                   and not any(isinstance(arg, ast.Starred) for arg in iterable.args))
+        if not counted:
+            bind(target, "fixed", None)
+        elif len(iterable.args) == 1:
+            bind(target, "range", (None, iterable.args[0]))
+        else:
+            bind(target, "range", (iterable.args[0], iterable.args[1]))
+
+    if not isinstance(scope, ast.Module):
+        args = scope.args
+        for arg in args.posonlyargs + args.args + args.kwonlyargs:
+            sites.append((arg.arg, "fixed", _annotation_type(arg.annotation)))
+        for arg in (args.vararg, args.kwarg):
+            if arg is not None:
+                sites.append((arg.arg, "fixed", None))
+
+    for node in nodes:
+        if isinstance(node, ast.Assign):
+            for target in node.targets:
+                if (isinstance(target, (ast.Tuple, ast.List)) and isinstance(node.value, (ast.Tuple, ast.List))
+                        and len(target.elts) == len(node.value.elts)
+                        and not any(isinstance(elt, ast.Starred) for elt in target.elts + node.value.elts)):
+                    # a, b = b, a + b binds each name to its own element
+                    for element, value in zip(target.elts, node.value.elts):
+                        bind(element, "expr", value)
+                else:
+                    bind(target, "expr", node.value)
+        elif isinstance(node, ast.AugAssign):
+            bind(node.target, "aug", (node.op, node.value))
+        elif isinstance(node, ast.AnnAssign):
+            bind(node.target, "fixed", _annotation_type(node.annotation))
+            if node.value is not None:
+                bind(node.target, "expr", node.value)
+        elif isinstance(node, ast.NamedExpr):
+            bind(node.target, "expr", node.value)
+        elif isinstance(node, CountedFor):
+            bind(node.target, "range", (node.start, node.stop))
+        elif isinstance(node, Temporary):
+            sites.append((node.name, "expr", node.value))
+        elif isinstance(node, (ast.For, ast.comprehension)):
+            bind_loop(node.target, node.iter)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            sites.append((node.name, "fixed", None))
+        elif isinstance(node, ast.alias):
+            sites.append(((node.asname or node.name).split(".")[0], "fixed", None))
+        elif isinstance(node, (ast.ExceptHandler, ast.MatchAs, ast.MatchStar)) and node.name:
+            sites.append((node.name, "fixed", None))
+        elif isinstance(node, ast.MatchMapping) and node.rest:
+            sites.append((node.rest, "fixed", None))
+    # Tuple targets, with-as, del and the like
+    for node in nodes:
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load) and node not in covered:
+            sites.append((node.id, "fixed", None))
+    return sites
+
+def _called_functions(tree, bindings):
+    """
+    Module-level functions bound once and only ever called directly, with
+    one positional argument per parameter, so that every call is known.
+    Returns a dict from name to FunctionDef.
+    """
+    functions = {}
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and not node.decorator_list and bindings.get(node.name) == 1:
+            args = node.args
+            if not (args.vararg or args.kwarg or args.kwonlyargs or args.defaults or args.posonlyargs):
+                functions[node.name] = node
+    if not functions:
+        return functions
+    calls = {name: 0 for name in functions}
+    uses = dict(calls)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in uses:
+            uses[node.id] += 1
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in calls
+                and not node.keywords and len(node.args) == len(functions[node.func.id].args.args)
+                and not any(isinstance(arg, ast.Starred) for arg in node.args)):
+            calls[node.func.id] += 1
+    return {name: node for name, node in functions.items() if uses[name] == calls[name]}
+
+def _falls_through(body):
+    """Whether control can run off the end of a statement list"""
+    if not body:
+        return True
+    last = body[-1]
+    if isinstance(last, (ast.Return, ast.Raise)):
+        return False
+    if isinstance(last, ast.If):
+        return _falls_through(last.body) or _falls_through(last.orelse)
+    return True
+
+def _function_calls(nodes, functions):
+    """The calls among ``nodes`` to functions from _called_functions"""
+    return [node for node in nodes if isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in functions]
+
+@register_pass
+class TypeInference(Pass):
+    """
+    Classify the names and expressions of each function, and of the module
+    body, as int, float, str or bool, for the emitter to specialize on.
+
+    The analysis is flow-insensitive: a name's type covers every value
+    bound to it anywhere in its scope, read from literals, ``int``/
+    ``float``/``str``/``bool`` annotations, results of unshadowed builtins
+    and ``range()`` loop targets. Functions defined once at module level
+    and only ever called directly also get the types their call sites pass
+    and their ``return`` statements give back. Other parameters without
+    annotations, names from enclosing scopes, names ever declared
+    ``global``/``nonlocal`` and anything bound some other way are unknown.
+    Results are stored as ``scalar_type`` on the expression nodes, and as a
+    ``local_types`` dict on each scope; ``changes`` counts the typed nodes.
+    Class bodies are skipped, their methods are not.
+    """
+    name = "type-inference"
+
+    def run(self, tree):
+        bindings = _binding_counts(tree, self.budget)
+        builtins = {name for name in set(_RESULT_TYPES) | {"abs", "round", "min", "max", "range"}
+                    if not bindings.get(name)}
+        escaping = {name for node in polled(ast.walk(tree), self.budget)
+                    if isinstance(node, (ast.Global, ast.Nonlocal))
+                    for name in node.names}
+        functions = _called_functions(tree, bindings)
+        scopes = [tree] + [node for node in polled(ast.walk(tree), self.budget)
+                           if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+        plans = [self._plan(scope, builtins, escaping, functions) for scope in scopes]
+
+        # Parameter and return types of the known functions grow until
+        # every call site and return statement agrees with them
+        params = {name: [_UNSET] * len(node.args.args) for name, node in functions.items()}
+        returns = dict.fromkeys(functions, _UNSET)
+        while True:
+            results = [self._infer_scope(plan, builtins, params, returns) for plan in plans]
+            updated_params = {name: list(types) for name, types in params.items()}
+            updated_returns = dict(returns)
+            for (scope, _, _, calls), (types, _) in zip(plans, results):
+                for call in calls:
+                    signature = updated_params[call.func.id]
+                    for index, arg in enumerate(call.args):
+                        signature[index] = _join(signature[index], types[arg])
+                if functions.get(getattr(scope, "name", None)) is scope:
+                    for node in _scope_nodes(scope, self.budget):
+                        if isinstance(node, ast.Return):
+                            value = types[node.value] if node.value is not None else None
+                            updated_returns[scope.name] = _join(updated_returns[scope.name], value)
+                    if _falls_through(scope.body):
+                        updated_returns[scope.name] = None
+            if updated_params == params and updated_returns == returns:
+                break
+            params, returns = updated_params, updated_returns
+
+        typed = 0
+        for (scope, _, expressions, _), (types, env) in zip(plans, results):
+            scope.local_types = {name: kind for name, kind in env.items() if kind not in (None, _UNSET)}
+            for node in expressions:
+                if types[node] not in (None, _UNSET):
+                    node.scalar_type = types[node]
+                    typed += 1
+        return typed
+
+    def _plan(self, scope, builtins, escaping, functions):
+        """``(scope, sites, expressions, calls)``, which stay the same while types are refined"""
+        nodes = list(_scope_nodes(scope, self.budget))
+        sites = _binding_sites(scope, nodes, builtins)
+        if functions.get(getattr(scope, "name", None)) is scope:
+            # Parameters come first; those without annotations take their call sites' types
+            for index, arg in enumerate(scope.args.args):
+                if arg.annotation is None:
+                    sites[index] = (arg.arg, "param", index)
+        for name in escaping:
+            if any(site_name == name for site_name, _, _ in sites):
+                sites.append((name, "fixed", None))
+        # Children before parents, so each node's operands are typed first
+        expressions = [node for node in reversed(nodes) if isinstance(node, ast.expr)]
+        return scope, sites, expressions, _function_calls(nodes, functions)
+
+    def _infer_scope(self, plan, builtins, params, returns):
+        """``(types, env)``: the types of a scope's expressions and names"""
+        scope, sites, expressions, _ = plan
+        env = {name: _UNSET for name, _, _ in sites}
+        while True:
+            types = {}
+            for node in polled(expressions, self.budget):
+                types[node] = _expression_type(node, types, env, builtins, returns)
+            updated = dict(env)
+            for name, kind, payload in sites:
+                if kind == "fixed":
+                    value = payload
+                elif kind == "expr":
+                    value = types[payload]
+                elif kind == "range":
+                    value = INT
+                elif kind == "param":
+                    value = params[scope.name][payload]
+                else:
+                    op, operand = payload
+                    value = _binop_type(op, env[name], types[operand], operand)
+                updated[name] = _join(updated[name], value)
+            if updated == env:
+                return types, env
+            env = updated
+
+# Values an Int32Array element holds
+INT32_RANGE = range(-2 ** 31, 2 ** 31)
+
+def _repeated_number(node):
+    """``(element, length)`` for ``[number] * length`` or ``length * [number]``, else None"""
+    if not (isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult)):
+        return None
+    for single, length in ((node.left, node.right), (node.right, node.left)):
+        if (isinstance(single, ast.List) and len(single.elts) == 1 and not isinstance(length, ast.List)
+                and isinstance(single.elts[0], ast.Constant) and _is_number(single.elts[0].value)):
+            return single.elts[0], length
+    return None
+
+@register_pass
+class TypedArrays(Pass):
+    """
+    Allocate fixed-size numeric lists such as ``[0.0] * n`` as a
+    Float64Array or Int32Array.
+
+    A name qualifies when its scope binds it exactly once, to a repeated
+    one-number list, and every other use indexes it: reads, stores of
+    values typed int or float (or read from another such array), ``len()``
+    and ``for`` loops over it. A slice, ``append`` or any other method,
+    passing or returning it, a store of anything that may not be a number
+    or a use from another scope keeps it a plain array. Int32Array is used
+    only when the fill and every store are int literals that fit 32 bits;
+    otherwise Float64Array, which holds every number a plain array can.
+    """
+    name = "typed-arrays"
+    requires = ("type-inference",)
+
+    def run(self, tree):
+        bindings = _binding_counts(tree, self.budget)
+        builtins = {name for name in ("len", "range") if not bindings.get(name)}
+        escaping = {name for node in polled(ast.walk(tree), self.budget)
+                    if isinstance(node, (ast.Global, ast.Nonlocal))
+                    for name in node.names}
+        scopes = [tree] + [node for node in polled(ast.walk(tree), self.budget)
+                           if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+        return sum(self._allocate(scope, builtins, escaping) for scope in scopes)
+
+    def _allocate(self, scope, builtins, escaping):
+        nodes = list(_scope_nodes(scope, self.budget))
+        sites = _binding_sites(scope, nodes, builtins)
+        counts = {}
+        for name, _, _ in sites:
+            counts[name] = counts.get(name, 0) + 1
+        parents = {child: node for node in nodes for child in ast.iter_child_nodes(node)}
+        candidates = {}
+        for name, kind, value in sites:
+            if (counts[name] == 1 and kind == "expr" and name not in escaping
+                    and isinstance(parents.get(value), ast.Assign) and _repeated_number(value)):
+                candidates[name] = parents[value]
+        if not candidates:
+            return 0
+
+        nested = {n.id for node in nodes if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                                                                  ast.Lambda, ast.ClassDef))
+                  for n in ast.walk(node) if isinstance(n, ast.Name)}
+        uses = {name: [] for name in candidates if name not in nested}
+        for node in nodes:
+            if isinstance(node, ast.Name) and node.id in uses and node is not candidates[node.id].targets[0]:
+                uses[node.id].append(node)
+
+        # Rejecting one array can make values stored into another unknown
+        stores = {}
+        while True:
+            for name in list(uses):
+                stores[name] = [self._use(node, parents, builtins, uses) for node in uses[name]]
+            rejected = [name for name in uses if None in stores[name]]
+            if not rejected:
+                break
+            for name in rejected:
+                del uses[name]
+
+        for name in uses:
+            element, length = _repeated_number(candidates[name].value)
+            narrow = isinstance(element.value, int) and element.value in INT32_RANGE
+            kind = "Int32Array" if narrow and all(store in ("read", "int32") for store in stores[name]) else "Float64Array"
+            candidates[name].value = ast.copy_location(
+                TypedArray(kind=kind, length=length, fill=element), candidates[name].value)
+            # Every element read is now known to be a number
+            for node in uses[name]:
+                read = parents[node]
+                if isinstance(read, ast.Subscript) and isinstance(read.ctx, ast.Load):
+                    read.scalar_type = INT if kind == "Int32Array" else FLOAT
+        return len(uses)
+
+    def _use(self, node, parents, builtins, arrays):
+        """"read", "int32" or "number" for a use the array allows; None when it escapes"""
+        parent = parents.get(node)
+        if isinstance(parent, ast.Subscript) and parent.value is node and not isinstance(parent.slice, ast.Slice):
+            if isinstance(parent.ctx, ast.Load):
+                return "read"
+            holder = parents.get(parent)
+            if isinstance(holder, ast.Assign) and holder.targets == [parent]:
+                return _stored(holder.value, arrays)
+            if isinstance(holder, ast.AugAssign) and not isinstance(holder.op, (_BITWISE, ast.MatMult)):
+                return "number" if _stored(holder.value, arrays) else None
+            if isinstance(holder, ast.Tuple) and isinstance(parents.get(holder), ast.Assign):
+                # Swaps: a[i], a[j] = a[j], a[i]
+                assign = parents[holder]
+                if (assign.targets == [holder] and isinstance(assign.value, ast.Tuple)
+                        and len(assign.value.elts) == len(holder.elts)):
+                    return _stored(assign.value.elts[holder.elts.index(parent)], arrays)
+            return None
+        if (isinstance(parent, ast.Call) and isinstance(parent.func, ast.Name) and parent.func.id == "len"
+                and "len" in builtins and parent.args == [node] and not parent.keywords):
+            return "read"
+        if isinstance(parent, (ast.For, ast.comprehension)) and parent.iter is node:
+            return "read"
+        return None
+
+def _stored(value, arrays):
+    """"int32" or "number" for a value known to be a number, else None"""
+    if isinstance(value, ast.Constant) and _is_number(value.value):
+        if isinstance(value.value, int) and value.value in INT32_RANGE:
+            return "int32"
+        return "number"
+    if getattr(value, "scalar_type", None) in (INT, FLOAT):
+        return "number"
+    if (isinstance(value, ast.Subscript) and isinstance(value.value, ast.Name) and value.value.id in arrays
+            and not isinstance(value.slice, ast.Slice)):
+        return "number"
+    return None
+
+# The integer-ranges pass gives each int expression an exact ``(low, high)``
+# interval or one of these: an int from outside the analysis (a parameter,
+# len(), an element read) taken to fit a double, or one that may not
+_INPUT, _BIG = "input", "big"
+
+# Times a name's interval may grow before it is taken as an input
+MAX_WIDENINGS = 3
+
+def _exact(low, high):
+    """The interval, or _BIG when it reaches past what a double holds"""
+    if -MAX_SAFE_INTEGER <= low and high <= MAX_SAFE_INTEGER:
+        return (low, high)
+    return _BIG
+
+def _range_join(a, b):
+    if a == _UNSET:
+        return b
+    if b == _UNSET or a == b:
+        return a
+    if _BIG in (a, b):
+        return _BIG
+    if _INPUT in (a, b):
+        return _INPUT
+    return (min(a[0], b[0]), max(a[1], b[1]))
+
+def _power_range(base, exponent):
+    low, high = exponent
+    if low < 0:
+        return _INPUT
+    if high > 64:
+        return (-1, 1) if max(abs(base[0]), abs(base[1])) <= 1 else _BIG
+    # The extremes sit at the ends of the base range, or 0, with the
+    # largest odd and even exponents
+    bases = {base[0], base[1]} | ({0} if base[0] < 0 < base[1] else set())
+    exponents = {e for e in (low, low + 1, high - 1, high) if low <= e <= high}
+    values = [b ** e for b in bases for e in exponents]
+    return _exact(min(values), max(values))
+
+def _binop_range(op, left, right):
+    if _UNSET in (left, right):
+        return _UNSET
+    if _BIG in (left, right):
+        return _BIG
+    if isinstance(op, ast.Pow):
+        if right == _INPUT:
+            return _BIG
+        if left == _INPUT:
+            # Squares of inputs are taken to fit, like their products
+            return _INPUT if right[1] <= 2 else _BIG
+        return _power_range(left, right)
+    if _INPUT in (left, right):
+        return _INPUT
+    (a, b), (c, d) = left, right
+    if isinstance(op, ast.Add):
+        return _exact(a + c, b + d)
+    if isinstance(op, ast.Sub):
+        return _exact(a - d, b - c)
+    if isinstance(op, ast.Mult):
+        products = (a * c, a * d, b * c, b * d)
+        return _exact(min(products), max(products))
+    if isinstance(op, ast.FloorDiv):
+        if c <= 0 <= d:
+            bound = max(abs(a), abs(b))
+            return (-bound, bound)
+        quotients = (a // c, a // d, b // c, b // d)
+        return (min(quotients), max(quotients))
+    if isinstance(op, ast.Mod):
+        bound = max(abs(c), abs(d))
+        if c > 0:
+            return (0, min(b, bound - 1) if a >= 0 else bound - 1)
+        if d < 0:
+            return (1 - bound, 0)
+        return (-bound, bound)
+    return _INPUT
+
+def _unary_range(op, operand):
+    if not isinstance(operand, tuple):
+        return operand
+    low, high = operand
+    if isinstance(op, ast.USub):
+        return (-high, -low)
+    if isinstance(op, ast.Invert):
+        return (-high - 1, -low - 1)
+    return operand
+
+def _expression_range(node, ranges, env, returns):
+    """Range of an int or bool expression given its children's; None for other types"""
+    kind = getattr(node, "scalar_type", None)
+    if kind == BOOL:
+        return (0, 1)
+    if kind != INT:
+        return None
+    if isinstance(node, ast.Constant):
+        return _exact(node.value, node.value)
+    if isinstance(node, ast.Name):
+        return env.get(node.id, _INPUT)
+    if isinstance(node, ast.BinOp):
+        return _binop_range(node.op, ranges.get(node.left, _INPUT), ranges.get(node.right, _INPUT))
+    if isinstance(node, ast.UnaryOp):
+        return _unary_range(node.op, ranges.get(node.operand, _INPUT))
+    if isinstance(node, (ast.BoolOp, ast.IfExp)):
+        values = node.values if isinstance(node, ast.BoolOp) else (node.body, node.orelse)
+        result = _UNSET
+        for value in values:
+            result = _range_join(result, ranges.get(value, _INPUT))
+        return result
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        if node.func.id in returns:
+            return returns[node.func.id]
+        if node.func.id == "int" and len(node.args) == 1 and node.args[0] in ranges:
+            # int() of an int is emitted as the int itself
+            return ranges[node.args[0]]
+    return _INPUT
+
+def _free_names(scope):
+    """Names a nested function or class reads or binds without making them its own"""
+    names = set()
+    local = set()
+    declared = set()
+    for node in ast.walk(scope):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+            if not isinstance(node.ctx, ast.Load):
+                local.add(node.id)
+        elif isinstance(node, ast.arg):
+            local.add(node.arg)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            declared.update(node.names)
+    if isinstance(scope, ast.ClassDef):
+        return names
+    return (names - local) | declared
+
+class _RangeScope:
+    """What the integer-ranges pass reads from one scope, gathered once"""
+    def __init__(self, scope, builtins, escaping, functions, budget=None):
+        self.scope = scope
+        nodes = list(_scope_nodes(scope, budget))
+        name = getattr(scope, "name", None)
+        self.function = name if functions.get(name) is scope else None
+        self.ints = {name for name, kind in getattr(scope, "local_types", {}).items() if kind in (INT, BOOL)}
+        sites = _binding_sites(scope, nodes, builtins)
+        if self.function:
+            # Parameters come first and take the ranges their call sites pass
+            for index, arg in enumerate(scope.args.args):
+                sites[index] = (arg.arg, "param", index)
+        self.sites = [site for site in sites if site[0] in self.ints]
+        # Names other scopes see, and loop counters, stay doubles like the
+        # code reading them expects
+        nested = set()
+        for node in nodes:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+                nested |= _free_names(node)
+        counters = {name for name, kind, _ in self.sites if kind == "range"}
+        self.pinned = self.ints & (nested | escaping | counters)
+        self.parents = {child: node for node in nodes for child in ast.iter_child_nodes(node)}
+        # Children before parents, so each node's operands are ranged first
+        self.expressions = [node for node in reversed(nodes) if isinstance(node, ast.expr)]
+        self.calls = _function_calls(nodes, functions)
+        self.call_set = set(self.calls)
+        self.returns = [node for node in nodes if isinstance(node, ast.Return)] if self.function else []
+        # Only int results are ranged
+        self.int_result = bool(self.function) and not _falls_through(scope.body) and all(
+            getattr(node.value, "scalar_type", None) in (INT, BOOL) for node in self.returns)
+
+    def key(self, name):
+        return (id(self.scope), name)
+
+@register_pass
+class IntegerRanges(Pass):
+    """
+    Find the int expressions whose value can pass 2**53, beyond which a
+    double drops integers, and mark them for BigInt arithmetic.
+
+    Each int expression gets an exact interval while it is built from
+    literals and ``range()`` bounds, and is otherwise an input: parameters,
+    ``len()``, element reads and the like, which are taken to fit, along
+    with sums and products of them. What can really outgrow a double is a
+    large literal or power, and a value fed back into itself: a name or
+    function result whose binding multiplies it (``result *= i``,
+    ``n * factorial(n - 1)``) or adds it to itself (``a, b = b, a + b``)
+    through a cycle of bindings. Those become BigInt, and so does anything
+    computed from them.
+
+    BigInt expressions get ``bigint = True``. Where a value crosses between
+    the two representations its node gets ``convert``: "bigint" where a
+    double meets BigInt arithmetic, "number" where a BigInt leaves it, and
+    "string" for ``print()``, which would show BigInts with an ``n``.
+    Names read by other scopes and loop counters always stay doubles.
+    ``changes`` counts the BigInt expressions.
+    """
+    name = "integer-ranges"
+    requires = ("type-inference",)
+
+    def run(self, tree):
+        bindings = _binding_counts(tree, self.budget)
+        builtins = {name for name in ("int", "print", "range", "str") if not bindings.get(name)}
+        escaping = {name for node in polled(ast.walk(tree), self.budget)
+                    if isinstance(node, (ast.Global, ast.Nonlocal))
+                    for name in node.names}
+        functions = _called_functions(tree, bindings)
+        scopes = [tree] + [node for node in polled(ast.walk(tree), self.budget)
+                           if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+        plans = [_RangeScope(scope, builtins, escaping, functions, self.budget) for scope in scopes]
+        growing = self._growing(plans, functions)
+
+        params = {name: [_UNSET] * len(node.args.args) for name, node in functions.items()}
+        returns = dict.fromkeys((plan.function for plan in plans if plan.int_result), _UNSET)
+        widenings = {}
+        while True:
+            results = [self._classify(plan, params, returns, growing) for plan in plans]
+            updated_params = {name: list(ranges) for name, ranges in params.items()}
+            updated_returns = dict(returns)
+            for plan, (ranges, _) in zip(plans, results):
+                for call in plan.calls:
+                    signature = updated_params[call.func.id]
+                    for index, arg in enumerate(call.args):
+                        if arg in ranges:
+                            signature[index] = _range_join(signature[index], ranges[arg])
+                for node in plan.returns if plan.int_result else ():
+                    if node.value in ranges:
+                        updated_returns[plan.function] = _range_join(updated_returns[plan.function],
+                                                                     ranges[node.value])
+            for name in returns:
+                if ("return", name) in growing:
+                    updated_returns[name] = _BIG
+                updated_returns[name] = self._widen(("return", name), returns[name],
+                                                    updated_returns[name], widenings)
+            for name in functions:
+                for index, value in enumerate(updated_params[name]):
+                    updated_params[name][index] = self._widen(("param", name, index), params[name][index],
+                                                              value, widenings)
+            if updated_params == params and updated_returns == returns:
+                break
+            params, returns = updated_params, updated_returns
+
+        # What each known function's parameters ended up as, for its callers
+        signatures = {plan.function: [env.get(arg.arg) for arg in plan.scope.args.args]
+                      for plan, (_, env) in zip(plans, results) if plan.function}
+        marked = 0
+        for plan, (ranges, _) in zip(plans, results):
+            for node, value in ranges.items():
+                if value == _BIG:
+                    node.bigint = True
+                    marked += 1
+        for plan, (ranges, _) in zip(plans, results):
+            self._convert(plan, ranges, signatures, returns, builtins)
+        return marked
+
+    def _widen(self, key, old, new, widenings):
+        """``new``, or _INPUT once an interval has kept growing"""
+        if isinstance(new, tuple) and new != old:
+            widenings[key] = widenings.get(key, 0) + 1
+            if widenings[key] > MAX_WIDENINGS:
+                return _INPUT
+        return new
+
+    def _classify(self, plan, params, returns, growing):
+        """``(ranges, env)``: the ranges of a scope's int expressions and names"""
+        env = {name: _UNSET for name, _, _ in plan.sites}
+        widenings = {}
+        while True:
+            ranges = {}
+            for node in polled(plan.expressions, self.budget):
+                value = _expression_range(node, ranges, env, returns)
+                if value is not None:
+                    ranges[node] = value
+            updated = dict(env)
+            for name, kind, payload in plan.sites:
+                if kind == "expr":
+                    value = ranges.get(payload, _INPUT)
+                elif kind == "aug":
+                    op, operand = payload
+                    value = _binop_range(op, env[name], ranges.get(operand, _INPUT))
+                elif kind == "range":
+                    start, stop = payload
+                    value = _range_join((0, 0) if start is None else ranges.get(start, _INPUT),
+                                        ranges.get(stop, _INPUT))
+                elif kind == "param":
+                    value = params[plan.function][payload]
+                else:
+                    value = _INPUT
+                updated[name] = _range_join(updated[name], value)
+            for name in updated:
+                if name in plan.pinned:
+                    updated[name] = _INPUT
+                elif plan.key(name) in growing:
+                    updated[name] = _BIG
+                else:
+                    updated[name] = self._widen(name, env[name], updated[name], widenings)
+            if updated == env:
+                return ranges, env
+            env = updated
+
+    def _growing(self, plans, functions):
+        """
+        Keys of the names (``(id(scope), name)``) and function results
+        (``("return", name)``) whose bindings feed them back into themselves
+        with a total weight above one, so they can grow without bound.
+        """
+        params = {name: [(id(node), arg.arg) for arg in node.args.args] for name, node in functions.items()}
+        flows = []
+        for plan in plans:
+            for name, kind, payload in plan.sites:
+                if kind == "expr":
+                    flows.append((plan.key(name), self._flows(plan, payload)))
+                elif kind == "aug":
+                    op, operand = payload
+                    flows.append((plan.key(name), self._augmented_flows(plan, name, op, operand)))
+            for call in plan.calls:
+                for key, arg in zip(params[call.func.id], call.args):
+                    flows.append((key, self._flows(plan, arg)))
+            for node in plan.returns if plan.int_result else ():
+                if node.value is not None:
+                    flows.append((("return", plan.function), self._flows(plan, node.value)))
+
+        edges = {}
+        for target, sources in flows:
+            for source, _ in sources:
+                edges.setdefault(source, set()).add(target)
+        reachable = {}
+        growing = set()
+        for target, sources in flows:
+            if target not in reachable:
+                seen = {target}
+                stack = [target]
+                while stack:
+                    for following in edges.get(stack.pop(), ()):
+                        if following not in seen:
+                            seen.add(following)
+                            stack.append(following)
+                reachable[target] = seen
+            # A source the target reaches lies on a cycle through it
+            if sum(weight for source, weight in sources if source in reachable[target]) > 1:
+                growing.add(target)
+        return growing
+
+    def _flows(self, plan, value):
+        """
+        ``(key, weight)`` for each int name and known function call whose
+        value flows into ``value``, weighted by how much it scales there
+        (math.inf through a product of two unknowns or a power).
+        """
+        found = []
+        for node in polled(ast.walk(value), self.budget):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id in plan.ints:
+                key = plan.key(node.id)
+            elif node in plan.call_set and getattr(node, "scalar_type", None) in (INT, BOOL):
+                key = ("return", node.func.id)
+            else:
+                continue
+            weight = self._weight(plan, node, value)
+            if weight is not None:
+                found.append((key, weight))
+        return found
+
+    def _weight(self, plan, node, root):
+        """How ``node`` scales on its way up to ``root``; None where its value does not carry"""
+        weight = fractions.Fraction(1)
+        child = node
+        while child is not root:
+            parent = plan.parents[child]
+            if isinstance(parent, ast.BinOp):
+                other = parent.right if child is parent.left else parent.left
+                constant = other.value if isinstance(other, ast.Constant) and _is_number(other.value) else None
+                if isinstance(parent.op, ast.Mult):
+                    if constant == 0:
+                        return None
+                    weight = weight * abs(constant) if constant is not None else math.inf
+                elif isinstance(parent.op, (ast.Pow, ast.LShift)):
+                    weight = math.inf
+                elif isinstance(parent.op, ast.FloorDiv):
+                    if child is not parent.left:
+                        return None
+                    if constant:
+                        weight = weight / abs(constant)
+                elif isinstance(parent.op, ast.Mod):
+                    # x % m is smaller than m, whatever x is
+                    if child is parent.left:
+                        return None
+                elif not isinstance(parent.op, (ast.Add, ast.Sub)):
+                    return None
+            elif isinstance(parent, ast.UnaryOp) and not isinstance(parent.op, ast.Not):
+                pass
+            elif isinstance(parent, ast.IfExp) and child is not parent.test:
+                pass
+            elif isinstance(parent, ast.BoolOp):
+                pass
+            elif (isinstance(parent, ast.Call) and parent not in plan.call_set and isinstance(parent.func, ast.Name)
+                    and parent.func.id == "int" and getattr(parent, "scalar_type", None) == INT):
+                pass
+            else:
+                return None
+            child = parent
+        return weight
+
+    def _augmented_flows(self, plan, name, op, operand):
+        """Flows of ``name op= operand`` into ``name``, counting its own old value"""
+        constant = operand.value if isinstance(operand, ast.Constant) and _is_number(operand.value) else None
+        if isinstance(op, (ast.Add, ast.Sub)):
+            return [(plan.key(name), fractions.Fraction(1))] + self._flows(plan, operand)
+        if isinstance(op, ast.Mult):
+            if constant == 0:
+                return []
+            if constant is not None:
+                return [(plan.key(name), abs(constant))]
+            return [(plan.key(name), math.inf)] + [(key, math.inf) for key, _ in self._flows(plan, operand)]
+        if isinstance(op, (ast.Pow, ast.LShift)):
+            return [(plan.key(name), math.inf)] + [(key, math.inf) for key, _ in self._flows(plan, operand)]
+        if isinstance(op, ast.FloorDiv):
+            return [(plan.key(name), fractions.Fraction(1) / abs(constant) if constant else fractions.Fraction(1))]
+        if isinstance(op, ast.Mod):
+            return self._flows(plan, operand)
+        return []
+
+    def _convert(self, plan, ranges, signatures, returns, builtins):
+        """Mark the nodes where a value changes representation"""
+        for node in plan.expressions:
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                continue
+            parent = plan.parents.get(node)
+            if parent is None:
+                continue
+            wanted = self._wanted(node, parent, plan, signatures, returns, builtins)
+            big = getattr(node, "bigint", False)
+            if big and wanted in ("number", "string"):
+                node.convert = wanted
+            elif not big and wanted == "bigint" and node in ranges:
+                node.convert = "bigint"
+
+    def _wanted(self, node, parent, plan, signatures, returns, builtins):
+        """"bigint", "number" or "string": what ``parent`` needs ``node`` as; None for either"""
+        def big(other):
+            return getattr(other, "bigint", False)
+
+        if isinstance(parent, ast.BinOp):
+            return "bigint" if big(parent) else "number"
+        if isinstance(parent, ast.UnaryOp):
+            if isinstance(parent.op, ast.Not):
+                return None
+            return "bigint" if big(parent) else "number"
+        if isinstance(parent, ast.Compare):
+            operands = [parent.left] + parent.comparators
+            if any(map(big, operands)) and all(getattr(operand, "scalar_type", None) in (INT, BOOL)
+                                               for operand in operands):
+                return "bigint"
+            return "number"
+        if isinstance(parent, ast.IfExp) and node is parent.test:
+            return None
+        if isinstance(parent, (ast.BoolOp, ast.IfExp)):
+            return "bigint" if big(parent) else "number"
+        if isinstance(parent, (ast.If, ast.While, ast.Assert, ast.Expr, ast.FormattedValue)):
+            return None
+        if isinstance(parent, (ast.Assign, ast.AnnAssign, ast.NamedExpr, ast.AugAssign)) and node is parent.value:
+            targets = parent.targets if isinstance(parent, ast.Assign) else [parent.target]
+            if len(targets) == 1 and isinstance(targets[0], ast.Name):
+                return "bigint" if big(targets[0]) else "number"
+            return "number"
+        if isinstance(parent, (ast.Tuple, ast.List)):
+            # An element of a, b = b, a + b goes to its own name
+            holder = plan.parents.get(parent)
+            if (isinstance(holder, ast.Assign) and holder.value is parent and len(holder.targets) == 1
+                    and isinstance(holder.targets[0], (ast.Tuple, ast.List))
+                    and len(holder.targets[0].elts) == len(parent.elts)):
+                index = next(i for i, element in enumerate(parent.elts) if element is node)
+                target = holder.targets[0].elts[index]
+                return "bigint" if isinstance(target, ast.Name) and big(target) else "number"
+            return "number"
+        if isinstance(parent, ast.Return):
+            return "bigint" if returns.get(plan.function) == _BIG else "number"
+        if isinstance(parent, ast.Call):
+            if node is parent.func:
+                return None
+            if parent in plan.call_set:
+                index = next(i for i, arg in enumerate(parent.args) if arg is node)
+                return "bigint" if signatures[parent.func.id][index] == _BIG else "number"
+            if isinstance(parent.func, ast.Name) and parent.func.id in builtins:
+                if parent.func.id == "print":
+                    return "string"
+                if parent.func.id in ("str", "int"):
+                    return None
+        return "number"
+
+def _map_key(key, own=()):
+    """
+    Whether a Map compares the keys ``key`` may hold as Python does: only
+    for keys known to be ints, floats or strings, or names in ``own``,
+    which only ever hold keys of the dict itself. A Map keys tuples and
+    lists by identity and tells True from 1.
+    """
+    if isinstance(key, ast.Constant):
+        return isinstance(key.value, (str, int, float)) and not isinstance(key.value, bool)
+    if isinstance(key, ast.Name) and key.id in own:
+        return True
+    return getattr(key, "scalar_type", None) in (INT, FLOAT, STR)
+
+def _own_keys(name, nodes, counts):
+    """Names bound only by a loop over the keys or items of dict ``name``"""
+    own = set()
+    for node in nodes:
+        if not isinstance(node, (ast.For, ast.comprehension)):
+            continue
+        target, iterable = node.target, node.iter
+        if (isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Attribute)
+                and isinstance(iterable.func.value, ast.Name) and iterable.func.value.id == name
+                and not iterable.args and not iterable.keywords):
+            if iterable.func.attr == "items" and isinstance(target, ast.Tuple) and len(target.elts) == 2:
+                target = target.elts[0]
+            elif iterable.func.attr != "keys":
+                continue
+        elif not (isinstance(iterable, ast.Name) and iterable.id == name):
+            continue
+        if isinstance(target, ast.Name) and counts.get(target.id) == 1:
+            own.add(target.id)
+    return own
+
+def _method(node, name, *args):
+    return ast.Call(func=ast.Attribute(value=node, attr=name, ctx=ast.Load()), args=list(args), keywords=[])
+
+@register_pass
+class DictMaps(Pass):
+    """
+    Build dicts used as collections as a JavaScript Map.
+
+    A name qualifies when its scope binds it exactly once, to a dict display
+    without ``**`` or a dict comprehension, and every use is one of: a
+    ``d[k]`` read, store, augmented store (with a name or literal key) or
+    ``del``, ``k in d``, ``len(d)``, ``d.get()``, a ``for`` loop over ``d``
+    or over its ``keys()``, ``values()`` or ``items()``, or an if/while
+    test. Such a dict becomes a Map with ``get``/``set``/``has``/``delete``
+    unless it is a record, whose keys are all string literals that are only
+    read and stored by subscript; records stay object literals, which keep
+    one shape. A Map keeps int keys numbers, iterates in insertion order
+    as Python does and takes inserts and deletes without changing shape.
+    A key not known to be an int, float or string keeps the dict an object.
+    """
+    name = "dict-maps"
+    requires = ("type-inference",)
+
+    def run(self, tree):
+        bindings = _binding_counts(tree, self.budget)
+        builtins = {name for name in ("len",) if not bindings.get(name)}
+        escaping = {name for node in polled(ast.walk(tree), self.budget)
+                    if isinstance(node, (ast.Global, ast.Nonlocal))
+                    for name in node.names}
+        scopes = [tree] + [node for node in polled(ast.walk(tree), self.budget)
+                           if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))]
+        return sum(self._convert(scope, builtins, escaping) for scope in scopes)
+
+    def _convert(self, scope, builtins, escaping):
+        nodes = list(_scope_nodes(scope, self.budget))
+        sites = _binding_sites(scope, nodes, builtins)
+        counts = {}
+        for name, _, _ in sites:
+            counts[name] = counts.get(name, 0) + 1
+        parents = {child: node for node in nodes for child in ast.iter_child_nodes(node)}
+        candidates = {}
+        for name, kind, value in sites:
+            if (counts[name] == 1 and kind == "expr" and name not in escaping
+                    and isinstance(parents.get(value), ast.Assign) and len(parents[value].targets) == 1
+                    and (isinstance(value, ast.DictComp) or isinstance(value, ast.Dict) and None not in value.keys)):
+                candidates[name] = value
+        if not candidates:
+            return 0
+
+        nested = {n.id for node in nodes if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef,
+                                                                  ast.Lambda, ast.ClassDef))
+                  for n in ast.walk(node) if isinstance(n, ast.Name)}
+        maps = {}
+        for name, value in candidates.items():
+            if name in nested:
+                continue
+            if isinstance(value, ast.Dict):
+                keys = value.keys
+                record = all(isinstance(key, ast.Constant) and isinstance(key.value, str) for key in keys)
+            else:
+                keys = [value.key]
+                record = False
+            if not all(_map_key(key) for key in keys):
+                continue
+            own = _own_keys(name, nodes, counts)
+            uses = [self._use(node, parents, builtins, own) for node in nodes
+                    if isinstance(node, ast.Name) and node.id == name and isinstance(node.ctx, ast.Load)]
+            if None in uses:
+                continue
+            if record and all(kind == "record" for kind, _ in uses):
+                continue
+            maps[name] = uses
+
+        replacements = {}
+        for name, uses in maps.items():
+            candidates[name].as_map = True
+            replacements.update((id(node), build) for _, (node, build) in uses if build is not None)
+        if replacements:
+            def replace(node):
+                build = replacements.get(id(node))
+                return ast.copy_location(build(node), node) if build is not None else None
+            rewrite(scope, replace, self.budget)
+        return len(maps)
+
+    def _use(self, node, parents, builtins, own):
+        """
+        ``(kind, (site, build))`` for a use of a dict a Map can take, where
+        ``build(site)`` gives the node to put in place of ``site`` (None to
+        keep it) and kind is "record" for a string literal subscript read or
+        store; None when the dict must stay an object
+        """
+        parent = parents.get(node)
+        if isinstance(parent, ast.Subscript) and parent.value is node:
+            key = parent.slice
+            if isinstance(key, ast.Slice) or not _map_key(key, own):
+                return None
+            kind = "record" if isinstance(key, ast.Constant) and isinstance(key.value, str) else "collection"
+            if isinstance(parent.ctx, ast.Load):
+                return kind, (parent, lambda site: _method(site.value, "get", site.slice))
+            holder = parents.get(parent)
+            if isinstance(holder, ast.Assign) and holder.targets == [parent]:
+                return kind, (holder, lambda site: ast.Expr(
+                    _method(site.targets[0].value, "set", site.targets[0].slice, site.value)))
+            if (isinstance(holder, ast.AugAssign) and holder.target is parent
+                    and isinstance(key, (ast.Name, ast.Constant))):
+                def build(site):
+                    current = _method(site.target.value, "get", copy.copy(site.target.slice))
+                    updated = ast.BinOp(left=current, op=site.op, right=site.value)
+                    return ast.Expr(_method(site.target.value, "set", site.target.slice, updated))
+                return "collection", (holder, build)
+            if isinstance(holder, ast.Delete) and holder.targets == [parent]:
+                return "collection", (holder, lambda site: ast.Expr(
+                    _method(site.targets[0].value, "delete", site.targets[0].slice)))
+            return None
+        if (isinstance(parent, ast.Compare) and parent.comparators == [node]
+                and isinstance(parent.ops[0], (ast.In, ast.NotIn))):
+            if not _map_key(parent.left, own):
+                return None
+            def build(site):
+                has = _method(site.comparators[0], "has", site.left)
+                has.scalar_type = BOOL
+                if isinstance(site.ops[0], ast.NotIn):
+                    has = ast.UnaryOp(op=ast.Not(), operand=has)
+                    has.scalar_type = BOOL
+                return has
+            return "collection", (parent, build)
+        if (isinstance(parent, ast.Call) and isinstance(parent.func, ast.Name) and parent.func.id == "len"
+                and "len" in builtins and parent.args == [node] and not parent.keywords):
+            def build(site):
+                size = ast.Attribute(value=site.args[0], attr="size", ctx=ast.Load())
+                size.scalar_type = INT
+                return size
+            return "collection", (parent, build)
+        if isinstance(parent, (ast.For, ast.comprehension)) and parent.iter is node:
+            return "collection", (node, lambda site: _method(site, "keys"))
+        if isinstance(parent, (ast.If, ast.While)) and parent.test is node:
+            # __truthy knows an empty Map is false
+            return "collection", (node, None)
+        call = parents.get(parent)
+        if not (isinstance(parent, ast.Attribute) and isinstance(call, ast.Call) and call.func is parent
+                and not call.keywords):
+            return None
+        if parent.attr in ("keys", "values", "items") and not call.args:
+            # Views are only iterated; a Map iterates its items itself
+            loop = parents.get(call)
+            if not (isinstance(loop, (ast.For, ast.comprehension)) and loop.iter is call):
+                return None
+            if parent.attr == "items":
+                return "collection", (call, lambda site: site.func.value)
+            return "collection", (call, None)
+        if parent.attr == "get" and len(call.args) in (1, 2) and _map_key(call.args[0], own):
+            return "collection", (call, lambda site: MapGet(
+                map=site.func.value, key=site.args[0],
+                default=site.args[1] if len(site.args) > 1 else ast.Constant(None)))
+        return None
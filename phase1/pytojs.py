@@ -1,52 +1,693 @@
 import ast
-import json
-import traceback
+
+# Only ast is imported at module load so short-lived processes start fast;
+# everything else is imported where it is first needed.
+
+# Bump whenever generated output changes; it is part of /convert's ETag
+__version__ = "0.3.15"
+
+_quote = None
+
+def _js_string(value):
+    """Quote a string as a JavaScript literal, exactly like json.dumps"""
+    global _quote
+    if _quote is None:
+        try:
+            # The C encoder json.dumps uses, without importing json itself
+            from _json import encode_basestring_ascii as _quote
+        except ImportError:
+            from json import dumps as _quote
+    return _quote(value)
+
+class TranspileLimits:
+    """
+    Resource budgets for a single transpilation.
+    
+    Every limit defaults to None (unlimited). ``timeout`` is in seconds and
+    ``cancel`` is an optional callable polled with the deadline; returning
+    True stops the transpilation.
+    """
+    
+    def __init__(self, max_source_bytes=None, max_nodes=None, max_output_bytes=None,
+                 timeout=None, cancel=None):
+        self.max_source_bytes = max_source_bytes
+        self.max_nodes = max_nodes
+        self.max_output_bytes = max_output_bytes
+        self.timeout = timeout
+        self.cancel = cancel
+
+class BudgetExceeded(Exception):
+    """A transpilation went over one of its TranspileLimits"""
+    
+    def __init__(self, kind, limit, message):
+        super().__init__(message)
+        # One of: source_bytes, nodes, output_bytes, deadline, cancelled
+        self.kind = kind
+        self.limit = limit
+    
+    def to_dict(self):
+        return {"error": str(self), "budget": self.kind, "limit": self.limit}
+
+class Budget:
+    """Tracks usage against TranspileLimits while one transpilation runs"""
+    
+    # Nodes visited between deadline and cancellation checks
+    CHECK_INTERVAL = 256
+    
+    def __init__(self, limits):
+        self.limits = limits
+        self.nodes = 0
+        self.steps = 0
+        self.deadline = None
+        if limits.timeout is not None:
+            import time
+            self.deadline = time.monotonic() + limits.timeout
+    
+    def check_source(self, code):
+        limit = self.limits.max_source_bytes
+        if limit is not None:
+            size = len(code.encode("utf-8"))
+            if size > limit:
+                raise BudgetExceeded("source_bytes", limit,
+                                     f"Source is {size} bytes, over the {limit} byte limit")
+    
+    def charge(self):
+        """Count one visited node"""
+        self.nodes += 1
+        limit = self.limits.max_nodes
+        if limit is not None and self.nodes > limit:
+            raise BudgetExceeded("nodes", limit, f"Source has more than {limit} AST nodes")
+        if self.nodes % self.CHECK_INTERVAL == 0:
+            self.check_time()
+    
+    def poll(self):
+        """Count one step of work on nodes already charged, such as an optimization pass"""
+        self.steps += 1
+        if self.steps % self.CHECK_INTERVAL == 0:
+            self.check_time()
+    
+    def check_time(self):
+        import time
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded("deadline", self.limits.timeout,
+                                 f"Transpilation took longer than {self.limits.timeout}s")
+        if self.limits.cancel is not None and self.limits.cancel():
+            raise BudgetExceeded("cancelled", None, "Transpilation was cancelled")
+    
+    def check_output(self, code):
+        # Generated code is ASCII apart from identifiers, so length ~ bytes
+        limit = self.limits.max_output_bytes
+        if limit is not None and isinstance(code, str) and len(code) > limit:
+            raise BudgetExceeded("output_bytes", limit,
+                                 f"Generated JavaScript is over the {limit} byte limit")
+
+# Binding strength of the binary operators JavaScript writes infix
+_PRECEDENCE = {
+    ast.BitOr: 1, ast.BitXor: 2, ast.BitAnd: 3,
+    ast.LShift: 4, ast.RShift: 4,
+    ast.Add: 5, ast.Sub: 5,
+    ast.Mult: 6, ast.Div: 6, ast.FloorDiv: 6, ast.Mod: 6, ast.MatMult: 6,
+}
+
+# Bitwise operators bind looser than comparisons in JavaScript, not in Python
+_BITWISE = (ast.BitOr, ast.BitXor, ast.BitAnd)
+
+# Operators emitted as calls, which need no parentheses of their own
+_CALL_OPS = (ast.Pow, ast.FloorDiv, ast.Mod)
+
+# Runtime helpers (see runtime.py) implementing Python's // and %
+_OP_HELPERS = {ast.FloorDiv: "__floordiv", ast.Mod: "__pymod"}
+
+# The same for BigInt operands, plus ** which Math.pow cannot do on them
+_BIGINT_HELPERS = {ast.FloorDiv: "__bigfloordiv", ast.Mod: "__bigmod", ast.Pow: "__bigpow"}
+
+# Builtins whose result is a number, string or boolean
+_SCALAR_CALLS = {"abs", "all", "any", "bool", "chr", "float", "int", "isinstance", "len", "ord",
+                 "round", "str", "sum"}
+
+# Comprehensions that build a collection: (empty value, statement adding one item)
+_COLLECTIONS = {
+    ast.ListComp: ("[]", "{result}.push({elt});"),
+    ast.SetComp: ("new Set()", "{result}.add({elt});"),
+    ast.DictComp: ("{{}}", "{result}[{key}] = {value};"),
+}
+# A dict comprehension the dict-maps pass built as a Map
+_MAP_COLLECTION = ("new Map()", "{result}.set({key}, {value});")
+
+def _is_elif(node):
+    """Whether an if statement's else branch is a lone if, emitted as ``else if``"""
+    return len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If)
+
+def _mentions(node, name):
+    return any(isinstance(n, ast.Name) and n.id == name for n in ast.walk(node))
+
+def _scalar_type(node):
+    """
+    "int", "float", "str" or "bool" for a literal or an expression typed by
+    the type-inference pass; None when unknown.
+    """
+    if isinstance(node, ast.Constant):
+        return {bool: "bool", int: "int", float: "float", str: "str"}.get(type(node.value))
+    return getattr(node, "scalar_type", None)
+
+def _is_scalar(node):
+    """Whether an expression is a number, string or boolean, whose truthiness JS shares"""
+    if _scalar_type(node) is not None:
+        return True
+    if isinstance(node, (ast.Constant, ast.Compare, ast.BinOp, ast.UnaryOp, ast.JoinedStr)):
+        return True
+    if isinstance(node, ast.BoolOp):
+        return all(_is_scalar(value) for value in node.values)
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _SCALAR_CALLS
+
+def _is_bigint(node):
+    """Whether the integer-ranges pass made an int expression a BigInt"""
+    return getattr(node, "bigint", False)
+
+def _floors_inline(node):
+    """Whether a BinOp is numeric // by a non-zero literal, emitted as Math.floor(a / b)"""
+    return (isinstance(node.op, ast.FloorDiv) and not _is_bigint(node)
+            and _scalar_type(node.left) in ("int", "float")
+            and isinstance(node.right, ast.Constant) and _scalar_type(node.right) in ("int", "float")
+            and node.right.value != 0)
+
+def _wraps_itself(node, minify):
+    """Whether a BinOp is emitted inside its own parentheses"""
+    if minify:
+        return isinstance(node.op, _BITWISE)
+    return isinstance(node.left, ast.BinOp) or isinstance(node.right, ast.BinOp)
+
+# Nodes that open a scope of their own
+_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda,
+           ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+def _plan_locals(function):
+    """
+    Decide how a function's locals are declared, given that ``let`` is block
+    scoped while a Python local belongs to the whole function.
+
+    Returns ``(hoisted, constants, outer)``. ``hoisted`` names are declared
+    up front by one ``let`` because their first binding is inside a block or
+    is not a plain assignment. ``constants`` are bound exactly once, by a
+    top-level assignment, and become ``const``. ``outer`` names are declared
+    ``global`` or ``nonlocal`` and never declared here. Any other local is
+    declared by its first, top-level assignment, and names bound only as
+    loop targets get a ``let`` in each loop.
+    """
+    arguments = function.args
+    params = {arg.arg for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs}
+    params |= {arg.arg for arg in (arguments.vararg, arguments.kwarg) if arg is not None}
+    top_level = set(map(id, function.body))
+    events = {}
+    outer = set()
+    stack = list(reversed(function.body))
+    while stack:
+        node = stack.pop()
+        children = list(ast.iter_child_nodes(node))
+        if isinstance(node, _SCOPES):
+            if not isinstance(node, (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+                events.setdefault(node.name, []).append("def")
+            continue
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            outer.update(node.names)
+        elif (isinstance(node, ast.Assign) and id(node) in top_level and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name)):
+            events.setdefault(node.targets[0].id, []).append("top")
+            children = [node.value]
+        elif isinstance(node, (ast.For, CountedFor)) and isinstance(node.target, ast.Name):
+            events.setdefault(node.target.id, []).append("loop")
+            children = [child for child in children if child is not node.target]
+        elif isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            events.setdefault(node.id, []).append("other")
+        stack.extend(reversed(children))
+
+    hoisted = []
+    constants = set()
+    for name, kinds in events.items():
+        if name in params or name in outer or "def" in kinds:
+            continue
+        if kinds == ["top"]:
+            constants.add(name)
+        elif kinds[0] != "top" and set(kinds) != {"loop"}:
+            hoisted.append(name)
+    return hoisted, constants, outer
+
+def _set_bindings(scope):
+    """
+    Map each name a module or function binds to whether every binding is a
+    set comprehension, whose value is a JavaScript Set.
+    """
+    sets = {}
+    if not isinstance(scope, ast.Module):
+        arguments = scope.args
+        for arg in arguments.posonlyargs + arguments.args + arguments.kwonlyargs + [arguments.vararg, arguments.kwarg]:
+            if arg is not None:
+                sets[arg.arg] = False
+    stack = list(scope.body)
+    while stack:
+        node = stack.pop()
+        children = list(ast.iter_child_nodes(node))
+        if isinstance(node, _SCOPES):
+            if not isinstance(node, (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+                sets[node.name] = False
+            continue
+        if isinstance(node, (ast.Global, ast.Nonlocal)):
+            sets.update(dict.fromkeys(node.names, False))
+        elif isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            sets[name] = sets.get(name, True) and isinstance(node.value, ast.SetComp)
+            children = [node.value]
+        elif isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            sets[node.id] = False
+        stack.extend(children)
+    return sets
+
+class CountedFor(ast.stmt):
+    """
+    ``for target in range(start, stop, step)`` as lowered by the range-loops
+    pass; emitted as a counted for-loop instead of iterating an array.
+    """
+    _fields = ("target", "start", "stop", "step", "body")
+
+class Temporary(ast.stmt):
+    """A ``const`` introduced by a pass, such as a hoisted loop invariant"""
+    _fields = ("name", "value")
+
+class TypedArray(ast.expr):
+    """``[fill] * length`` allocated as a JavaScript typed array of ``kind``"""
+    _fields = ("kind", "length", "fill")
+
+class MapGet(ast.expr):
+    """``map.get(key, default)`` on a dict the dict-maps pass built as a Map"""
+    _fields = ("map", "key", "default")
+
+def _repeats_list(node):
+    """Whether a BinOp is ``[x] * n`` or ``n * [x]``"""
+    if not isinstance(node.op, ast.Mult):
+        return False
+    lists = [isinstance(side, ast.List) and len(side.elts) == 1 for side in (node.left, node.right)]
+    return lists.count(True) == 1
+
+# Python methods with a JavaScript counterpart
+_SPECIAL_METHODS = {"__init__": "constructor", "__str__": "toString"}
+
+def _method_name(name):
+    """A method's JavaScript name: camelCase like functions, keeping leading underscores and dunders"""
+    if name in _SPECIAL_METHODS:
+        return _SPECIAL_METHODS[name]
+    if name.startswith("__") and name.endswith("__"):
+        return name
+    core = name.lstrip("_")
+    parts = core.split("_")
+    return name[:len(name) - len(core)] + parts[0] + "".join(p.capitalize() for p in parts[1:])
+
+def class_declarations(tree):
+    """
+    ``(classes, methods)`` for a module: for each class it defines, the name
+    of its base (None without one) and the attributes its instances get,
+    and the JavaScript names of methods where those differ, which every
+    attribute access uses.
+    """
+    classes = {}
+    methods = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            base = node.bases[0].id if len(node.bases) == 1 and isinstance(node.bases[0], ast.Name) else None
+            try:
+                slots, fields, _ = _class_layout(node)
+            except NotImplementedError:
+                # Reported where the class itself is emitted
+                slots, fields = None, []
+            classes[node.name] = (None if base == "object" else base, list(dict.fromkeys((slots or []) + fields)))
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef) and item.name != "__init__":
+                    if _method_name(item.name) != item.name:
+                        methods[item.name] = _method_name(item.name)
+    return classes, methods
+
+def set_names(*modules):
+    """
+    Names that the given parts of one module bind only to set comprehensions,
+    so that their values are JavaScript Sets everywhere.
+    """
+    sets = {}
+    for module in modules:
+        for name, only_sets in _set_bindings(module).items():
+            sets[name] = sets.get(name, True) and only_sets
+    return {name for name, only_sets in sets.items() if only_sets}
+
+def _is_super(node):
+    """Whether an expression is a bare ``super()``"""
+    return (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "super"
+            and not node.args and not node.keywords)
+
+def _method_kind(method):
+    """"method", "static", "class", "get" or "set", from a method's decorators"""
+    if not method.decorator_list:
+        return "method"
+    if len(method.decorator_list) == 1:
+        decorator = method.decorator_list[0]
+        if isinstance(decorator, ast.Name) and decorator.id in ("staticmethod", "classmethod", "property"):
+            return {"staticmethod": "static", "classmethod": "class", "property": "get"}[decorator.id]
+        if isinstance(decorator, ast.Attribute) and decorator.attr == "setter":
+            return "set"
+    raise NotImplementedError(f"Decorators on method {method.name} are not supported")
+
+def _class_layout(node):
+    """
+    Plan the members of a class. Returns ``(slots, fields, statics)``:
+    the names in ``__slots__`` (None without one), every attribute a method
+    assigns on its ``self``, in order of first assignment with __init__
+    read first, and the names the class body binds itself.
+    """
+    slots = None
+    statics = []
+    methods = []
+    for item in node.body:
+        if isinstance(item, ast.Assign) and len(item.targets) == 1 and isinstance(item.targets[0], ast.Name):
+            if item.targets[0].id != "__slots__":
+                statics.append(item.targets[0].id)
+                continue
+            names = item.value.elts if isinstance(item.value, (ast.Tuple, ast.List)) else [item.value]
+            if not all(isinstance(name, ast.Constant) and isinstance(name.value, str) for name in names):
+                raise NotImplementedError("__slots__ must list attribute names")
+            slots = [name.value for name in names]
+        elif isinstance(item, ast.FunctionDef):
+            if _method_kind(item) in ("method", "get", "set") and item.args.args:
+                methods.append(item)
+    methods.sort(key=lambda method: method.name != "__init__")
+
+    fields = []
+    for method in methods:
+        self_name = method.args.args[0].arg
+        for child in ast.walk(method):
+            if (isinstance(child, ast.Attribute) and not isinstance(child.ctx, ast.Load)
+                    and isinstance(child.value, ast.Name) and child.value.id == self_name
+                    and child.attr not in fields):
+                fields.append(child.attr)
+    return slots, fields, statics
+
+def _assigns_self(statement, self_name):
+    """Whether a statement is ``self.attr = value`` with no method call in ``value``"""
+    if not (isinstance(statement, ast.Assign) and len(statement.targets) == 1):
+        return False
+    target = statement.targets[0]
+    if not (isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name)
+            and target.value.id == self_name):
+        return False
+    # A method called here could add attributes before this one
+    return not any(isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                   and isinstance(node.func.value, ast.Name) and node.func.value.id == self_name
+                   for node in ast.walk(statement.value))
 
 class PyToJSTransformer(ast.NodeTransformer):
-    def __init__(self):
+    def __init__(self, iterative=False, budget=None, minify=False, truthy=False):
         super().__init__()
         self.imports = set()
         self.indent_level = 0
         self.function_stack = []
+        # Per function being emitted: names already declared, and the ones
+        # to declare with const
+        self.local_scopes = []
+        # Per module and function being emitted: names that always hold a Set
+        self.set_scopes = []
+        # Walk BinOp chains and if/elif chains with an explicit stack
+        self.iterative = iterative
+        self.budget = budget
+        # Parenthesize by precedence only; whitespace is squeezed afterwards
+        self.minify = minify
+        # Give tests Python truthiness through __truthy (optimizing levels)
+        self.truthy = truthy
+        # Classes of the module as class_declarations() gives them, and
+        # method names that change in JavaScript
+        self.classes = {}
+        self.method_names = {}
+        # Per method being emitted: the name of its self parameter, and the
+        # class attributes it reads through self (None in classmethods)
+        self.method_stack = []
+    
+    def visit(self, node):
+        if self.budget is not None:
+            self.budget.charge()
+        generator = None
+        if self.iterative:
+            generator = getattr(self, "_iter_" + node.__class__.__name__, None)
+        if generator is not None:
+            result = self._visit_iterative(generator(node))
+        else:
+            result = super().visit(node)
+        result = self._convert(node, result)
+        if self.budget is not None:
+            self.budget.check_output(result)
+        return result
+    
+    def _visit_iterative(self, root):
+        """
+        Drive visitor generators with an explicit work stack.
+        
+        An ``_iter_<Node>`` generator yields each child it needs and receives
+        the child's JavaScript back, then returns its own code once all
+        children are done (post-order assembly). Children without a generator
+        are visited normally.
+        """
+        # (generator, node) pairs; the root's node is converted by visit()
+        stack = [(root, None)]
+        value = None
+        while stack:
+            try:
+                child = stack[-1][0].send(value)
+            except StopIteration as done:
+                _, node = stack.pop()
+                value = done.value if node is None else self._convert(node, done.value)
+                if self.budget is not None:
+                    self.budget.check_output(value)
+                continue
+            generator = getattr(self, "_iter_" + child.__class__.__name__, None)
+            if generator is None:
+                value = self.visit(child)
+            else:
+                if self.budget is not None:
+                    self.budget.charge()
+                stack.append((generator(child), child))
+                value = None
+        return value
+    
+    def _convert(self, node, code):
+        """Change representation where the integer-ranges pass marked a node to"""
+        conversion = getattr(node, "convert", None)
+        if conversion is None:
+            return code
+        if conversion == "bigint":
+            if isinstance(node, ast.Constant):
+                return f"{int(node.value)}n"
+            return f"BigInt({code})"
+        return f"{'Number' if conversion == 'number' else 'String'}({code})"
     
     def _indent(self, code):
         return "    " * self.indent_level + code
     
+    def _helper(self, name):
+        """Name of a runtime helper, adding its source to the module once"""
+        from runtime import HELPERS
+        self.imports.add(HELPERS[name])
+        return name
+    
+    def _condition(self, node):
+        """
+        JavaScript for ``node`` as an if/while test or ``not`` operand. With
+        ``truthy`` set, values that may be containers go through __truthy,
+        since an empty JS array or object is true.
+        """
+        if isinstance(node, ast.BoolOp):
+            joiner = " && " if isinstance(node.op, ast.And) else " || "
+            tests = [self._condition(value) for value in node.values]
+            return joiner.join(f"({test})" if isinstance(value, ast.BoolOp) else test
+                               for value, test in zip(node.values, tests))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return f"!{self._group(node.operand, self._condition(node.operand))}"
+        code = self.visit(node)
+        if not self.truthy or _is_scalar(node):
+            return code
+        return f"{self._helper('__truthy')}({code})"
+    
+    def _is_set(self, node):
+        """Whether an expression is known to evaluate to a JavaScript Set"""
+        if isinstance(node, ast.SetComp):
+            return True
+        return isinstance(node, ast.Name) and bool(self.set_scopes) and node.id in self.set_scopes[-1]
+    
+    def _group(self, node, code):
+        """Parenthesize the operand of a prefix operator unless it is atomic"""
+        if isinstance(node, ast.BinOp) and (isinstance(node.op, _CALL_OPS) or _wraps_itself(node, self.minify)):
+            return code
+        if isinstance(node, (ast.BinOp, ast.BoolOp, ast.Compare, ast.UnaryOp, ast.IfExp)):
+            return f"({code})"
+        return code
+    
     def _camel_case(self, name):
         if "_" not in name:
             return name
         parts = name.split("_")
         return parts[0] + "".join(p.capitalize() for p in parts[1:])
     
-    def visit_Module(self, node):
+    def declare_classes(self, declarations):
+        """Take the ``(classes, methods)`` of class_declarations() for the whole module"""
+        classes, methods = declarations
+        self.classes.update(classes)
+        self.method_names.update(methods)
+    
+    def begin_module(self, declarations, sets):
+        """
+        Start emitting top-level statements of a module, given its
+        class_declarations() and set_names() for the whole module.
+        """
         self.imports.clear()
-        body = [self.visit(n) for n in node.body]
-        body = [b for b in body if b is not None and b.strip()]
-        
-        js_code = []
-        if self.imports:
-            js_code.extend(sorted(self.imports))
-            js_code.append("")
-        js_code.extend(body)
-        return "\n".join(js_code)
+        self.declare_classes(declarations)
+        self.set_scopes = [sets]
+    
+    def visit_Module(self, node):
+        self.begin_module(class_declarations(node), set_names(node))
+        body = self.visit_statements(node.body)
+        return join_module(self.imports, body)
+    
+    def visit_statements(self, statements):
+        """JavaScript for each top-level statement, dropping empty ones"""
+        body = [self.visit(n) for n in statements]
+        return [b for b in body if b is not None and b.strip()]
     
     def visit_FunctionDef(self, node):
-        self.function_stack.append(node.name)
         func_name = self._camel_case(node.name)
         args = [arg.arg for arg in node.args.args]
         js_args = ", ".join(args)
-        
+        js_body = self._function_body(node, args)
+        if self.method_stack and self.method_stack[-1][0] is not None:
+            # An arrow function sees the method's this
+            return f"const {func_name} = ({js_args}) => {{\n{js_body}\n}};"
+        return f"function {func_name}({js_args}) {{\n{js_body}\n}}"
+    
+    def _function_body(self, node, params, inserts=None):
+        """
+        The statements of a function, with its locals declared. ``inserts``
+        maps a statement index to JavaScript lines emitted before it (or
+        after the last statement, for the index past the end).
+        """
+        inserts = inserts or {}
+        self.function_stack.append(node.name)
+        hoisted, constants, outer = _plan_locals(node)
+        self.local_scopes.append((set(params) | set(hoisted) | outer, constants))
+        # Names the function does not bind keep what the enclosing scope knows
+        bindings = _set_bindings(node)
+        outer_sets = self.set_scopes[-1] if self.set_scopes else set()
+        self.set_scopes.append({name for name in outer_sets if name not in bindings}
+                               | {name for name, only_sets in bindings.items() if only_sets})
         self.indent_level += 1
-        body = [self.visit(n) for n in node.body]
+        body = []
+        for index, statement in enumerate(node.body):
+            body.extend(inserts.get(index, ()))
+            body.append(self.visit(statement))
+        body.extend(inserts.get(len(node.body), ()))
         body = [b for b in body if b is not None and b.strip()]
+        if hoisted:
+            body.insert(0, f"let {', '.join(hoisted)};")
         self.indent_level -= 1
+        self.local_scopes.pop()
+        self.set_scopes.pop()
         
         js_body = "\n".join([self._indent(line) for line in body if line])
         if not js_body:
             js_body = self._indent("// pass")
         
         self.function_stack.pop()
-        return f"function {func_name}({js_args}) {{\n{js_body}\n}}"
+        return js_body
+    
+    def visit_ClassDef(self, node):
+        bases = [base for base in node.bases if not (isinstance(base, ast.Name) and base.id == "object")]
+        if len(bases) > 1 or node.keywords:
+            raise NotImplementedError(f"Class {node.name} has more than one base, which is not supported")
+        if node.decorator_list:
+            raise NotImplementedError(f"Decorators on class {node.name} are not supported")
+        base = self.visit(bases[0]) if bases else None
+        if node.name not in self.classes:
+            self.declare_classes(class_declarations(node))
+        
+        slots, fields, statics = _class_layout(node)
+        # Every instance gets its attributes in the same order, so they share
+        # one hidden class; the base constructor already set its own
+        inherited = set()
+        ancestor = self.classes[node.name][0]
+        while ancestor in self.classes and ancestor != node.name:
+            inherited.update(self.classes[ancestor][1])
+            ancestor = self.classes[ancestor][0]
+        layout = [name for name in self.classes[node.name][1] if name not in inherited]
+        
+        members = []
+        has_init = False
+        for item in node.body:
+            if isinstance(item, ast.Pass) or (isinstance(item, ast.Expr) and isinstance(item.value, ast.Constant)
+                                              and isinstance(item.value.value, str)):
+                continue
+            if isinstance(item, ast.Assign) and len(item.targets) == 1 and isinstance(item.targets[0], ast.Name):
+                if item.targets[0].id != "__slots__":
+                    members.append(f"static {item.targets[0].id} = {self.visit(item.value)};")
+            elif isinstance(item, ast.FunctionDef):
+                has_init = has_init or item.name == "__init__"
+                members.append(self._method(item, base, slots, layout, set(statics) - set(fields)))
+            else:
+                raise NotImplementedError(f"{type(item).__name__} in the body of class {node.name} is not supported")
+        if not has_init and layout:
+            initializers = [f"this.{self._attribute_name(name)} = undefined;" for name in layout]
+            if base:
+                initializers.insert(0, "super(...args);")
+            members.insert(0, "constructor({}) {{\n{}\n}}".format("...args" if base else "",
+                                                                   "\n".join(initializers)))
+        
+        header = f"class {node.name} extends {base}" if base else f"class {node.name}"
+        if not members:
+            return f"{header} {{}}"
+        body = "\n".join("    " + line for member in members for line in member.split("\n"))
+        return f"{header} {{\n{body}\n}}"
+    
+    def _method(self, node, base, slots, layout, statics):
+        kind = _method_kind(node)
+        params = [arg.arg for arg in node.args.args]
+        self_name = params[0] if kind != "static" and params else None
+        js_params = params[1:] if self_name is not None else params
+        
+        inserts = {}
+        if node.name == "__init__" and kind == "method":
+            start = 0
+            if base:
+                calls = [child for child in ast.walk(node) if isinstance(child, ast.Call)
+                         and isinstance(child.func, ast.Attribute) and child.func.attr == "__init__"
+                         and _is_super(child.func.value)]
+                first = node.body[0] if node.body else None
+                if calls and not (isinstance(first, ast.Expr) and first.value is calls[0] and len(calls) == 1):
+                    raise NotImplementedError("super().__init__() must be the first statement of __init__")
+                if calls:
+                    start = 1
+                else:
+                    # JavaScript constructors of subclasses must call the base one
+                    inserts[0] = ["super();"]
+            # Attributes assigned straight away come first, then the rest in a fixed order
+            leading = start
+            while leading < len(node.body) and _assigns_self(node.body[leading], self_name):
+                leading += 1
+            assigned = {statement.targets[0].attr for statement in node.body[start:leading]}
+            if slots:
+                inserts.setdefault(start, []).extend(
+                    f"this.{self._attribute_name(name)} = undefined;" for name in layout if name in slots)
+                assigned |= set(slots)
+            inserts.setdefault(leading, []).extend(
+                f"this.{self._attribute_name(name)} = undefined;" for name in layout if name not in assigned)
+        
+        self.method_stack.append((self_name, statics if kind != "class" else None))
+        js_body = self._function_body(node, params, inserts)
+        self.method_stack.pop()
+        prefix = {"static": "static ", "class": "static ", "get": "get ", "set": "set "}.get(kind, "")
+        return f"{prefix}{_method_name(node.name)}({', '.join(js_params)}) {{\n{js_body}\n}}"
+    
+    def _attribute_name(self, name):
+        return self.method_names.get(name, name)
 
     def visit_Return(self, node):
         if node.value:
@@ -55,14 +696,27 @@ class PyToJSTransformer(ast.NodeTransformer):
     
     def visit_Assign(self, node):
         target = node.targets[0]
-        if isinstance(target, ast.Name):
-            target_name = target.id
-        else:
-            target_name = self.visit(target)
-            
         value = self.visit(node.value)
-        declaration = "let " if not self.function_stack else "const "
-        return f"{declaration}{target_name} = {value};"
+        if not isinstance(target, ast.Name):
+            # Stores into items and attributes declare nothing
+            return f"{self.visit(target)} = {value};"
+        
+        declaration = self._declaration(target.id)
+        if type(node.value) in _COLLECTIONS and not _mentions(node.value, target.id):
+            # Fill the collection in place rather than inside a closure
+            empty, loops = self._comprehension(node.value, target.id)
+            return f"{declaration}{target.id} = {empty};\n{self._indent(loops)}"
+        return f"{declaration}{target.id} = {value};"
+    
+    def _declaration(self, name):
+        """The keyword to bind ``name`` with: let or const the first time in a function, then none"""
+        if not self.local_scopes:
+            return "let "
+        declared, constants = self.local_scopes[-1]
+        if name in declared:
+            return ""
+        declared.add(name)
+        return "const " if name in constants else "let "
     
     def visit_AugAssign(self, node):
         target = self.visit(node.target)
@@ -75,57 +729,137 @@ class PyToJSTransformer(ast.NodeTransformer):
         
         return f"{target} {op}= {value};"
     
+    def visit_Temporary(self, node):
+        return f"const {node.name} = {self.visit(node.value)};"
+    
     def visit_Name(self, node):
+        if self.method_stack and node.id == self.method_stack[-1][0]:
+            return "this"
         return node.id
     
+    def visit_Attribute(self, node):
+        attr = self._attribute_name(node.attr)
+        if (self.method_stack and isinstance(node.value, ast.Name) and node.value.id == self.method_stack[-1][0]
+                and self.method_stack[-1][1] and node.attr in self.method_stack[-1][1]):
+            # A class attribute read through self, as Python falls back to the class
+            return f"this.constructor.{attr}"
+        return f"{self.visit(node.value)}.{attr}"
+    
+    def visit_Subscript(self, node):
+        value = self.visit(node.value)
+        index = node.slice
+        if isinstance(index, ast.Slice):
+            lower = self.visit(index.lower) if index.lower else None
+            upper = self.visit(index.upper) if index.upper else None
+            if index.step is None or (isinstance(index.step, ast.Constant) and index.step.value == 1):
+                # Array and string .slice() read negative bounds like Python
+                args = [lower or "0", upper] if upper else [lower] if lower else []
+                return f"{value}.slice({', '.join(args)})"
+            helper = self._helper("__slice")
+            return f"{helper}({value}, {lower or 'undefined'}, {upper or 'undefined'}, {self.visit(index.step)})"
+        
+        # Constant folding turns -1 into a negative Constant
+        if isinstance(index, ast.UnaryOp) and isinstance(index.op, ast.USub) and isinstance(index.operand, ast.Constant):
+            offset = self.visit(index.operand)
+        elif (isinstance(index, ast.Constant) and isinstance(index.value, int) and not isinstance(index.value, bool)
+                and index.value < 0):
+            offset = str(-index.value)
+        else:
+            offset = None
+        if offset is not None and isinstance(node.value, ast.Name):
+            # Negative literal index: count from the end
+            return f"{value}[{value}.length - {offset}]"
+        if offset is not None or (isinstance(index, ast.UnaryOp) and isinstance(index.op, ast.USub)
+                                  and isinstance(node.ctx, ast.Load)):
+            # .at() counts from the end for any negative index
+            return f"{value}.at({self.visit(index)})"
+        return f"{value}[{self.visit(index)}]"
+    
     def visit_Str(self, node):
-        return json.dumps(node.s)
+        return _js_string(node.s)
     
     def visit_Constant(self, node):
         if isinstance(node.value, str):
-            return json.dumps(node.value)
+            return _js_string(node.value)
         elif isinstance(node.value, bool):
             return "true" if node.value else "false"
         elif node.value is None:
             return "null"
+        if _is_bigint(node):
+            return f"{node.value}n"
         return str(node.value)
     
     def visit_List(self, node):
         elements = [self.visit(e) for e in node.elts]
         return f"[{', '.join(elements)}]"
     
+    def visit_Tuple(self, node):
+        # Arrays also destructure tuple targets: for (let [k, v] of pairs)
+        elements = [self.visit(e) for e in node.elts]
+        return f"[{', '.join(elements)}]"
+    
     def visit_Dict(self, node):
+        if getattr(node, "as_map", False):
+            entries = ", ".join(f"[{self.visit(key)}, {self.visit(value)}]" for key, value in zip(node.keys, node.values))
+            return f"new Map([{entries}])" if entries else "new Map()"
         pairs = []
         for key, value in zip(node.keys, node.values):
             if isinstance(key, ast.Str) or (isinstance(key, ast.Constant) and isinstance(key.value, str)):
                 key_val = key.s if hasattr(key, 's') else key.value
-                pairs.append(f"{json.dumps(key_val)}: {self.visit(value)}")
+                pairs.append(f"{_js_string(key_val)}: {self.visit(value)}")
             else:
                 pairs.append(f"[{self.visit(key)}]: {self.visit(value)}")
         return f"{{{', '.join(pairs)}}}"
     
     def visit_Call(self, node):
+        if _is_super(node):
+            return "super"
+        if isinstance(node.func, ast.Attribute) and node.func.attr == "__init__" and _is_super(node.func.value):
+            return f"super({', '.join(self.visit(arg) for arg in node.args)})"
         func = self.visit(node.func)
+        if isinstance(node.func, ast.Name) and (node.func.id in self.classes or func == "this"):
+            # Classes, and cls in a classmethod, construct instances
+            return f"new {func}({', '.join(self.visit(arg) for arg in node.args)})"
         
         # Handle built-in functions
         if isinstance(node.func, ast.Name):
+            reduction = self._reduction(node)
+            if reduction is not None:
+                return reduction
             if func == "print":
                 func = "console.log"
             elif func == "int":
                 args = [self.visit(arg) for arg in node.args]
                 if len(args) == 1:
+                    # Numbers convert without the round trip through a string
+                    kind = _scalar_type(node.args[0])
+                    if kind == "int":
+                        return args[0]
+                    if kind == "float":
+                        return f"Math.trunc({args[0]})"
+                    if kind == "bool":
+                        return f"Number({args[0]})"
                     return f"parseInt({args[0]}, 10)"
             elif func == "float":
                 args = [self.visit(arg) for arg in node.args]
                 if len(args) == 1:
+                    kind = _scalar_type(node.args[0])
+                    if kind in ("int", "float"):
+                        return args[0]
+                    if kind == "bool":
+                        return f"Number({args[0]})"
                     return f"parseFloat({args[0]})"
             elif func == "str":
                 args = [self.visit(arg) for arg in node.args]
                 if len(args) == 1:
+                    if _scalar_type(node.args[0]) == "str":
+                        return args[0]
                     return f"String({args[0]})"
             elif func == "len":
                 args = [self.visit(arg) for arg in node.args]
                 if len(args) == 1:
+                    if self._is_set(node.args[0]):
+                        return f"{args[0]}.size"
                     return f"{args[0]}.length"
             elif func == "range":
                 args = [self.visit(arg) for arg in node.args]
@@ -148,12 +882,85 @@ class PyToJSTransformer(ast.NodeTransformer):
         
         return f"{func}({', '.join(args)})"
     
+    def visit_ListComp(self, node):
+        empty, loops = self._comprehension(node, "$result")
+        return f"(() => {{ const $result = {empty}; {loops} return $result; }})()"
+    
+    visit_SetComp = visit_ListComp
+    visit_DictComp = visit_ListComp
+    
+    def visit_GeneratorExp(self, node):
+        # A JavaScript generator is lazy like Python's
+        loops = self._comprehension_loops(node.generators, f"yield {self.visit(node.elt)};")
+        return f"(function* () {{ {loops} }})()"
+    
+    def _comprehension(self, node, result):
+        """The empty collection and the loops filling ``result`` for a list, set or dict comprehension"""
+        empty, add = _MAP_COLLECTION if getattr(node, "as_map", False) else _COLLECTIONS[type(node)]
+        if isinstance(node, ast.DictComp):
+            add = add.format(result=result, key=self.visit(node.key), value=self.visit(node.value))
+        else:
+            add = add.format(result=result, elt=self.visit(node.elt))
+        return empty.format(), self._comprehension_loops(node.generators, add)
+    
+    def _comprehension_loops(self, generators, innermost):
+        """Nested loops and filters from ``for``/``if`` clauses around the ``innermost`` statement"""
+        loops = [(self._loop_header(g.target, g.iter, g.is_async), [self._condition(test) for test in g.ifs])
+                 for g in generators]
+        code = innermost
+        for header, tests in reversed(loops):
+            if tests:
+                code = f"if ({' && '.join(f'({test})' if len(tests) > 1 else test for test in tests)}) {{ {code} }}"
+            code = f"{header} {{ {code} }}"
+        return code
+    
+    def _loop_header(self, target, iterable, is_async=False):
+        if is_async:
+            raise ValueError("async comprehensions are not supported")
+        target = self.visit(target)
+        if (isinstance(iterable, ast.Call) and isinstance(iterable.func, ast.Name)
+                and iterable.func.id == "range" and 1 <= len(iterable.args) <= 3 and not iterable.keywords):
+            # Count instead of building the range as an array
+            args = list(iterable.args)
+            start = args.pop(0) if len(args) > 1 else ast.Constant(0)
+            stop = args.pop(0)
+            step = args[0] if args else ast.Constant(1)
+            if not (isinstance(step, ast.Constant) and not step.value):
+                return f"for ({self._counted_header(target, start, stop, step)})"
+        return f"for (const {target} of {self.visit(iterable)})"
+    
+    def _reduction(self, node):
+        """
+        ``sum``/``any``/``all`` over a generator or list comprehension as one
+        loop that allocates nothing and stops where Python would; None for
+        any other call.
+        """
+        name = node.func.id
+        if (name not in ("sum", "any", "all") or node.keywords or not node.args
+                or not isinstance(node.args[0], (ast.GeneratorExp, ast.ListComp))):
+            return None
+        comp = node.args[0]
+        if name == "sum":
+            if len(node.args) > 2:
+                return None
+            start = self.visit(node.args[1]) if len(node.args) == 2 else "0"
+            loops = self._comprehension_loops(comp.generators, f"$total += {self.visit(comp.elt)};")
+            return f"(() => {{ let $total = {start}; {loops} return $total; }})()"
+        if len(node.args) > 1:
+            return None
+        if name == "any":
+            loops = self._comprehension_loops(comp.generators, f"if ({self._condition(comp.elt)}) return true;")
+            return f"(() => {{ {loops} return false; }})()"
+        test = self._group(comp.elt, self._condition(comp.elt))
+        loops = self._comprehension_loops(comp.generators, f"if (!{test}) return false;")
+        return f"(() => {{ {loops} return true; }})()"
+    
     def visit_JoinedStr(self, node):
         parts = []
         for value in node.values:
             if isinstance(value, ast.Str) or (isinstance(value, ast.Constant) and isinstance(value.value, str)):
                 string_value = value.s if hasattr(value, 's') else value.value
-                parts.append(json.dumps(string_value)[1:-1])  # Remove quotes
+                parts.append(_js_string(string_value)[1:-1])  # Remove quotes
             elif isinstance(value, ast.FormattedValue):
                 parts.append(f"${{{self.visit(value.value)}}}")
         return f'`{"".join(parts)}`'
@@ -161,25 +968,100 @@ class PyToJSTransformer(ast.NodeTransformer):
     def visit_FormattedValue(self, node):
         return f"${{{self.visit(node.value)}}}"
     
+    def visit_TypedArray(self, node):
+        array = f"new {node.kind}({self.visit(node.length)})"
+        if node.fill.value == 0:
+            return array
+        return f"{array}.fill({self.visit(node.fill)})"
+    
+    def visit_MapGet(self, node):
+        helper = self._helper("__mapget")
+        return f"{helper}({self.visit(node.map)}, {self.visit(node.key)}, {self.visit(node.default)})"
+    
+    def _repeat_list(self, node):
+        # The element is shared by every slot, as in Python
+        single, length = (node.left, node.right) if isinstance(node.left, ast.List) else (node.right, node.left)
+        return f"new Array({self.visit(length)}).fill({self.visit(single.elts[0])})"
+    
     def visit_BinOp(self, node):
+        if _repeats_list(node):
+            return self._repeat_list(node)
         left = self.visit(node.left)
-        op = self.visit(node.op)
         right = self.visit(node.right)
+        if self._wrap_operand(node, node.left, right_side=False):
+            left = f"({left})"
+        if self._wrap_operand(node, node.right, right_side=True):
+            right = f"({right})"
+        prefix, infix, suffix = self._binop_parts(node)
+        return f"{prefix}{left}{infix}{right}{suffix}"
+    
+    def _wrap_operand(self, parent, child, right_side):
+        """Whether a BinOp operand needs its own parentheses to keep its grouping"""
+        if not isinstance(child, ast.BinOp) or isinstance(child.op, _CALL_OPS) or _repeats_list(child):
+            return False
+        # Operands of a call are already grouped by its parentheses
+        if isinstance(parent.op, _CALL_OPS) and not _floors_inline(parent):
+            return False
+        # An operand with BinOp children is already wrapped by _binop_parts
+        if _wraps_itself(child, self.minify):
+            return False
+        parent_level = _PRECEDENCE.get(type(parent.op), 0)
+        child_level = _PRECEDENCE.get(type(child.op), 0)
+        return child_level < parent_level or (right_side and child_level == parent_level)
+    
+    def _binop_parts(self, node):
+        """Return the text around a BinOp's operands as (prefix, infix, suffix)"""
+        op = self.visit(node.op)
         
+        if _is_bigint(node) and type(node.op) in _BIGINT_HELPERS:
+            return f"{self._helper(_BIGINT_HELPERS[type(node.op)])}(", ", ", ")"
         # Special case for power operator
         if isinstance(node.op, ast.Pow):
-            return f"Math.pow({left}, {right})"
+            return "Math.pow(", ", ", ")"
+        if _floors_inline(node):
+            return "Math.floor(", " / ", ")"
+        if type(node.op) in _OP_HELPERS:
+            return f"{self._helper(_OP_HELPERS[type(node.op)])}(", ", ", ")"
         
         # Add parentheses for complex expressions to ensure correct precedence
-        if isinstance(node.left, ast.BinOp) or isinstance(node.right, ast.BinOp):
-            return f"({left} {op} {right})"
+        if _wraps_itself(node, self.minify):
+            return "(", f" {op} ", ")"
         
-        return f"{left} {op} {right}"
+        return "", f" {op} ", ""
+    
+    def _iter_BinOp(self, node):
+        # Collect the left spine so a long chain costs one frame, not one per operand
+        if _repeats_list(node):
+            return self._repeat_list(node)
+        spine = [node]
+        while isinstance(spine[-1].left, ast.BinOp) and not _repeats_list(spine[-1].left):
+            spine.append(spine[-1].left)
+            # Each link counts as a visited node, as it would when recursing
+            if self.budget is not None:
+                self.budget.charge()
+        spine.reverse()
+        
+        left = yield spine[0].left
+        prefixes = []
+        rest = []
+        for index, binop in enumerate(spine):
+            right = yield binop.right
+            if self._wrap_operand(binop, binop.right, right_side=True):
+                right = f"({right})"
+            prefix, infix, suffix = self._binop_parts(binop)
+            if index + 1 < len(spine) and self._wrap_operand(spine[index + 1], binop, right_side=False):
+                prefix, suffix = "(" + prefix, suffix + ")"
+            prefixes.append(prefix)
+            rest.extend((infix, right, suffix))
+        
+        # Joining once keeps assembly linear in the size of the output
+        prefixes.reverse()
+        return "".join(prefixes) + left + "".join(rest)
     
     def visit_Compare(self, node):
-        left = self.visit(node.left)
+        left = self._compare_operand(node.left)
         ops = [self.visit(op) for op in node.ops]
-        comparators = [self.visit(comp) for comp in node.comparators]
+        comparators = [self._compare_operand(comp) for comp in node.comparators]
         
         comparisons = []
         for i, op in enumerate(ops):
@@ -187,32 +1069,94 @@ class PyToJSTransformer(ast.NodeTransformer):
         
         return " && ".join(comparisons)
     
+    def _compare_operand(self, node):
+        """An operand of a comparison; bitwise operators bind looser than one in JavaScript"""
+        code = self.visit(node)
+        if isinstance(node, ast.BinOp) and isinstance(node.op, _BITWISE) and not _wraps_itself(node, self.minify):
+            return f"({code})"
+        return code
+    
+    def visit_BoolOp(self, node):
+        # Python's and/or also return the operand that decided the result
+        joiner = " && " if isinstance(node.op, ast.And) else " || "
+        values = [self.visit(value) for value in node.values]
+        return joiner.join(f"({code})" if isinstance(value, (ast.BoolOp, ast.IfExp)) else code
+                           for value, code in zip(node.values, values))
+    
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return self._condition(node)
+        if isinstance(node.op, ast.UAdd) and _is_bigint(node):
+            # Unary plus throws on a BigInt
+            return self.visit(node.operand)
+        return f"{self.visit(node.op)}{self._group(node.operand, self.visit(node.operand))}"
+    
+    def _iter_UnaryOp(self, node):
+        # - - - x and -(2 ** -(2 ** ...)) nest one operand per level
+        if isinstance(node.op, ast.Not) or (isinstance(node.op, ast.UAdd) and _is_bigint(node)):
+            return self.visit_UnaryOp(node)
+        operand = yield node.operand
+        return f"{self.visit(node.op)}{self._group(node.operand, operand)}"
+    
     def visit_If(self, node):
-        test = self.visit(node.test)
+        # The clauses of an elif chain are emitted together, so a long chain
+        # is not rebuilt once per level
+        clauses = []
+        while True:
+            test = self._condition(node.test)
+            self.indent_level += 1
+            body = [self.visit(n) for n in node.body]
+            self.indent_level -= 1
+            clauses.append((test, body))
+            if not _is_elif(node):
+                break
+            node = node.orelse[0]
+            if self.budget is not None:
+                self.budget.charge()
         
         self.indent_level += 1
-        body = [self.visit(n) for n in node.body]
-        body = [b for b in body if b is not None and b.strip()]
+        orelse = [self.visit(n) for n in node.orelse]
         self.indent_level -= 1
         
-        js_body = "\n".join([self._indent(line) for line in body if line])
-        
-        orelse = []
-        if node.orelse:
+        return self._emit_if(clauses, orelse)
+    
+    def _iter_If(self, node):
+        clauses = []
+        while True:
+            test = self._condition(node.test)
             self.indent_level += 1
-            orelse = [self.visit(n) for n in node.orelse]
-            orelse = [b for b in orelse if b is not None and b.strip()]
+            body = []
+            for n in node.body:
+                body.append((yield n))
             self.indent_level -= 1
+            clauses.append((test, body))
+            if not _is_elif(node):
+                break
+            node = node.orelse[0]
+            if self.budget is not None:
+                self.budget.charge()
         
-        js_orelse = ""
-        if orelse:
-            if len(orelse) == 1 and isinstance(orelse[0], str) and orelse[0].startswith("if "):
-                js_orelse = f" else {orelse[0]}"
-            else:
-                js_orelse_lines = "\n".join([self._indent(line) for line in orelse if line])
-                js_orelse = f" else {{\n{js_orelse_lines}\n{self._indent('')}}}"
+        self.indent_level += 1
+        orelse = []
+        for n in node.orelse:
+            orelse.append((yield n))
+        self.indent_level -= 1
         
-        return f"if ({test}) {{\n{js_body}\n}}{js_orelse}"
+        return self._emit_if(clauses, orelse)
+    
+    def _emit_if(self, clauses, orelse):
+        """``if``, an ``else if`` per further ``(test, body)`` clause, then ``else``"""
+        parts = []
+        for test, body in clauses:
+            body = [b for b in body if b is not None and b.strip()]
+            js_body = "\n".join([self._indent(line) for line in body if line])
+            parts.append(f"if ({test}) {{\n{js_body}\n}}")
+        
+        orelse = [b for b in orelse if b is not None and b.strip()]
+        if orelse:
+            js_orelse_lines = "\n".join([self._indent(line) for line in orelse if line])
+            parts.append(f"{{\n{js_orelse_lines}\n{self._indent('')}}}")
+        return " else ".join(parts)
     
     def visit_For(self, node):
         target = self.visit(node.target)
@@ -225,10 +1169,48 @@ class PyToJSTransformer(ast.NodeTransformer):
         
         js_body = "\n".join([self._indent(line) for line in body if line])
         
-        return f"for (let {target} of {iterable}) {{\n{js_body}\n}}"
+        # A local the function already declared keeps its value after the loop
+        declared = self.local_scopes and target in self.local_scopes[-1][0]
+        return f"for ({'' if declared else 'let '}{target} of {iterable}) {{\n{js_body}\n}}"
+    
+    def visit_CountedFor(self, node):
+        header = self._counted_header(self.visit(node.target), node.start, node.stop, node.step)
+        
+        self.indent_level += 1
+        body = [self.visit(n) for n in node.body]
+        body = [b for b in body if b is not None and b.strip()]
+        self.indent_level -= 1
+        
+        js_body = "\n".join([self._indent(line) for line in body if line])
+        
+        return f"for ({header}) {{\n{js_body}\n}}"
+    
+    def _counted_header(self, target, start, stop, step):
+        """The ``let ...; condition; update`` of a for-loop counting like range()"""
+        declarations = [f"{target} = {self.visit(start)}"]
+        
+        # range() evaluates its arguments once; keep non-literals in temporaries
+        limit = self.visit(stop)
+        if not isinstance(stop, ast.Constant):
+            declarations.append(f"$stop = {limit}")
+            limit = "$stop"
+        
+        if isinstance(step, ast.Constant):
+            step = step.value
+            condition = f"{target} {'<' if step > 0 else '>'} {limit}"
+            if step in (1, -1):
+                update = f"{target}{'++' if step > 0 else '--'}"
+            else:
+                update = f"{target} {'+' if step > 0 else '-'}= {abs(step)}"
+        else:
+            declarations.append(f"$step = {self.visit(step)}")
+            condition = f"$step > 0 ? {target} < {limit} : {target} > {limit}"
+            update = f"{target} += $step"
+        
+        return f"let {', '.join(declarations)}; {condition}; {update}"
     
     def visit_While(self, node):
-        test = self.visit(node.test)
+        test = self._condition(node.test)
         
         self.indent_level += 1
         body = [self.visit(n) for n in node.body]
@@ -265,6 +1247,21 @@ class PyToJSTransformer(ast.NodeTransformer):
     def visit_Pow(self, node):
         return "**"  
     
+    def visit_BitOr(self, node):
+        return "|"
+    
+    def visit_BitXor(self, node):
+        return "^"
+    
+    def visit_BitAnd(self, node):
+        return "&"
+    
+    def visit_LShift(self, node):
+        return "<<"
+    
+    def visit_RShift(self, node):
+        return ">>"
+    
     def visit_Lt(self, node):
         return "<"
     
@@ -297,12 +1294,22 @@ class PyToJSTransformer(ast.NodeTransformer):
     
     def visit_UAdd(self, node):
         return "+"
+    
+    def visit_Invert(self, node):
+        return "~"
 
     def visit_AugAssign(self, node):
         target = self.visit(node.target)
         op = self.visit(node.op)
         value = self.visit(node.value)
         
+        if _is_bigint(node.target) and type(node.op) in _BIGINT_HELPERS:
+            return f"{target} = {self._helper(_BIGINT_HELPERS[type(node.op)])}({target}, {value});"
+        if _floors_inline(ast.BinOp(left=node.target, op=node.op, right=node.value)):
+            return f"{target} = Math.floor({target} / {value});"
+        if type(node.op) in _OP_HELPERS:
+            return f"{target} = {self._helper(_OP_HELPERS[type(node.op)])}({target}, {value});"
+        
         # Map Python's augmented assignment operators to JavaScript
         op_map = {
             "+": "+=",
@@ -310,7 +1317,12 @@ class PyToJSTransformer(ast.NodeTransformer):
             "*": "*=",
             "/": "/=",
             "%": "%=",
-            "**": "**="  # This will need special handling
+            "**": "**=",  # This will need special handling
+            "|": "|=",
+            "^": "^=",
+            "&": "&=",
+            "<<": "<<=",
+            ">>": ">>="
         }
         
         js_op = op_map.get(op, "+=")
@@ -321,20 +1333,67 @@ class PyToJSTransformer(ast.NodeTransformer):
         
         return f"{target} {js_op} {value};"
 
-def transpile_python_to_js(python_code):
+def join_module(imports, body):
+    """Assemble a module from its imports and top-level statement code"""
+    js_code = []
+    if imports:
+        js_code.extend(sorted(imports))
+        js_code.append("")
+    js_code.extend(body)
+    return "\n".join(js_code)
+
+def transpile_python_to_js(python_code, iterative=False, limits=None, opt_level=0, pass_stats=None,
+                           minify=False):
+    """
+    Transpile Python source to JavaScript.
+    
+    Returns a ``(js_code, error)`` tuple. When ``limits`` is given, going
+    over any of its budgets raises BudgetExceeded instead. ``opt_level`` 1
+    or 2 runs the optimization passes of that level first and gives
+    conditions Python truthiness (level 0 emits the AST as written); pass ``pass_stats`` a list to receive their
+    timing and change counts. ``minify`` emits compact code with short
+    names for function locals.
+    """
+    budget = Budget(limits) if limits is not None else None
     try:
+        if budget is not None:
+            budget.check_source(python_code)
+        
         # Parse Python code to AST
-        py_ast = ast.parse(python_code)
+        if iterative:
+            import deep_ast
+            py_ast = deep_ast.parse(python_code)
+        else:
+            py_ast = ast.parse(python_code)
+        if budget is not None:
+            budget.check_time()
+        
+        # Optimize the AST before emission
+        if opt_level:
+            from passes import PassManager
+            manager = PassManager.for_level(opt_level, budget)
+            manager.run(py_ast)
+            if pass_stats is not None:
+                pass_stats.extend(manager.stats)
+        
+        if minify:
+            import minify as minifier
+            minifier.mangle_locals(py_ast)
         
         # Transform AST to JavaScript
-        transformer = PyToJSTransformer()
+        transformer = PyToJSTransformer(iterative=iterative, budget=budget, minify=minify, truthy=bool(opt_level))
         js_code = transformer.visit(py_ast)
+        if minify:
+            js_code = minifier.compact(js_code)
         
         return js_code, None
+    except BudgetExceeded:
+        raise
     except SyntaxError as e:
         return None, f"Python syntax error: {str(e)}"
     except Exception as e:
         error_msg = f"Transpilation error: {str(e)}"
+        import traceback
         print(error_msg)
         print(traceback.format_exc())
         return None, error_msg
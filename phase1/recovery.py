@@ -0,0 +1,170 @@
+import ast
+from pytojs import PyToJSTransformer, Budget, BudgetExceeded, class_declarations, join_module, set_names
+
+# Lines at the left margin that continue the previous statement
+_CONTINUATIONS = ("else", "elif", "except", "finally", "case")
+
+def split_regions(python_code):
+    """
+    Split source into top-level statement regions without parsing it.
+
+    A region starts at each unindented line outside brackets and
+    triple-quoted strings, except ``else``/``elif``/``except``/``finally``
+    lines and the definitions that follow decorators. Returns a list of
+    ``(first_line, text)`` pairs with 1-based line numbers.
+    """
+    lines = python_code.splitlines(keepends=True)
+    regions = []
+    start = 0
+    depth = 0
+    quote = None
+    decorated = False
+    for number, line in enumerate(lines):
+        stripped = line.lstrip()
+        at_margin = depth == 0 and quote is None and stripped and stripped == line
+        if at_margin and not stripped.startswith("#"):
+            word = stripped.split(None, 1)[0].rstrip(":")
+            if number > start and word not in _CONTINUATIONS and not decorated:
+                regions.append((start + 1, "".join(lines[start:number])))
+                start = number
+            decorated = stripped.startswith("@")
+        depth, quote = _scan_line(line, depth, quote)
+    if start < len(lines):
+        regions.append((start + 1, "".join(lines[start:])))
+    return regions
+
+def _resume_line(lines, error_line):
+    """Index of the first line after ``error_line`` that may start a statement"""
+    if error_line is None:
+        return None
+    for index in range(max(error_line, 1), len(lines)):
+        line = lines[index]
+        if line[:1].strip() and not line.startswith("#"):
+            if line.split(None, 1)[0].rstrip(":") not in _CONTINUATIONS:
+                return index
+    return None
+
+def _scan_line(line, depth, quote):
+    """Track bracket depth and open triple-quoted strings across one line"""
+    i = 0
+    while i < len(line):
+        if quote is not None:
+            end = line.find(quote, i)
+            if end == -1:
+                return depth, quote
+            i = end + len(quote)
+            quote = None
+            continue
+        char = line[i]
+        if char == "#":
+            break
+        if char in "\"'":
+            if line.startswith(char * 3, i):
+                quote = char * 3
+                i += 3
+                continue
+            # Single-line string: skip to its closing quote
+            i += 1
+            while i < len(line) and line[i] != char:
+                i += 2 if line[i] == "\\" else 1
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth = max(0, depth - 1)
+        i += 1
+    return depth, quote
+
+def transpile_with_diagnostics(python_code, iterative=False, limits=None):
+    """
+    Transpile as much of a module as possible and report every error.
+
+    Each top-level region is parsed on its own. Regions that parse are
+    transpiled; the others become placeholder comments and add a diagnostic
+    ``{"line", "column", "end_line", "message"}`` (1-based line and column).
+    Returns a ``(js_code, diagnostics)`` tuple. Budgets behave as in
+    transpile_python_to_js.
+    """
+    budget = Budget(limits) if limits is not None else None
+    if budget is not None:
+        budget.check_source(python_code)
+
+    # Most sources are valid; only split them up when they are not
+    try:
+        regions = [(1, python_code, _parse(python_code, iterative))]
+    except (SyntaxError, RecursionError):
+        regions = []
+        pending = split_regions(python_code)[::-1]
+        while pending:
+            first_line, text = pending.pop()
+            try:
+                regions.append((first_line, text, _parse(text, iterative)))
+                continue
+            except (SyntaxError, RecursionError) as e:
+                error = e
+            # An unclosed bracket or string hides the statements after it;
+            # end the bad region at the next line that can start one
+            lines = text.splitlines(keepends=True)
+            cut = _resume_line(lines, getattr(error, "lineno", None))
+            if cut is None:
+                regions.append((first_line, text, error))
+            else:
+                regions.append((first_line, "".join(lines[:cut]), error))
+                rest = split_regions("".join(lines[cut:]))
+                pending.extend((first_line + cut + line - 1, part) for line, part in reversed(rest))
+
+    transformer = PyToJSTransformer(iterative=iterative, budget=budget)
+    # Classes and sets are known module-wide, even to regions before their
+    # definition
+    modules = [tree for _, _, tree in regions if isinstance(tree, ast.Module)]
+    classes, methods = {}, {}
+    for tree in modules:
+        module_classes, module_methods = class_declarations(tree)
+        classes.update(module_classes)
+        methods.update(module_methods)
+    sets = set_names(*modules)
+    transformer.begin_module((classes, methods), sets)
+    body = []
+    diagnostics = []
+    for first_line, text, tree in regions:
+        if isinstance(tree, ast.Module):
+            for statement in tree.body:
+                try:
+                    body.extend(transformer.visit_statements([statement]))
+                except BudgetExceeded:
+                    raise
+                except Exception as e:
+                    # Start the next statement from a clean top level
+                    transformer.indent_level = 0
+                    transformer.function_stack = []
+                    transformer.local_scopes = []
+                    transformer.set_scopes = [sets]
+                    transformer.method_stack = []
+                    line = first_line + statement.lineno - 1
+                    end_line = first_line + statement.end_lineno - 1
+                    message = f"Transpilation error: {str(e)}"
+                    diagnostics.append({"line": line, "column": statement.col_offset + 1,
+                                        "end_line": end_line, "message": message})
+                    body.append(f"// Skipped lines {line}-{end_line}: {message}")
+        else:
+            end_line = first_line + text.rstrip().count("\n")
+            diagnostics.append(_syntax_diagnostic(tree, first_line, end_line))
+            body.append(f"// Skipped lines {first_line}-{end_line}: {diagnostics[-1]['message']}")
+    return join_module(transformer.imports, body), diagnostics
+
+def _parse(python_code, iterative):
+    if iterative:
+        import deep_ast
+        return deep_ast.parse(python_code)
+    return ast.parse(python_code)
+
+def _syntax_diagnostic(error, first_line, end_line):
+    """Diagnostic for a region's parse error, in whole-file line numbers"""
+    if isinstance(error, RecursionError):
+        return {"line": first_line, "column": 1, "end_line": end_line,
+                "message": "Python syntax error: expression is nested too deeply"}
+    return {
+        "line": first_line + (error.lineno or 1) - 1,
+        "column": error.offset or 1,
+        "end_line": end_line,
+        "message": f"Python syntax error: {error.msg}",
+    }
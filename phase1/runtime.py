@@ -0,0 +1,63 @@
+"""
+JavaScript helpers for Python semantics that have no operator of their own.
+
+The transformer adds a helper's source to its imports the first time it
+emits a call to it, so a module carries only the helpers it uses and each
+one once. Helpers stay small and monomorphic so the JIT inlines them.
+"""
+
+HELPERS = {
+    # Python rounds the quotient down, not toward zero
+    "__floordiv": """function __floordiv(a, b) {
+    if (b === 0) throw new RangeError("integer division or modulo by zero");
+    return Math.floor(a / b);
+}""",
+    # The result takes the divisor's sign, as in Python
+    "__pymod": """function __pymod(a, b) {
+    if (b === 0) throw new RangeError("integer division or modulo by zero");
+    const r = a % b;
+    return r !== 0 && (r < 0) !== (b < 0) ? r + b : r;
+}""",
+    # BigInt counterparts, for ints that may not fit a double
+    "__bigfloordiv": """function __bigfloordiv(a, b) {
+    const q = a / b;
+    return a % b !== 0n && (a < 0n) !== (b < 0n) ? q - 1n : q;
+}""",
+    "__bigmod": """function __bigmod(a, b) {
+    const r = a % b;
+    return r !== 0n && (r < 0n) !== (b < 0n) ? r + b : r;
+}""",
+    "__bigpow": """function __bigpow(a, b) {
+    return a ** b;
+}""",
+    # dict.get on a dict built as a Map; no Python value is undefined
+    "__mapget": """function __mapget(map, key, fallback) {
+    const value = map.get(key);
+    return value === undefined ? fallback : value;
+}""",
+    # seq[start:stop:step] for a step other than 1; undefined bounds are omitted ones
+    "__slice": """function __slice(seq, start, stop, step) {
+    if (step === 0) throw new RangeError("slice step cannot be zero");
+    const n = seq.length;
+    const out = [];
+    if (step > 0) {
+        start = start === undefined ? 0 : start < 0 ? Math.max(start + n, 0) : Math.min(start, n);
+        stop = stop === undefined ? n : stop < 0 ? Math.max(stop + n, 0) : Math.min(stop, n);
+        for (let i = start; i < stop; i += step) out.push(seq[i]);
+    } else {
+        start = start === undefined ? n - 1 : start < 0 ? Math.max(start + n, -1) : Math.min(start, n - 1);
+        stop = stop === undefined ? -1 : stop < 0 ? Math.max(stop + n, -1) : Math.min(stop, n - 1);
+        for (let i = start; i > stop; i += step) out.push(seq[i]);
+    }
+    return typeof seq === "string" ? out.join("") : out;
+}""",
+    # Empty lists, dicts and sets are false in Python but objects are true in JS
+    "__truthy": """function __truthy(x) {
+    if (typeof x !== "object" || x === null) return !!x;
+    if (Array.isArray(x)) return x.length > 0;
+    if (x instanceof Map || x instanceof Set) return x.size > 0;
+    if (Object.getPrototypeOf(x) !== Object.prototype) return true;
+    for (const key in x) return true;
+    return false;
+}""",
+}
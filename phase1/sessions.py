@@ -0,0 +1,185 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+class SessionError(Exception):
+    """A session request that cannot be served; carries its HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+class Session:
+    """Server-held copy of one editor buffer and its last good JavaScript"""
+
+    def __init__(self, session_id, code, javascript, error, now):
+        self.id = session_id
+        self.code = code
+        self.javascript = javascript
+        self.error = error
+        self.version = 0
+        self.last_used = now
+        self.lock = threading.Lock()
+
+    @property
+    def size(self):
+        return len(self.code) + len(self.javascript)
+
+def apply_edits(code, edits):
+    """
+    Apply text edits to a buffer.
+
+    Each edit is a dict with ``offset``, ``length`` and ``replacement``;
+    offsets are in characters and refer to the buffer as left by the
+    previous edit in the list.
+    """
+    for edit in edits:
+        try:
+            offset = int(edit["offset"])
+            length = int(edit["length"])
+            replacement = str(edit.get("replacement", ""))
+        except (KeyError, TypeError, ValueError):
+            raise SessionError("Each edit needs integer 'offset' and 'length' and a 'replacement'")
+        if offset < 0 or length < 0 or offset + length > len(code):
+            raise SessionError(f"Edit at {offset}+{length} is outside the {len(code)} character buffer")
+        code = code[:offset] + replacement + code[offset + length:]
+    return code
+
+def diff_ranges(old, new):
+    """
+    Describe how to turn ``old`` into ``new`` as a list of changed ranges.
+
+    Each range replaces ``old[start:end]`` with ``text``. Local source edits
+    change one contiguous stretch of output, so this trims the common prefix
+    and suffix and returns at most one range.
+    """
+    if old == new:
+        return []
+    start = _common_prefix(old, new)
+    # Compare reversed copies for the suffix, never overlapping the prefix
+    suffix = _common_prefix(old[start:][::-1], new[start:][::-1])
+    return [{"start": start, "end": len(old) - suffix, "text": new[start:len(new) - suffix]}]
+
+def _common_prefix(a, b, block=4096):
+    """Length of the common prefix of two strings, compared block by block"""
+    limit = min(len(a), len(b))
+    i = 0
+    while i + block <= limit and a[i:i + block] == b[i:i + block]:
+        i += block
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+class SessionStore:
+    """
+    Holds editor sessions in memory with size caps and idle expiry.
+
+    ``transpile`` is called as ``transpile(code)`` and returns a
+    ``(js_code, error)`` tuple like transpile_python_to_js. Sessions idle
+    for ``idle_timeout`` seconds are dropped, and the least recently used
+    sessions are evicted once ``max_sessions`` or ``max_total_bytes`` is
+    exceeded.
+    """
+
+    def __init__(self, transpile, max_sessions=1000, max_session_bytes=2_000_000,
+                 max_total_bytes=200_000_000, idle_timeout=900, clock=time.monotonic):
+        self.transpile = transpile
+        self.max_sessions = max_sessions
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._sessions = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def open(self, code):
+        """Start a session for ``code``; returns the new Session"""
+        self._check_size(code)
+        javascript, error = self.transpile(code)
+        session = Session(secrets.token_urlsafe(16), code, javascript or "", error, self.clock())
+        self._check_size(code, session.javascript)
+        with self._lock:
+            self._sessions[session.id] = session
+            self._total_bytes += session.size
+            self._evict()
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise SessionError("Unknown or expired session", status=404)
+            session.last_used = self.clock()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def edit(self, session_id, edits, version=None):
+        """
+        Apply ``edits`` to a session and re-transpile it.
+
+        ``version`` is the version the client based its edits on; a stale
+        version is rejected with 409 so the client can resynchronise.
+        Returns the session and the changed ranges of its JavaScript.
+        """
+        session = self.get(session_id)
+        with session.lock:
+            if version is not None and version != session.version:
+                raise SessionError(f"Session is at version {session.version}, not {version}", status=409)
+            code = apply_edits(session.code, edits)
+            self._check_size(code)
+
+            old_javascript = javascript = session.javascript
+            error = session.error
+            if code != session.code:
+                new_javascript, error = self.transpile(code)
+                # Keep the last good output while the buffer does not parse
+                if error is None:
+                    javascript = new_javascript
+
+            with self._lock:
+                old_size = session.size
+                session.code = code
+                session.javascript = javascript
+                session.error = error
+                session.version += 1
+                if self._sessions.get(session_id) is session:
+                    self._total_bytes += session.size - old_size
+                self._evict()
+            changes = diff_ranges(old_javascript, javascript)
+        return session, changes
+
+    def close(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                raise SessionError("Unknown or expired session", status=404)
+            self._total_bytes -= session.size
+
+    def _check_size(self, code, javascript=""):
+        if len(code) + len(javascript) > self.max_session_bytes:
+            raise SessionError(f"Session is over the {self.max_session_bytes} byte limit", status=413)
+
+    def _expire(self):
+        cutoff = self.clock() - self.idle_timeout
+        # Sessions are kept in last-used order, so stop at the first fresh one
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used > cutoff:
+                break
+            self._drop_oldest()
+
+    def _evict(self):
+        self._expire()
+        while self._sessions and (len(self._sessions) > self.max_sessions
+                                  or self._total_bytes > self.max_total_bytes):
+            self._drop_oldest()
+
+    def _drop_oldest(self):
+        _, session = self._sessions.popitem(last=False)
+        self._total_bytes -= session.size
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import threading
+from concurrent.futures import Future
+
+def request_key(code, **options):
+    """Hash of the source and the options that affect its output"""
+    digest = hashlib.sha256(code.encode("utf-8"))
+    digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one computation.
+
+    The first caller for a key runs the work; callers that arrive while it
+    is in flight wait for the same result, or the same exception. Nothing is
+    cached once the work finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self):
+        """Number of keys currently being computed"""
+        return len(self._futures)
+
+    def do(self, key, fn):
+        """Run ``fn()`` for ``key`` unless it is already running, and return its result"""
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn)
+        return future.result()
+
+    def submit(self, key, fn, executor):
+        """
+        Like ``do`` but runs the work on ``executor`` and returns a Future
+        shared by every caller for the same key.
+        """
+        future, leader = self._join(key)
+        if leader:
+            executor.submit(self._run, key, future, fn)
+        return future
+
+    def _join(self, key):
+        with self._lock:
+            self.calls += 1
+            future = self._futures.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._futures[key] = Future()
+            future.set_running_or_notify_cancel()
+            return future, True
+
+    def _run(self, key, future, fn):
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+        else:
+            self._finish(key)
+            future.set_result(result)
+
+    def _finish(self, key):
+        # Forget the key before waking waiters so later calls start afresh
+        with self._lock:
+            del self._futures[key]
@@ -2,7 +2,8 @@ import requests
 
 url = "http://127.0.0.1:5000/convert"
 data = {
-    "code": "print('Hello, world!')" 
+    "code": "print('Hello, world!')",
+    "fields": ["javascript", "ir"]
 }
 response = requests.post(url, json=data)
 print("JavaScript Output:")
@@ -0,0 +1,123 @@
+from app import app
+from pytojs import TranspileLimits
+
+def test_convert():
+    client = app.test_client()
+    res = client.post("/convert", json={"code": "a = 10"})
+    assert res.status_code == 200
+    assert res.get_json()["javascript"] == "let a = 10;"
+
+def test_convert_over_budget():
+    client = app.test_client()
+    limits = app.config["TRANSPILE_LIMITS"]
+    try:
+        app.config["TRANSPILE_LIMITS"] = TranspileLimits(max_source_bytes=5)
+        res = client.post("/convert", json={"code": "a = 10"})
+        assert res.status_code == 413
+        assert res.get_json()["budget"] == "source_bytes"
+
+        app.config["TRANSPILE_LIMITS"] = TranspileLimits(timeout=0)
+        res = client.post("/convert", json={"code": "a = 11"})
+        assert res.status_code == 408
+    finally:
+        app.config["TRANSPILE_LIMITS"] = limits
+
+def test_session_routes():
+    client = app.test_client()
+    res = client.post("/sessions", json={"code": "x = 1"})
+    assert res.status_code == 201
+    session = res.get_json()
+    assert session["javascript"] == "let x = 1;"
+
+    res = client.post(f"/sessions/{session['session']}/edits", json={
+        "version": 0,
+        "edits": [{"offset": 4, "length": 1, "replacement": "42"}],
+    })
+    assert res.get_json()["changes"] == [{"start": 8, "end": 9, "text": "42"}]
+
+    assert client.delete(f"/sessions/{session['session']}").status_code == 204
+    assert client.get(f"/sessions/{session['session']}").status_code == 404
+
+def test_metrics():
+    client = app.test_client()
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert "convert_inflight_keys 0" in res.get_data(as_text=True)
+
+def test_convert_fields():
+    client = app.test_client()
+    res = client.post("/convert", json={"code": "a = 10"})
+    assert set(res.get_json()) == {"javascript"}
+
+    res = client.post("/convert", json={"code": "a = 10\nb = a", "fields": "ir,tokens,stats",
+                                        "tokens_limit": 4})
+    data = res.get_json()
+    assert "javascript" not in data and "tokens" not in data["ir"]
+    assert len(data["ir"]["variables"]) == 2
+    assert [t["value"] for t in data["tokens"]] == ["a", "=", "10", "b"]
+    assert data["tokens_next_offset"] == 4
+    assert data["stats"]["source_lines"] == 2
+
+    res = client.post("/convert", json={"code": "a = 10", "fields": ["tokens"], "tokens_offset": 2})
+    assert res.get_json()["tokens_next_offset"] is None
+
+    res = client.post("/convert", json={"code": "a = 10", "fields": ["bytecode"]})
+    assert res.status_code == 400
+
+def test_convert_opt_level():
+    client = app.test_client()
+    code = 'def f():\n    "doc"\n    return 1\n'
+    res = client.post("/convert", json={"code": code, "opt_level": 1, "fields": ["javascript", "stats"]})
+    data = res.get_json()
+    assert "doc" not in data["javascript"]
+    assert data["stats"]["passes"][0]["pass"] == "dead-expressions"
+
+    res = client.post("/convert", json={"code": code})
+    assert '"doc"' in res.get_json()["javascript"]
+
+    res = client.post("/convert", json={"code": code, "opt_level": 7})
+    assert res.status_code == 400
+
+def test_convert_minify():
+    client = app.test_client()
+    code = "def area(width, height):\n    return width * height\n"
+    plain = client.post("/convert", json={"code": code})
+    small = client.post("/convert", json={"code": code, "minify": True})
+    assert small.get_json()["javascript"] == "function area(a,b){return a*b;}"
+    assert plain.headers["ETag"] != small.headers["ETag"]
+
+    res = client.post("/convert", json={"code": code, "minify": "yes"})
+    assert res.status_code == 400
+
+def test_convert_diagnostics():
+    client = app.test_client()
+    code = "a = (1 +\nb = 2\nc = 3 +\nprint(b)\n"
+    res = client.post("/convert", json={"code": code, "fields": ["javascript", "diagnostics"]})
+    assert res.status_code == 200
+    data = res.get_json()
+    assert [d["line"] for d in data["diagnostics"]] == [1, 3]
+    assert data["javascript"].endswith("let b = 2;\n// Skipped lines 3-3: Python syntax error: invalid syntax\nconsole.log(b);")
+
+    for option in ({"opt_level": 1}, {"minify": True}):
+        res = client.post("/convert", json={"code": code, "fields": ["diagnostics"], **option})
+        assert res.status_code == 400
+
+    res = client.post("/convert", json={"code": code})
+    assert res.status_code == 400
+
+def test_convert_etag_and_compression():
+    client = app.test_client()
+    code = "\n".join(f"x{i} = {i}" for i in range(200))
+    res = client.post("/convert", json={"code": code}, headers={"Accept-Encoding": "gzip"})
+    assert res.status_code == 200
+    assert res.headers["Content-Encoding"] == "gzip"
+    etag = res.headers["ETag"]
+
+    res = client.post("/convert", json={"code": code}, headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.headers["ETag"] == etag
+
+    # Small bodies are sent as-is
+    res = client.post("/convert", json={"code": "a = 1"}, headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in res.headers
+    assert res.headers["ETag"] != etag
@@ -0,0 +1,14 @@
+import gzip
+from cache import ResultCache
+
+def test_result_cache_keeps_compressed_bodies():
+    cache = ResultCache(max_entries=2)
+    entry = cache.put("a", b"x" * 1000)
+    data = cache.encoded(entry, "gzip")
+    assert gzip.decompress(data) == b"x" * 1000
+    assert cache.get("a").encoded("gzip") is data
+
+    cache.put("b", b"b")
+    cache.put("c", b"c")
+    assert cache.get("a") is None
+    assert len(cache) == 2
@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def run(*args, stdin=""):
+    return subprocess.run([sys.executable, *args], input=stdin, capture_output=True,
+                          text=True, cwd=HERE)
+
+def test_import_stays_lean():
+    # Importing the core and running a small transpile must not pull in
+    # Flask, json, the lexer or anything else beyond ast (which is imported
+    # up front since its own dependencies vary across Python versions)
+    script = (
+        "import sys, json, ast\n"
+        "before = set(sys.modules)\n"
+        "import pytojs\n"
+        "after_import = set(sys.modules) - before\n"
+        "pytojs.transpile_python_to_js('x = 1 + 2\\nprint(\"hi\")')\n"
+        "after_run = set(sys.modules) - before\n"
+        "print(json.dumps([sorted(after_import), sorted(after_run)]))\n"
+    )
+    result = run("-c", script)
+    assert result.returncode == 0, result.stderr
+    after_import, after_run = json.loads(result.stdout.splitlines()[-1])
+    assert set(after_import) <= {"ast", "_ast", "pytojs"}
+    assert set(after_run) <= {"ast", "_ast", "pytojs", "_json"}
+
+def test_cli_stdin_to_stdout():
+    result = run("cli.py", stdin="x = 1 + 2\n")
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == "let x = 1 + 2;\n"
+
+def test_cli_files_and_errors(tmp_path):
+    source = tmp_path / "in.py"
+    source.write_text("print('hi')\n")
+    output = tmp_path / "out.js"
+    result = run("cli.py", "--iterative", "-o", str(output), str(source))
+    assert result.returncode == 0, result.stderr
+    assert output.read_text() == 'console.log("hi");\n'
+
+    result = run("cli.py", stdin="def broken(:\n")
+    assert result.returncode == 1
+    assert "syntax error" in result.stderr
+
+    result = run("cli.py", "-j", "2", str(source))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == 'console.log("hi");\n'
+
+    assert run("cli.py", "--bogus").returncode == 2
+    assert run("cli.py", "-j", "0").returncode == 2
+    assert run("cli.py", "-O2", "--recover").returncode == 2
+
+def test_cli_opt_level():
+    code = 'def f():\n    "doc"\n    return 1\n'
+    assert '"doc"' in run("cli.py", "-O0", stdin=code).stdout
+    assert '"doc"' not in run("cli.py", "-O2", stdin=code).stdout
+
+def test_cli_minify():
+    code = "def area(width, height):\n    return width * height\n\nprint(area(2, 3))\n"
+    assert run("cli.py", "--minify", stdin=code).stdout == "function area(a,b){return a*b;}console.log(area(2,3));\n"
+    assert run("cli.py", "--minify", "-j", "2").returncode == 2
@@ -0,0 +1,33 @@
+import tracemalloc
+from lexical_analyzer import LexicalAnalyzer, analyze_code, analyze_file
+
+SAMPLE = 'def f(x):\n    return x + 1  # one\n\ns = "héllo"\n'
+
+def test_file_tokens_match_tokenize(tmp_path):
+    path = tmp_path / "sample.py"
+    path.write_bytes(SAMPLE.encode("utf-8"))
+    batches = list(analyze_file(path, batch_size=4))
+    assert all(len(batch) <= 4 for batch in batches)
+    assert [token for batch in batches for token in batch] == analyze_code(SAMPLE)
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.py"
+    path.write_bytes(b"")
+    assert list(analyze_file(path)) == []
+    assert list(LexicalAnalyzer().iter_file_tokens(path)) == []
+
+def test_streaming_memory_is_bounded(tmp_path):
+    path = tmp_path / "big.py"
+    line = "value_%d = compute(alpha, beta) + 12345\n"
+    with open(path, "w") as f:
+        f.writelines(line % i for i in range(10000))
+
+    tracemalloc.start()
+    count = 0
+    for batch in analyze_file(path, batch_size=500):
+        count += len(batch)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert count == 10000 * 10
+    # The file is about 500KB and lexes to 100k tokens; streaming holds one batch
+    assert peak < 500_000
@@ -0,0 +1,51 @@
+import queue
+import threading
+from pytojs import transpile_python_to_js
+from live import LiveChannel
+
+def make_channel(transpile=transpile_python_to_js):
+    messages = queue.Queue()
+    channel = LiveChannel(messages.put, transpile)
+    channel.start()
+    return channel, messages
+
+def test_live_updates_are_versioned_diffs():
+    channel, messages = make_channel()
+    channel.receive({"version": 1, "code": "x = 1"})
+    update = messages.get(timeout=5)
+    assert update == {"type": "update", "version": 1,
+                      "changes": [{"start": 0, "end": 0, "text": "let x = 1;"}]}
+
+    channel.receive({"version": 2, "edits": [{"offset": 4, "length": 1, "replacement": "2"}]})
+    update = messages.get(timeout=5)
+    assert update["version"] == 2
+    assert update["changes"] == [{"start": 8, "end": 9, "text": "2"}]
+    channel.close()
+
+def test_live_drops_superseded_work():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_transpile(code, limits=None):
+        calls.append(code)
+        if len(calls) == 1:
+            started.set()
+            release.wait(5)
+            # Version 1 is stale by now, so the transpile is cancelled
+            assert limits.cancel()
+        return transpile_python_to_js(code)
+
+    channel, messages = make_channel(slow_transpile)
+    channel.receive({"version": 1, "code": "a = 1"})
+    started.wait(5)
+    # A burst of edits while version 1 is running is coalesced into one run
+    for version in range(2, 6):
+        channel.receive({"version": version, "code": f"a = {version}"})
+    release.set()
+
+    update = messages.get(timeout=5)
+    assert update["version"] == 5
+    assert calls == ["a = 1", "a = 5"]
+    assert messages.empty()
+    channel.close()
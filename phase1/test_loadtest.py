@@ -0,0 +1,37 @@
+import threading
+import time
+from loadtest import DEFAULT_MIX, InProcessClient, find_saturation, percentile, run_load
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.95) == 7
+    assert percentile([], 0.5) is None
+
+def test_run_load_in_process():
+    result = run_load(InProcessClient(), DEFAULT_MIX, rate=40, duration=0.5, unique=True)
+    assert result["requests"] == 20
+    assert result["statuses"] == {"200": 20}
+    assert result["error_rate"] == 0
+    latency = result["latency_ms"]
+    assert latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+
+class SlowClient:
+    """Serves one request at a time in 10ms, so it saturates near 100/s"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def post(self, payload):
+        with self.lock:
+            time.sleep(0.01)
+        return 200
+
+def test_find_saturation_stops_at_capacity():
+    result = find_saturation(SlowClient(), DEFAULT_MIX, start_rate=50, step=2,
+                             duration=0.5, max_p99_ms=100)
+    rates = [step["target_rate"] for step in result["steps"]]
+    assert result["saturation_rate"] in (50, 100)
+    assert not result["steps"][-1]["passed"]
+    assert rates[-1] <= 400
@@ -0,0 +1,75 @@
+import ast
+import shutil
+import subprocess
+import pytest
+from minify import compact, mangle_locals
+from pytojs import transpile_python_to_js
+
+SAMPLE = '''
+def compute_average(number_list, scale_factor):
+    running_total = 0
+    for current_value in number_list:
+        running_total = running_total + current_value * scale_factor
+    return running_total / len(number_list)
+
+def polynomial(x_value, y_value):
+    return (x_value + y_value) * (x_value - y_value) - (x_value - (y_value - 1)) / 2
+
+readings = [3, 12, 30]
+for reading in readings:
+    print(polynomial(reading, 2), f"{reading} done")
+print(compute_average(readings, 2))
+'''
+
+def test_mangle_locals_keeps_globals_and_names():
+    tree = ast.parse("scale = 2\ndef f(value, a):\n    total = value * scale\n    return total + a\n")
+    assert mangle_locals(tree) == 3
+    function = tree.body[1]
+    assert function.name == "f"
+    assert [arg.arg for arg in function.args.args] == ["a", "b"]
+    # "scale" is global and kept; the busiest local gets the shortest name
+    assert "scale" in ast.unparse(function)
+    assert "total" not in ast.unparse(function)
+
+def test_mangle_skips_unsafe_functions():
+    for code in ("def f(x):\n    return [x for y in x]\n",
+                 "def f(x):\n    global g\n    g = x\n",
+                 "def f(x):\n    return locals()\n"):
+        tree = ast.parse(code)
+        assert mangle_locals(tree) == 0
+
+def test_mangle_avoids_camel_cased_globals():
+    tree = ast.parse("def f(x):\n    return a_(x)\n")
+    mangle_locals(tree)
+    # a_ is emitted as "a" in definitions, so that name may not be reused
+    assert tree.body[0].args.args[0].arg == "b"
+
+def test_compact_keeps_required_spaces_and_literals():
+    assert compact("let x = a - -1;\nreturn y;") == "let x=a- -1;return y;"
+    assert compact("i++ + ++j;") == "i++ + ++j;"
+    assert compact('console.log("a  b", `x ${ "}" } y`); // note\nz;') == 'console.log("a  b",`x ${ "}" } y`);z;'
+    assert compact("let s = 'it\\'s  here';") == "let s='it\\'s  here';"
+
+def test_minified_precedence():
+    js, error = transpile_python_to_js("x = (a + b) * c\ny = a - (b - c)\nz = a * b + c\n", minify=True)
+    assert error is None
+    assert js == "let x=(a+b)*c;let y=a-(b-c);let z=a*b+c;"
+    js, error = transpile_python_to_js("x = (a | b) & 3\ny = a & 1 == b ^ c\nz = a + b << 1\n", minify=True)
+    assert error is None
+    assert js == "let x=((a|b)&3);let y=(a&1)===(b^c);let z=a+b<<1;"
+
+def test_minify_shrinks_output():
+    plain, _ = transpile_python_to_js(SAMPLE)
+    small, _ = transpile_python_to_js(SAMPLE, minify=True)
+    assert len(small) < 0.6 * len(plain)
+    assert "running_total" not in small and "readings" in small
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_minified_output_runs_the_same():
+    code = SAMPLE.replace("compute_average", "average")
+    outputs = []
+    for minify in (False, True):
+        js, error = transpile_python_to_js(code, minify=minify)
+        assert error is None
+        outputs.append(subprocess.run(["node", "-e", js], capture_output=True, text=True).stdout)
+    assert outputs[0] == outputs[1] != ""
@@ -0,0 +1,65 @@
+from concurrent.futures import ProcessPoolExecutor
+import ast
+import parallel
+from parallel import split_module, transpile_parallel
+from pytojs import transpile_python_to_js
+
+def make_module(functions):
+    parts = ["# generated client\nimport json\n"]
+    for i in range(functions):
+        parts.append(
+            f"@route('/items/{i}')\n"
+            f"def get_item_{i}(session, item_id):\n"
+            f"    url = base + '/items/{i}/' + item_id\n"
+            f"    if item_id < {i}:\n"
+            f"        return None\n"
+            f"    return session.get(url)\n"
+            f"\nx_{i} = {i}; y_{i} = x_{i} * 2\n"
+        )
+    return "\n".join(parts)
+
+def test_split_keeps_statements_whole():
+    code = make_module(50)
+    pieces = split_module(code, ast.parse(code), 8)
+    assert 1 < len(pieces) <= 8
+    assert "".join(pieces) == code
+    for piece in pieces:
+        ast.parse(piece)
+        # Decorators stay with their function
+        assert piece.count("@route") == piece.count("def get_item_")
+
+def test_parallel_matches_serial(monkeypatch):
+    monkeypatch.setattr(parallel, "MIN_CHUNK_BYTES", 500)
+    code = make_module(80)
+    expected = transpile_python_to_js(code)
+    with ProcessPoolExecutor(max_workers=3) as pool:
+        assert transpile_parallel(code, workers=3, executor=pool) == expected
+        assert transpile_parallel(code, workers=3, executor=pool) == expected
+    assert transpile_parallel(code, workers=2, iterative=True) == expected
+
+def test_parallel_small_and_invalid():
+    assert transpile_parallel("x = 1", workers=4) == transpile_python_to_js("x = 1")
+    js, error = transpile_parallel("def broken(:", workers=4)
+    assert js is None and error.startswith("Python syntax error")
+
+def test_parallel_classes_across_chunks(monkeypatch):
+    monkeypatch.setattr(parallel, "MIN_CHUNK_BYTES", 200)
+    code = ("class Base:\n    def __init__(self):\n        self.size = 0\n\n"
+            "class Item(Base):\n    def grow_by(self, n):\n        self.size += n\n        self.grown = True\n\n"
+            + "".join(f"def f_{i}(x):\n    return x + {i}\n\n" for i in range(40))
+            + "item = Item()\nitem.grow_by(2)\n")
+    expected = transpile_python_to_js(code)
+    assert "let item = new Item();\nitem.growBy(2);" in expected[0]
+    # A chunk still knows the classes and fields that other chunks define
+    assert transpile_parallel(code, workers=4) == expected
+
+def test_parallel_sets_across_chunks(monkeypatch):
+    monkeypatch.setattr(parallel, "MIN_CHUNK_BYTES", 200)
+    code = ("xs = [1, 1, 2]\ns = {x for x in xs}\n\n"
+            + "".join(f"def f_{i}(x):\n    return len(s) + {i}\n\n" for i in range(40))
+            + "print(len(s))\n")
+    expected = transpile_python_to_js(code)
+    assert "console.log(s.size);" in expected[0]
+    # A chunk still knows the sets that other chunks bind
+    assert transpile_parallel(code, workers=4) == expected
+    assert transpile_parallel(code, workers=1) == expected
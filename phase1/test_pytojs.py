@@ -0,0 +1,326 @@
+import json
+import shutil
+import subprocess
+import pytest
+import pytojs
+from pytojs import transpile_python_to_js, TranspileLimits, BudgetExceeded
+from parse import parse_code_to_ir
+
+SAMPLE = """
+def factorial(n):
+    if n <= 1:
+        return 1
+    return n * factorial(n - 1)
+
+x = (a + b) * (c - d) - e ** 2
+if x < 10:
+    print(f"small {x}")
+elif x < 100:
+    print("medium")
+else:
+    print("large")
+"""
+
+def test_iterative_matches_recursive():
+    assert transpile_python_to_js(SAMPLE, iterative=True) == transpile_python_to_js(SAMPLE)
+    assert parse_code_to_ir(SAMPLE, iterative=True) == parse_code_to_ir(SAMPLE)
+
+def test_iterative_long_chain():
+    code = "total = " + " + ".join(f"a{i}" for i in range(20000))
+    js, error = transpile_python_to_js(code, iterative=True)
+    assert error is None
+    assert js.startswith("let total = " + "(" * 19998 + "a0 + a1 + a2) + a3)")
+    assert js.endswith(" + a19999);")
+
+def test_iterative_long_chain_ir():
+    code = "total = " + " + ".join(f"a{i}" for i in range(20000)) + " - b"
+    ir = parse_code_to_ir(code, iterative=True, include_tokens=False)
+    # One entry for the whole chain, each operand dumped once
+    [chain] = ir["expressions"]
+    assert chain["type"] == "binary_chain"
+    assert chain["operands"][0] == "Name(id='a0', ctx=Load())" and len(chain["operands"]) == 20001
+    assert chain["ops"] == ["Add"] * 19999 + ["Sub"]
+
+def test_iterative_very_long_chain_ir():
+    code = "total = " + " + ".join(f"a{i}" for i in range(100000))
+    ir = parse_code_to_ir(code, iterative=True)
+    assert len(ir["tokens"]) == 2 + 2 * 100000 - 1
+    # Flat enough to serialize, as /convert does
+    [variable] = ir["variables"]
+    assert variable["value"]["type"] == "binary_postfix" and len(variable["value"]["items"]) == 199999
+    assert len(json.dumps(ir)) > 100000
+
+def test_iterative_unary_and_power_chains():
+    js, error = transpile_python_to_js("x = " + "-" * 5000 + "a", iterative=True)
+    assert error is None
+    assert js == "let x = " + "-(" * 4999 + "-a" + ")" * 4999 + ";"
+    js, error = transpile_python_to_js("x = " + "2 ** " * 5000 + "y", iterative=True)
+    assert error is None
+    assert js == "let x = " + "Math.pow(2, " * 5000 + "y" + ")" * 5000 + ";"
+    ir = parse_code_to_ir("x = " + "2 ** -" * 5000 + "y", iterative=True)
+    json.dumps(ir)
+    [chain] = parse_code_to_ir("x = " + "2 ** " * 5000 + "y", iterative=True)["expressions"]
+    assert chain["associativity"] == "right" and len(chain["operands"]) == 5001
+
+def test_iterative_budget_counts_every_node(monkeypatch):
+    budgets = []
+    class Recorded(pytojs.Budget):
+        def __init__(self, limits):
+            super().__init__(limits)
+            budgets.append(self)
+    monkeypatch.setattr(pytojs, "Budget", Recorded)
+    code = "x = " + " - ".join(f"a{i}" for i in range(300)) + "\ny = " + "-" * 50 + "b"
+    transpile_python_to_js(code, limits=TranspileLimits())
+    transpile_python_to_js(code, iterative=True, limits=TranspileLimits())
+    recursive, iterative = budgets
+    assert recursive.nodes == iterative.nodes > 400
+
+def test_iterative_deep_elif_chain():
+    code = "if a0:\n    x = 0\n" + "".join(f"elif a{i}:\n    x = {i}\n" for i in range(1, 5000)) + "else:\n    x = -1\n"
+    js, error = transpile_python_to_js(code, iterative=True)
+    assert error is None
+    assert js.count("} else if (") == 4999
+    # Every clause sits at the level of the first
+    assert js.endswith("} else if (a4999) {\nlet x = 4999;\n} else {\nlet x = -1;\n}")
+    [chain] = parse_code_to_ir(code, iterative=True, include_tokens=False)["conditionals"]
+    assert len(chain) == 5001 and chain[-1]["type"] == "else"
+
+@pytest.mark.parametrize("limits, kind", [
+    (TranspileLimits(max_source_bytes=10), "source_bytes"),
+    (TranspileLimits(max_nodes=20), "nodes"),
+    (TranspileLimits(max_output_bytes=50), "output_bytes"),
+    (TranspileLimits(timeout=0), "deadline"),
+    (TranspileLimits(cancel=lambda: True), "cancelled"),
+])
+def test_budget_exceeded(limits, kind):
+    with pytest.raises(BudgetExceeded) as info:
+        transpile_python_to_js(SAMPLE, limits=limits)
+    assert info.value.kind == kind
+
+def test_budget_within_limits():
+    limits = TranspileLimits(max_source_bytes=10_000, max_nodes=1_000,
+                             max_output_bytes=10_000, timeout=5)
+    assert transpile_python_to_js(SAMPLE, limits=limits) == transpile_python_to_js(SAMPLE)
+
+def test_binop_grouping():
+    # Operands that bind looser than their operator keep their parentheses
+    for code, expected in [
+        ("x = (a + b) * c", "let x = ((a + b) * c);"),
+        ("x = 1 - (y + z)", "let x = (1 - (y + z));"),
+        ("x = a - b - c", "let x = (a - b - c);"),
+        ("x = a * b + c", "let x = (a * b + c);"),
+        ("x = (a | b) & 3", "let x = ((a | b) & 3);"),
+        ("x = a << 2 | b >> 1", "let x = (a << 2 | b >> 1);"),
+        # Comparisons bind tighter than bitwise operators in JavaScript
+        ("x = a & 1 == b", "let x = (a & 1) === b;"),
+        ("x = a < b ^ c", "let x = a < (b ^ c);"),
+        ("x |= a ^ 1", "x |= a ^ 1;"),
+    ]:
+        assert transpile_python_to_js(code) == (expected, None)
+        assert transpile_python_to_js(code, iterative=True) == (expected, None)
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_bitwise_operators_match_python():
+    code = (
+        "x = 5\n"
+        "print((6 | x) & 3, 1 << x | 1, -9 >> 1, ~x & 255, x ^ 3)\n"
+        "if x & 1 == 1:\n"
+        "    print('odd')\n"
+    )
+    js, error = transpile_python_to_js(code)
+    assert error is None
+    output = subprocess.run(["node", "-e", js], capture_output=True, text=True).stdout
+    assert output == subprocess.run(["python3", "-c", code], capture_output=True, text=True).stdout
+
+def test_runtime_helpers_only_when_used():
+    js, _ = transpile_python_to_js("x = a + b\ny = data[1:3]\nz = data[-1]")
+    assert "function __" not in js
+    assert js.endswith("let y = data.slice(1, 3);\nlet z = data[data.length - 1];")
+
+    js, _ = transpile_python_to_js("x = a // b\ny = a // 2\nz = a % b\nw = s[::-1]")
+    assert js.count("function __floordiv(") == 1
+    assert js.count("function __pymod(") == 1
+    assert js.count("function __slice(") == 1
+    assert "__truthy" not in js
+    assert js.endswith("let x = __floordiv(a, b);\nlet y = __floordiv(a, 2);\nlet z = __pymod(a, b);\n"
+                       "let w = __slice(s, undefined, undefined, -1);")
+
+def test_truthiness_of_conditions():
+    code = "if not items or n > 0:\n    x = 1\nwhile len(queue):\n    x = 2"
+    # -O0 emits the tests as written
+    js, _ = transpile_python_to_js(code)
+    assert js == "if (!items || n > 0) {\nlet x = 1;\n}\nwhile (queue.length) {\nlet x = 2;\n}"
+    js, _ = transpile_python_to_js(code, opt_level=1)
+    assert js.count("function __truthy(") == 1
+    assert "if (!__truthy(items) || n > 0) {" in js
+    assert "while (queue.length) {" in js
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_runtime_helpers_match_python():
+    code = (
+        "data = [5, 6, 7, 8, 9]\n"
+        "print(data[::-1], data[-2::-2], data[1:10:3], 'hello'[::-2])\n"
+        "print(-7 // 2, -7 % 3, 7 % -3, 7.5 // 2, -7.5 % 2)\n"
+    )
+    js, error = transpile_python_to_js(code)
+    assert error is None
+    output = subprocess.run(["node", "-e", js], capture_output=True, text=True).stdout
+    assert output.splitlines() == [
+        "[ 9, 8, 7, 6, 5 ] [ 8, 6 ] [ 6, 9 ] olh",
+        "-4 2 -2 3 0.5",
+    ]
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+@pytest.mark.parametrize("level", [0, 2])
+def test_len_of_sets_matches_python(level):
+    code = (
+        "xs = [3, 1, 3, 2, 1]\n"
+        "s = {x for x in xs}\n"
+        "def count(ys):\n"
+        "    odd = {y % 2 for y in ys}\n"
+        "    return len(odd) + len(s) + len(ys)\n"
+        "print(len({x for x in xs}), len(s), count(xs))\n"
+    )
+    js, error = transpile_python_to_js(code, opt_level=level)
+    assert error is None
+    output = subprocess.run(["node", "-e", js], capture_output=True, text=True).stdout
+    assert output == "3 3 10\n"
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+@pytest.mark.parametrize("level", [1, 2])
+def test_truthiness_matches_python(level):
+    code = (
+        "e = []\nd = {}\nz = [0]\n"
+        "print(not e, not d, not z, not '', not 'x', any([] for x in z))\n"
+        "if e or d:\n"
+        "    print(1)\n"
+    )
+    js, error = transpile_python_to_js(code, opt_level=level)
+    assert error is None
+    output = subprocess.run(["node", "-e", js], capture_output=True, text=True).stdout
+    assert output == "true true false true false false\n"
+
+def test_comprehensions_become_loops():
+    js, _ = transpile_python_to_js("evens = [x * x for x in xs if x > 0]")
+    assert js == "let evens = [];\nfor (const x of xs) { if (x > 0) { evens.push(x * x); } }"
+    js, _ = transpile_python_to_js("print({k: v for k, v in pairs}, [i for i in range(n)])")
+    assert "for (const [k, v] of pairs) { $result[k] = v; }" in js
+    assert "for (let i = 0, $stop = n; i < $stop; i++) { $result.push(i); }" in js
+    assert "map(" not in js and "filter(" not in js
+
+def test_reductions_are_fused():
+    js, _ = transpile_python_to_js("total = sum(x * 2 for x in xs)\nok = all(x > 0 for x in xs)")
+    assert js == (
+        "let total = (() => { let $total = 0; for (const x of xs) { $total += x * 2; } return $total; })();\n"
+        "let ok = (() => { for (const x of xs) { if (!(x > 0)) return false; } return true; })();"
+    )
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_comprehensions_match_python():
+    code = (
+        "xs = [1, 2, 3, 4, 5, 6]\n"
+        "print([[a, b] for a in range(3) for b in range(a) if a != b])\n"
+        "print(sum(x for x in range(10, 0, -2)), sum([x for x in xs], 100))\n"
+        "print(any(x > 5 for x in xs), all(x < 3 for x in xs))\n"
+        "print([y for y in (x + 1 for x in xs) if y % 2])\n"
+    )
+    js, error = transpile_python_to_js(code)
+    assert error is None
+    output = subprocess.run(["node", "-e", js], capture_output=True, text=True).stdout
+    assert output.splitlines() == [
+        "[ [ 1, 0 ], [ 2, 0 ], [ 2, 1 ] ]",
+        "30 121",
+        "true false",
+        "[ 3, 5, 7 ]",
+    ]
+
+def test_function_locals_are_declared_once():
+    code = (
+        "def f(items):\n"
+        "    total = 0\n"
+        "    limit = 10\n"
+        "    for item in items:\n"
+        "        total = total + item\n"
+        "    if total > limit:\n"
+        "        label = 'big'\n"
+        "    else:\n"
+        "        label = 'small'\n"
+        "    return label\n"
+    )
+    js, _ = transpile_python_to_js(code)
+    assert js.startswith("function f(items) {\nlet label;\nlet total = 0;\nconst limit = 10;\n")
+    assert "    total = total + item;" in js and "label = \"big\";" in js
+    assert "let label =" not in js and "const label" not in js
+
+CLASSES = """
+class Shape:
+    sides = 0
+
+    def __init__(self, name):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+
+    def describe(self):
+        self.calls += 1
+        return f"{self.name} has {self.sides} sides"
+
+class Rect(Shape):
+    sides = 4
+
+    def __init__(self, width, height):
+        super().__init__("rect")
+        self.width = width
+        if width == height:
+            self.is_square = 1
+
+    def area_of(self):
+        return self.width * self.height
+
+    @staticmethod
+    def unit():
+        return Rect(1, 1)
+
+class Point:
+    __slots__ = ("x", "y")
+
+    def __init__(self, y, x):
+        self.y = y
+        self.x = x
+"""
+
+def test_classes_have_a_fixed_shape():
+    js, error = transpile_python_to_js(CLASSES)
+    assert error is None
+    # Attributes first assigned elsewhere start out undefined, after the plain assignments
+    assert "constructor(name) {\n    this.name = name;\n    this.calls = undefined;\n    this.reset();\n" in js
+    # Fields the base constructor sets are not reset
+    assert ("class Rect extends Shape {\n    static sides = 4;\n    constructor(width, height) {\n"
+            "    super(\"rect\");\n    this.width = width;\n    this.is_square = undefined;\n    if (") in js
+    assert "return `${this.name} has ${this.constructor.sides} sides`;" in js
+    assert "    areaOf() {" in js and "    static unit() {\n    return new Rect(1, 1);" in js
+    # Slots fix the order, whatever order __init__ assigns them in
+    assert "constructor(y, x) {\n    this.x = undefined;\n    this.y = undefined;\n    this.y = y;\n" in js
+
+def test_unsupported_class_features():
+    for code in ("class A(B, C):\n    pass",
+                 "class A(B):\n    def __init__(self):\n        self.x = 1\n        super().__init__()",
+                 "class A:\n    @cached\n    def f(self):\n        pass"):
+        js, error = transpile_python_to_js(code)
+        assert js is None and "not supported" in error or "first statement" in error
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_classes_match_python():
+    code = CLASSES + (
+        "r = Rect(3, 3)\n"
+        "r.height = 5\n"
+        "print(r.describe(), r.calls, r.area_of(), r.is_square, Rect.unit().calls)\n"
+        "p = Point(2, 1)\n"
+        "print(p.x, p.y, Shape('blob').describe())\n"
+    )
+    js, error = transpile_python_to_js(code)
+    assert error is None
+    output = subprocess.run(["node", "-e", js], capture_output=True, text=True).stdout
+    assert output.splitlines() == ["rect has 4 sides 1 15 1 0", "1 2 blob has 0 sides"]
@@ -0,0 +1,59 @@
+from recovery import split_regions, transpile_with_diagnostics
+from pytojs import transpile_python_to_js
+
+BROKEN = '''def good(a):
+    return a + 1
+
+def bad(a:
+    return a
+
+x = """
+x = 1
+"""
+y = (1 +
+2)
+if y:
+    print(y)
+else:
+    z = 3 +
+
+print(good(2))
+'''
+
+def test_split_regions():
+    regions = split_regions(BROKEN)
+    # The unclosed bracket runs to the end; recovery splits it up later
+    assert [line for line, _ in regions] == [1, 4]
+    assert "".join(text for _, text in regions) == BROKEN
+    # Triple-quoted strings, brackets and else branches stay in one region
+    assert [line for line, _ in split_regions(BROKEN[BROKEN.index("x = "):])] == [1, 4, 6, 11]
+
+def test_reports_every_error():
+    js, diagnostics = transpile_with_diagnostics(BROKEN)
+    assert [(d["line"], d["column"]) for d in diagnostics] == [(4, 8), (15, 12)]
+    assert diagnostics[0]["message"] == "Python syntax error: '(' was never closed"
+    assert "function good(a)" in js
+    assert "let y = 1 + 2;" in js
+    assert js.endswith("console.log(good(2));")
+    assert "// Skipped lines 4-5: Python syntax error" in js
+    assert "// Skipped lines 12-15: Python syntax error: invalid syntax" in js
+
+def test_valid_source_matches_transpile():
+    code = "a = 1\nprint(a)\n"
+    assert transpile_with_diagnostics(code) == (transpile_python_to_js(code)[0], [])
+
+def test_sets_match_transpile():
+    code = "xs = [1, 1, 2]\ns = {x for x in xs}\ndef f():\n    return len(s)\nprint(len(s))\n"
+    assert transpile_with_diagnostics(code) == (transpile_python_to_js(code)[0], [])
+    # Regions after a syntax error and statements after a skipped one
+    # still know the set
+    js, _ = transpile_with_diagnostics("s = {x for x in xs}\ny = (\n\nimport math\nprint(len(s))\n")
+    assert js.endswith("console.log(s.size);")
+    js, _ = transpile_with_diagnostics("s = {x for x in xs}\ndef g():\n    s = 1\n    import math\nprint(len(s))\n")
+    assert js.endswith("console.log(s.size);")
+
+def test_unsupported_statement_is_a_diagnostic():
+    js, diagnostics = transpile_with_diagnostics("a = 1\nimport math\nprint(a)\n")
+    assert js == "let a = 1;\n// Skipped lines 2-2: " + diagnostics[0]["message"] + "\nconsole.log(a);"
+    assert diagnostics[0]["line"] == 2
+    assert diagnostics[0]["message"].startswith("Transpilation error")
@@ -0,0 +1,54 @@
+import pytest
+from pytojs import transpile_python_to_js
+from sessions import SessionStore, SessionError, apply_edits, diff_ranges
+
+def test_apply_edits():
+    code = apply_edits("x = 1\ny = 2\n", [
+        {"offset": 4, "length": 1, "replacement": "10"},
+        {"offset": 0, "length": 0, "replacement": "# hi\n"},
+    ])
+    assert code == "# hi\nx = 10\ny = 2\n"
+    with pytest.raises(SessionError):
+        apply_edits("x = 1", [{"offset": 3, "length": 10, "replacement": ""}])
+
+def test_diff_ranges():
+    assert diff_ranges("abc", "abc") == []
+    old, new = "let x = 1;\nlet y = 2;", "let x = 10;\nlet y = 2;"
+    (change,) = diff_ranges(old, new)
+    assert old[:change["start"]] + change["text"] + old[change["end"]:] == new
+
+def test_session_edit_returns_changed_ranges():
+    store = SessionStore(transpile_python_to_js)
+    session = store.open("x = 1\ny = 2\n")
+    old = session.javascript
+    session, changes = store.edit(session.id, [{"offset": 4, "length": 1, "replacement": "5"}], version=0)
+    assert session.version == 1
+    assert changes == [{"start": 8, "end": 9, "text": "5"}]
+    assert old[:8] + "5" + old[9:] == session.javascript
+
+    # A broken buffer keeps the last good output and reports the error
+    session, changes = store.edit(session.id, [{"offset": 0, "length": 0, "replacement": "("}])
+    assert changes == [] and session.error
+
+    with pytest.raises(SessionError) as info:
+        store.edit(session.id, [], version=0)
+    assert info.value.status == 409
+
+def test_session_caps_and_expiry():
+    now = [0.0]
+    store = SessionStore(transpile_python_to_js, max_sessions=2, max_session_bytes=100,
+                         idle_timeout=60, clock=lambda: now[0])
+    first = store.open("a = 1")
+    store.open("b = 2")
+    store.open("c = 3")
+    assert len(store) == 2
+    with pytest.raises(SessionError):
+        store.get(first.id)
+    with pytest.raises(SessionError) as info:
+        store.open("x = 1\n" * 50)
+    assert info.value.status == 413
+
+    # Idle sessions are dropped on the next access
+    now[0] = 61.0
+    store.open("d = 4")
+    assert len(store) == 1
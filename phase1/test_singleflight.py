@@ -0,0 +1,38 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from singleflight import SingleFlight, request_key
+
+def test_request_key():
+    assert request_key("a = 1") == request_key("a = 1")
+    assert request_key("a = 1") != request_key("a = 2")
+    assert request_key("a = 1", opt_level=1) != request_key("a = 1", opt_level=2)
+
+def test_concurrent_duplicates_share_one_call():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(flights.do, "key", work) for _ in range(8)]
+        while flights.coalesced < 7:
+            time.sleep(0.001)
+        assert flights.in_flight == 1
+        release.set()
+        assert [f.result() for f in futures] == ["result"] * 8
+    assert calls == [1]
+    assert flights.in_flight == 0
+
+def test_errors_are_shared_and_not_cached():
+    flights = SingleFlight()
+    with ThreadPoolExecutor(2) as pool:
+        future = flights.submit("key", lambda: 1 / 0, pool)
+        with pytest.raises(ZeroDivisionError):
+            future.result()
+        assert flights.submit("key", lambda: 42, pool).result() == 42